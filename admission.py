@@ -0,0 +1,206 @@
+# Save as: admission.py
+"""Admission control and request budgets for lookups that go upstream
+
+Only cache misses reach the scheduler. Cached answers, topics known to
+be missing and chat replies never queue. At most max_running lookups
+run at once. The rest wait in a bounded queue, interactive requests
+ahead of batch work. A lookup that finds the queue full, or that waits
+longer than max_wait, is shed with Overloaded. The caller can then send
+a quick "busy" reply instead of holding a thread until it times out.
+When the queue is full of batch work, an interactive lookup takes the
+place of the newest batch entry.
+
+Each upstream also has a token bucket. A call that finds its bucket
+empty waits for the next token, but only if the token arrives within
+the time the call can afford. Otherwise the call fails at once with
+RateLimited, which the retrieval engine treats like an open breaker.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from metrics import span
+
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing a lookup the scheduler cannot take"""
+
+
+class RateLimited(Exception):
+    """Raised instead of calling an upstream whose request budget is spent"""
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst
+
+    A taker that finds the bucket empty reserves the next token and
+    sleeps until it is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.rejected = 0  # takes refused because the next token was too far off
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, max_wait=0.0):
+        """Spend a token, sleeping up to max_wait for one; False if none comes in time"""
+        with self._lock:
+            self._refill(time.monotonic())
+            delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if delay > max_wait:
+                self.rejected += 1
+                return False
+            self._tokens -= 1  # may go below zero: a reservation for a later token
+        if delay:
+            time.sleep(delay)
+        return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self._tokens)
+
+
+class _Waiter:
+    __slots__ = ('event', 'admitted', 'displaced')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.displaced = False
+
+
+class Scheduler:
+    """Bounded, prioritized admission for upstream lookups; see the module docstring
+
+    budgets maps an upstream name to (requests per second, burst). Upstreams
+    not listed, or with a rate of 0, are not limited.
+    """
+
+    def __init__(self, max_running=8, max_queue=32, max_wait=3.0, budgets=None):
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.buckets = {
+            name: TokenBucket(rate, burst)
+            for name, (rate, burst) in (budgets or {}).items() if rate > 0
+        }
+        self.running = 0
+        self.admitted = 0
+        self.queued = 0  # admitted lookups that had to wait first
+        self.shed = Counter()  # reason -> lookups turned away
+        self.wait_seconds = 0.0  # total queue wait of admitted lookups
+        self._queue = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def reopen(self):
+        """Fresh lock and queue in a forked worker"""
+        self._lock = threading.Lock()
+        self._queue = []
+        self.running = 0
+
+    @contextmanager
+    def admit(self, priority=INTERACTIVE):
+        """Hold a running slot for the block; raises Overloaded when shed"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority=INTERACTIVE):
+        """Take a running slot, waiting in the queue if need be; raises Overloaded when shed
+
+        Every successful acquire() must be paired with one release().
+        """
+        with span('admission_wait'):
+            self._acquire(priority)
+
+    def _acquire(self, priority):
+        with self._lock:
+            if self.running < self.max_running and not self._queue:
+                self.running += 1
+                self.admitted += 1
+                return
+            if len(self._queue) >= self.max_queue and not self._displace(priority):
+                self.shed['queue_full'] += 1
+                raise Overloaded("too many lookups waiting")
+            waiter = _Waiter()
+            entry = (priority, next(self._sequence), waiter)
+            heapq.heappush(self._queue, entry)
+
+        started = time.monotonic()
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if waiter.admitted:  # the slot was handed over by release()
+                self.admitted += 1
+                self.queued += 1
+                self.wait_seconds += time.monotonic() - started
+                return
+            if waiter.displaced:
+                raise Overloaded("gave way to an interactive lookup")
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self.shed['timeout'] += 1
+        raise Overloaded(f"waited {self.max_wait:.1f}s for a lookup slot")
+
+    def _displace(self, priority):
+        """Shed the newest waiter of lower priority to make room; False if there is none"""
+        if not self._queue:
+            return False
+        worst = max(self._queue)
+        if worst[0] <= priority:
+            return False
+        self._queue.remove(worst)
+        heapq.heapify(self._queue)
+        worst[2].displaced = True
+        worst[2].event.set()
+        self.shed['displaced'] += 1
+        return True
+
+    def release(self):
+        """Give the slot back, handing it straight to the first waiter if there is one"""
+        with self._lock:
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.admitted = True  # the running slot passes straight to it
+                waiter.event.set()
+            else:
+                self.running -= 1
+
+    def spend(self, upstream, max_wait=0.0):
+        """Take one request from upstream's budget; raises RateLimited if it is spent"""
+        bucket = self.buckets.get(upstream)
+        if bucket is not None and not bucket.take(max_wait):
+            raise RateLimited(f"{upstream} request budget spent")
+
+    def queue_depth(self):
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'queue_depth': self.queue_depth(),
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'shed': dict(self.shed),
+            'mean_wait_ms': round(self.wait_seconds / self.queued * 1000, 1) if self.queued else 0.0,
+            'rate_limited': {name: bucket.rejected for name, bucket in self.buckets.items()},
+            'tokens': {name: round(bucket.tokens, 1) for name, bucket in self.buckets.items()},
+        }
@@ -0,0 +1,266 @@
+# Save as: answer_cache.py
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+def normalize_query(query):
+    """Turn an extracted query into a cache key ("  Albert  Einstein " -> "albert einstein")"""
+    query = re.sub(r'\s+', ' ', query or '').strip().lower()
+    return query.strip('.,!?;:\'"')
+
+
+class MemoryCache:
+    """In-process LRU cache with a TTL and a cap on the total size in bytes"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, ttl=3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._items = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, size, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                self.size -= size
+                self.expirations += 1
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = len(json.dumps(value, ensure_ascii=False).encode('utf-8')) + len(key)
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._items[key] = (expires_at, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, old_size, _) = self._items.popitem(last=False)
+                self.size -= old_size
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskCache:
+    """Persistent answer cache in a small SQLite file, shared across restarts"""
+
+    def __init__(self, path='answer_cache.db', ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS answers ('
+            'key TEXT PRIMARY KEY, '
+            'value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL)'
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM answers WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            with self._lock:
+                self._conn.execute('DELETE FROM answers WHERE key = ?', (key,))
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO answers (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, data, expires_at)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        """Open a fresh connection in a forked worker process"""
+        self._lock = threading.Lock()
+        self._open()
+
+
+class AnswerCache:
+    """Tiered cache: memory first, then the optional shared and disk tiers
+
+    The shared tier (shared_cache.SharedCache) is one table for every
+    worker process on the host. An optional negative tier remembers,
+    briefly, queries that no provider could answer.
+    """
+
+    def __init__(self, memory=None, disk=None, negative=None, shared=None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+        self.negative = negative
+        self.shared = shared
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @classmethod
+    def from_config(cls):
+        """Build the cache described by the CHATBOT_ANSWER_CACHE_* settings"""
+        memory = MemoryCache(config.ANSWER_CACHE_MAX_BYTES, config.ANSWER_CACHE_TTL)
+        disk = None
+        if config.ANSWER_CACHE_PATH:
+            disk = DiskCache(config.ANSWER_CACHE_PATH, config.ANSWER_CACHE_DISK_TTL)
+        negative = None
+        if config.NEGATIVE_CACHE_TTL > 0:
+            negative = MemoryCache(config.NEGATIVE_CACHE_MAX_BYTES, config.NEGATIVE_CACHE_TTL)
+        shared = None
+        if config.SHARED_CACHE_PATH not in ('', 'off', 'auto'):
+            from shared_cache import SharedCache
+            try:
+                shared = SharedCache(config.SHARED_CACHE_PATH, config.SHARED_CACHE_MAX_BYTES,
+                                     config.SHARED_CACHE_SLOT_BYTES, config.SHARED_CACHE_LEASE)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Shared answer cache unavailable: {e}")
+        return cls(memory, disk, negative, shared)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.shared is not None:
+            _, value = self.shared.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self.memory.set(key, value)
+                return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.memory.ttl)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Result for key from compute(), stored in every tier
+
+        compute() returns (result, conclusive). A conclusive empty result
+        (every provider answered "nothing") goes to the negative tier;
+        errors and timeouts are not cached. With a shared tier, workers
+        that miss on a key another worker is computing wait for its result
+        instead of computing it again.
+        """
+        if self.shared is None:
+            result, conclusive = compute()
+            self._store(key, result, conclusive)
+            return result
+
+        def compute_and_store():
+            result, conclusive = compute()
+            self._store(key, result, conclusive, shared=False)
+            if result:
+                return result, self.memory.ttl
+            if conclusive and self.negative is not None:
+                return None, self.negative.ttl
+            return None, 0
+
+        result, hit = self.shared.get_or_set(key, compute_and_store)
+        if hit:
+            # Computed by another worker (or before our miss): keep a local copy
+            self.shared_hits += 1
+            if result:
+                self.memory.set(key, result)
+            elif self.negative is not None:
+                self.negative.set(key, True)
+        return result
+
+    def _store(self, key, result, conclusive, shared=True):
+        if result:
+            self.memory.set(key, result)
+            if shared and self.shared is not None:
+                self.shared.set(key, result, self.memory.ttl)
+            if self.disk is not None:
+                self.disk.set(key, result)
+        elif conclusive:
+            self.remember_missing(key, shared)
+
+    def is_known_missing(self, key):
+        """Whether key recently came back with no answer from any provider"""
+        if self.negative is None or self.negative.get(key) is None:
+            return False
+        self.negative_hits += 1
+        return True
+
+    def remember_missing(self, key, shared=True):
+        if self.negative is not None:
+            self.negative.set(key, True)
+            if shared and self.shared is not None:
+                self.shared.set(key, None, self.negative.ttl)
+
+    def reopen(self):
+        if self.disk is not None:
+            self.disk.reopen()
+        if self.shared is not None:
+            self.shared.reopen()
+
+    def stats(self):
+        """Counters for sizing the cache from production traffic"""
+        hits = self.memory_hits + self.shared_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.memory.evictions,
+            'expirations': self.memory.expirations,
+            'entries': len(self.memory),
+            'bytes': self.memory.size,
+            'max_bytes': self.memory.max_bytes,
+            'negative_hits': self.negative_hits,
+            'negative_entries': len(self.negative) if self.negative is not None else 0,
+            'shared': self.shared.stats() if self.shared is not None else None,
+        }
@@ -0,0 +1,13 @@
+# Save as: asgi.py
+"""ASGI entry point: uvicorn asgi:asgi_app (or CHATBOT_SERVER=uvicorn python serve.py)
+
+The Flask views stay synchronous; the ASGI adapter runs each one on a worker
+thread, so a slow Wikipedia or Google lookup never blocks the event loop
+that is accepting other connections.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from chatbot_app import app, start_warmup
+
+asgi_app = WsgiToAsgi(app)
+start_warmup()  # each uvicorn worker imports this module itself
@@ -0,0 +1,2 @@
+# Save as: benchmarks/__init__.py
+"""Benchmark and load-test suite: python -m benchmarks --help"""
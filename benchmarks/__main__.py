@@ -0,0 +1,130 @@
+# Save as: benchmarks/__main__.py
+"""Run the benchmarks and print (or save) the results as JSON
+
+    python -m benchmarks                      # everything
+    python -m benchmarks micro                # CPU hot paths only
+    python -m benchmarks load --clients 16    # Flask routes against the stub upstream
+    python -m benchmarks startup              # import time and time to first 200
+    python -m benchmarks snippets             # ranked vs first-match page snippets
+    python -m benchmarks workers              # upstream calls per worker count, shared cache on/off
+    python -m benchmarks all -o new.json
+    python -m benchmarks compare old.json new.json
+"""
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import time
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def flatten(data, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, numbers only"""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path, threshold=10.0):
+    """Print metrics that moved by more than threshold percent"""
+    with open(old_path, encoding='utf-8') as f:
+        old = flatten(json.load(f).get('results', {}))
+    with open(new_path, encoding='utf-8') as f:
+        new = flatten(json.load(f).get('results', {}))
+
+    changes = []
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        if before == 0:
+            continue
+        change = (after - before) / abs(before) * 100
+        if abs(change) >= threshold:
+            changes.append((name, before, after, change))
+
+    if not changes:
+        print(f"No metric moved by {threshold:.0f}% or more")
+    for name, before, after, change in changes:
+        print(f"{name:60s} {before:>12} -> {after:<12} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suite', nargs='?', default='all', choices=['all', 'micro', 'snippets', 'load', 'workers', 'startup', 'compare'])
+    parser.add_argument('files', nargs='*', help='compare: OLD.json NEW.json')
+    parser.add_argument('-o', '--output', help='write JSON here instead of stdout')
+    parser.add_argument('--repeat', type=int, default=7, help='micro: timing rounds')
+    parser.add_argument('--clients', type=int, default=8, help='load: concurrent clients')
+    parser.add_argument('--requests', type=int, default=50, help='load: requests per client')
+    parser.add_argument('--burst', type=int, default=32, help='load: clients in the burst scenario')
+    parser.add_argument('--latency', type=float, default=0.05, help='load: stub upstream latency (s)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='load: stub upstream 503 rate')
+    parser.add_argument('--runs', type=int, default=5, help='startup: fresh processes per measurement')
+    parser.add_argument('--threshold', type=float, default=10.0, help='compare: percent change to report')
+    args = parser.parse_args(argv)
+
+    if args.suite == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare needs OLD.json and NEW.json')
+        compare(args.files[0], args.files[1], args.threshold)
+        return
+
+    results = {}
+    # The bot prints progress lines; keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.suite in ('all', 'micro'):
+            from benchmarks import micro
+            print("⏱️ Running microbenchmarks...")
+            results['micro'] = micro.run(args.repeat)
+        if args.suite in ('all', 'snippets'):
+            from benchmarks import snippets
+            print("✂️ Comparing snippet pickers on saved pages...")
+            results['snippets'] = snippets.run(args.repeat)
+        if args.suite in ('all', 'load'):
+            from benchmarks import load
+            print("🚦 Running load test...")
+            results['load'] = load.run(args.latency, args.failure_rate, args.clients, args.requests, args.burst)
+        if args.suite in ('all', 'workers'):
+            from benchmarks import workers
+            print("👥 Counting upstream calls across worker processes...")
+            results['workers'] = workers.run(latency=args.latency)
+        if args.suite in ('all', 'startup'):
+            from benchmarks import startup
+            print("🚀 Measuring startup...")
+            results['startup'] = startup.run(args.runs)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# Save as: benchmarks/load.py
+"""Concurrent load against the Flask routes, with the stub standing in for the internet"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import config
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, elapsed):
+    """Latency percentiles (ms) and throughput for one route"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(values) * 1000, 2) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class AppServer:
+    """Runs chatbot_app on a background werkzeug server wired to a stub upstream"""
+
+    def __init__(self, stub, data_dir):
+        # Keep the benchmark away from real user data and the real internet
+        config.USER_STORE_PATH = os.path.join(data_dir, 'bench_users.db')
+        config.USER_DATA_FILE = ''
+        config.KNOWLEDGE_INDEX_PATH = ''
+        config.ANSWER_CACHE_PATH = ''
+        config.HISTORY_ARCHIVE_PATH = os.path.join(data_dir, 'bench_archive.db')
+        config.TITLE_INDEX_PATH = ''
+        config.TITLE_INDEX_LEARNED = os.path.join(data_dir, 'bench_learned_titles.txt')
+        config.SPELLING_INDEX_PATH = os.path.join(data_dir, 'bench_spelling.idx')
+
+        import logging
+        import chatbot_app
+        from werkzeug.serving import make_server
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        self.module = chatbot_app
+        stub.configure_bot(chatbot_app.bot)
+        self._server = make_server('127.0.0.1', 0, chatbot_app.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+def run_load(app_url, clients=8, requests_per_client=50, topics=200, history_share=0.3, seed=1):
+    """Each client gets its own session and mixes /chat posts with /history reads"""
+    import requests
+
+    results = {'/chat': ([], [0]), '/history': ([], [0])}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients)
+
+    def client(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        session.get(app_url + '/')  # sets the session cookie
+        start_barrier.wait()
+        for _ in range(requests_per_client):
+            if rng.random() < history_share:
+                route = '/history'
+                call = lambda: session.get(app_url + '/history?limit=20', timeout=30)
+            else:
+                route = '/chat'
+                topic = f"Topic {rng.randrange(topics)}"
+                call = lambda: session.post(app_url + '/chat', json={'message': f"What is {topic}?"}, timeout=30)
+            started = time.perf_counter()
+            try:
+                response = call()
+                ok = response.status_code == 200 and 'error' not in response.json()
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[route][0].append(elapsed)
+                if not ok:
+                    results[route][1][0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {route: summarize(latencies, errors[0], elapsed) for route, (latencies, errors) in results.items()}
+    report['total'] = {
+        'clients': clients,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(sum(len(l) for l, _ in results.values()) / elapsed, 1),
+    }
+    return report
+
+
+def run_burst(app_url, stub, bot, clients=32):
+    """Many users ask the same new question at once; count what reaches upstream"""
+    import requests
+
+    topic = f"Burst Topic {random.randrange(10 ** 9)}"
+    stub.reset_counters()
+    barrier = threading.Barrier(clients)
+    answers = []
+
+    def client():
+        session = requests.Session()
+        session.get(app_url + '/')
+        barrier.wait()
+        response = session.post(app_url + '/chat', json={'message': f"What is {topic}?"}, timeout=30)
+        answers.append(response.json().get('response', ''))
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'clients': clients,
+        'answered': sum(1 for answer in answers if topic in answer),
+        'upstream_requests': dict(stub.requests),
+        'wikipedia_summary_calls': stub.requests['wikipedia_summary'],
+        'coalescing': bot.flights.stats(),
+    }
+
+
+def run_overload(app_url, stub, bot, clients=64, max_running=4, max_queue=8):
+    """A burst of distinct new questions with the scheduler held to a few slots
+
+    Lookups beyond max_running + max_queue are shed; their busy replies
+    should come back in milliseconds while the admitted ones finish.
+    """
+    import requests
+
+    scheduler = bot.scheduler
+    saved = scheduler.max_running, scheduler.max_queue
+    scheduler.max_running, scheduler.max_queue = max_running, max_queue
+    shed_before = sum(scheduler.shed.values())
+    stub.reset_counters()
+    barrier = threading.Barrier(clients)
+    run_id = random.randrange(10 ** 9)
+    answered, degraded = [], []
+    lock = threading.Lock()
+
+    def client(index):
+        session = requests.Session()
+        session.get(app_url + '/')
+        barrier.wait()
+        started = time.perf_counter()
+        response = session.post(app_url + '/chat', json={'message': f"What is Overload {run_id} {index}?"}, timeout=30)
+        elapsed = time.perf_counter() - started
+        with lock:
+            busy = 'try again in a few seconds' in response.json().get('response', '')
+            (degraded if busy else answered).append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        scheduler.max_running, scheduler.max_queue = saved
+
+    return {
+        'clients': clients,
+        'max_running': max_running,
+        'max_queue': max_queue,
+        'answered': summarize(answered, 0, 1.0),
+        'degraded': summarize(degraded, 0, 1.0),
+        'shed': sum(scheduler.shed.values()) - shed_before,
+        'upstream_requests': stub.upstream_calls(),
+    }
+
+
+def run(latency=0.05, failure_rate=0.0, clients=8, requests_per_client=50, burst_clients=32):
+    """Start the stub and the app, then run the load and burst scenarios"""
+    from benchmarks.stub_upstream import StubUpstream
+
+    with tempfile.TemporaryDirectory() as data_dir, \
+            StubUpstream(latency=latency, failure_rate=failure_rate, page_paragraphs=100) as stub:
+        server = AppServer(stub, data_dir).start()
+        try:
+            report = {
+                'settings': {
+                    'upstream_latency_s': latency,
+                    'upstream_failure_rate': failure_rate,
+                    'retrieval_mode': server.module.bot.retrieval.mode,
+                },
+                'load': run_load(server.url, clients, requests_per_client),
+            }
+            report['upstream'] = {
+                'requests': stub.upstream_calls(),
+                'connections': len(stub.connections),  # far below requests when keep-alive works
+            }
+            report['burst'] = run_burst(server.url, stub, server.module.bot, burst_clients)
+            report['overload'] = run_overload(server.url, stub, server.module.bot)
+            report['cache'] = server.module.bot.cache.stats()
+            return report
+        finally:
+            server.stop()
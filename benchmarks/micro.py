@@ -0,0 +1,97 @@
+# Save as: benchmarks/micro.py
+"""Microbenchmarks for the bot's CPU-bound hot paths (no network)"""
+import statistics
+import time
+
+from benchmarks.stub_upstream import make_page
+
+MESSAGES = [
+    "What is artificial intelligence?",
+    "Tell me about the Roman Empire",
+    "hello there",
+    "Sometimes I wonder how black holes form",
+    "Explain how photosynthesis works",
+    "Can you tell me a joke",
+]
+
+
+def measure(fn, repeat=7, number=None, target_seconds=0.2):
+    """Time fn; returns per-call statistics in microseconds"""
+    if number is None:
+        # Calibrate so each round takes roughly target_seconds
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= 0.02 or number >= 1 << 20:
+                break
+            number *= 2
+        number = max(1, int(number * target_seconds / elapsed))
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        'calls_per_round': number,
+        'rounds': repeat,
+        'mean_us': round(statistics.mean(rounds), 3),
+        'min_us': round(min(rounds), 3),
+        'stdev_us': round(statistics.stdev(rounds), 3) if repeat > 1 else 0.0,
+        'ops_per_sec': round(1e6 / min(rounds), 1),
+    }
+
+
+def run(repeat=7):
+    """Run every microbenchmark and return {name: stats}"""
+    from smart_chatbot import SmartChatBot
+    from html_extract import extract_from_chunks
+
+    bot = SmartChatBot()
+    results = {}
+
+    results['extract_query'] = measure(
+        lambda: [bot.extract_query(message) for message in MESSAGES], repeat)
+    results['handle_general_conversation'] = measure(
+        lambda: [bot.handle_general_conversation(message) for message in MESSAGES], repeat)
+
+    result = {
+        'answer': "Albert Einstein was a German-born theoretical physicist. " * 6,
+        'source': 'Albert Einstein',
+        'url': 'https://en.wikipedia.org/wiki/Albert_Einstein',
+        'type': 'wikipedia',
+    }
+    results['format_response'] = measure(lambda: bot.format_response(result, 'Albert Einstein'), repeat)
+
+    for paragraphs in (20, 400):
+        page = make_page('Albert Einstein', paragraphs).encode('utf-8')
+        chunks = [page[i:i + 16384] for i in range(0, len(page), 16384)]
+        results[f'html_extract_{len(page) // 1024}kb'] = dict(
+            measure(lambda: extract_from_chunks(iter(chunks), 'Albert Einstein'), repeat),
+            page_bytes=len(page)
+        )
+
+    results['title_suggest_100k'] = title_suggest(repeat)
+
+    return results
+
+
+def title_suggest(repeat=7, count=100_000):
+    """/suggest lookups against an index of count synthetic titles"""
+    import random
+    from title_index import TitleIndex
+
+    rng = random.Random(7)
+    syllables = ['al', 'be', 'ca', 'do', 'er', 'fi', 'go', 'ha', 'in', 'jo', 'ka', 'lu', 'ma', 'no', 'or', 'pe']
+    words = [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    index = TitleIndex(' '.join(rng.sample(words, rng.randint(1, 3))).title() for _ in range(count))
+    prefixes = ['a', 'be', 'cal', 'dome', 'go ha', 'zz']
+    return dict(
+        measure(lambda: [index.suggest(prefix) for prefix in prefixes], repeat),
+        titles=index.stats()['titles'],
+        prefixes_per_call=len(prefixes),
+    )
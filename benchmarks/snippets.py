@@ -0,0 +1,140 @@
+# Save as: benchmarks/snippets.py
+"""Ranked snippet extraction against the old first-matches loop, on saved pages
+
+Each fixture in benchmarks/fixtures has a query and a phrase from the
+sentence a good answer should contain. For both pickers the suite reports
+the time to extract from the streamed page, whether that phrase made it
+into the answer, and the answer itself. The select_* and scan_legacy
+entries time the picking step alone, on sentences already split out of
+the page; scan_legacy runs the old substring test over every sentence,
+which is what the old loop would cost if it read as much as ranking does.
+chunks_read counts the 16 KB chunks each picker consumed before stopping.
+
+The generated_large entry is a 440 KB stub page with the answer halfway
+down, past filler that never mentions the query: both pickers have to
+read to it, and ranking should cost no more than the old loop there.
+"""
+import os
+
+from benchmarks.micro import measure
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# file -> (query, phrase the best answer contains)
+FIXTURES = {
+    'black_holes.html': ('black holes', 'not even light'),
+    'photosynthesis.html': ('photosynthesis', 'convert light energy'),
+    'roman_empire.html': ('Roman Empire', 'ruled by emperors'),
+}
+GENERATED = ('Quantum tunneling', 'widely studied subject', 1200)  # query, phrase, paragraphs
+
+
+def counted(chunks, seen):
+    """Yield chunks, counting them in seen[0]"""
+    for chunk in chunks:
+        seen[0] += 1
+        yield chunk
+
+
+def legacy_extract(chunks, query, max_bytes=512 * 1024, max_sentences=4):
+    """extract_from_chunks as it was before ranking: the first matching sentences"""
+    import codecs
+    from html_extract import RelevantSentences, SentenceCollector, make_parser
+
+    picker = RelevantSentences(query, max_sentences=max_sentences)
+    collector = SentenceCollector(picker)
+    parser = make_parser(collector)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    bytes_read = 0
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if collector.done or bytes_read >= max_bytes:
+            break
+    if not collector.done:
+        try:
+            parser.close()
+        except Exception:
+            pass
+        collector.close()
+    return picker.sentences, collector.text_length
+
+
+def page_sentences(page):
+    """Every sentence of a page, as the collector emits them"""
+    from html_extract import SentenceCollector, make_parser
+
+    sentences = []
+    collector = SentenceCollector(lambda sentence: sentences.append(sentence) and False)
+    parser = make_parser(collector)
+    parser.feed(page.decode('utf-8'))
+    try:
+        parser.close()
+    except Exception:
+        pass
+    collector.close()
+    return sentences
+
+
+def legacy_select(sentences, query, max_sentences=4):
+    from html_extract import RelevantSentences
+
+    picker = RelevantSentences(query, max_sentences=max_sentences)
+    for sentence in sentences:
+        if picker(sentence):
+            break
+    return picker.sentences
+
+
+def legacy_scan(sentences, query, min_length=20):
+    """The old per-sentence substring test run over the whole page, as ranking must"""
+    words = query.lower().split()
+    return [
+        sentence for sentence in sentences
+        if len(sentence) > min_length and any(word in sentence.lower() for word in words)
+    ]
+
+
+def ranked_select(sentences, query, max_sentences=4, char_budget=800):
+    from snippets import SentenceIndex, tokenize
+
+    index = SentenceIndex(vocabulary=tokenize(query))
+    for sentence in sentences:
+        index.add(sentence)
+    return index.top(query, k=max_sentences, char_budget=char_budget)
+
+
+def run(repeat=7):
+    """{fixture: {'legacy': ..., 'ranked': ..., 'select_*': ...}}"""
+    import snippets
+    from benchmarks.stub_upstream import make_page
+    from html_extract import extract_from_chunks
+
+    results = {'numpy': snippets.np is not None}
+    pages = {}
+    for name, (query, phrase) in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            pages[name.rsplit('.', 1)[0]] = (f.read(), query, phrase)
+    query, phrase, paragraphs = GENERATED
+    pages['generated_large'] = (make_page(query, paragraphs).encode('utf-8'), query, phrase)
+
+    for name, (page, query, phrase) in pages.items():
+        chunks = [page[i:i + 16384] for i in range(0, len(page), 16384)]
+        sentences = page_sentences(page)
+
+        entry = {'page_bytes': len(page), 'sentences': len(sentences), 'query': query}
+        for label, extract in (('legacy', legacy_extract), ('ranked', extract_from_chunks)):
+            seen = [0]
+            answer, _ = extract(counted(chunks, seen), query)
+            text = ' '.join(answer)
+            entry[label] = dict(
+                measure(lambda: extract(iter(chunks), query), repeat),
+                chunks_read=seen[0],
+                found_answer=phrase in text,
+                answer=text[:300],
+            )
+        entry['select_legacy'] = measure(lambda: legacy_select(sentences, query), repeat)
+        entry['scan_legacy'] = measure(lambda: legacy_scan(sentences, query), repeat)
+        entry['select_ranked'] = measure(lambda: ranked_select(sentences, query), repeat)
+        results[name] = entry
+    return results
@@ -0,0 +1,129 @@
+# Save as: benchmarks/startup.py
+"""Cold-start costs: importing the app, and launching a server until it answers
+
+Each sample runs in a fresh interpreter in a scratch directory, so nothing
+is cached in sys.modules and no real user data is touched.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import chatbot_app; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def scratch_env(data_dir, stub_url=None):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['CHATBOT_USER_DATA_FILE'] = os.path.join(data_dir, 'missing.json')
+    env['CHATBOT_KNOWLEDGE_INDEX'] = os.path.join(data_dir, 'missing.db')
+    env['CHATBOT_TITLE_INDEX'] = os.path.join(data_dir, 'missing_titles.txt')
+    env['CHATBOT_TITLE_INDEX_LEARNED'] = os.path.join(data_dir, 'learned_titles.txt')
+    env['CHATBOT_SPELLING_INDEX'] = os.path.join(data_dir, 'spelling.idx')
+    env['CHATBOT_REQUEST_LOG'] = '0'
+    if stub_url:
+        env['CHATBOT_WIKIPEDIA_REST_URL'] = stub_url + '/api/rest_v1'
+        env['CHATBOT_WIKIPEDIA_API_URL'] = stub_url + '/w/api.php'
+    return env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def stats_ms(samples):
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'min_ms': round(samples[0] * 1000, 1),
+        'max_ms': round(samples[-1] * 1000, 1),
+    }
+
+
+def import_time(data_dir, runs=5):
+    """Seconds to import chatbot_app in a fresh interpreter"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET],
+            cwd=data_dir, env=scratch_env(data_dir), capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def get_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, response.read()
+    except OSError:
+        return None, b''
+
+
+def launch_once(data_dir, stub_url, timeout=30.0):
+    """Start serve.py with Flask's server; time the first 200 and the end of warmup"""
+    port = free_port()
+    env = scratch_env(data_dir, stub_url)
+    env.update({'CHATBOT_SERVER': 'flask', 'CHATBOT_PORT': str(port), 'CHATBOT_HOST': '127.0.0.1'})
+    base = f"http://127.0.0.1:{port}"
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'serve.py')],
+        cwd=data_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_ok = warm = None
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            status, body = get_status(base + '/healthz')
+            now = time.perf_counter()
+            if status == 200:
+                if first_ok is None:
+                    first_ok = now - started
+                if b'"warm":true' in body.replace(b' ', b''):
+                    warm = now - started
+                    break
+            time.sleep(0.01)
+        home_status, _ = get_status(base + '/')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return first_ok, warm, home_status
+
+
+def run(runs=5):
+    """Import time and time-to-first-200 / time-to-warm, as medians over runs"""
+    from benchmarks.stub_upstream import StubUpstream
+
+    with tempfile.TemporaryDirectory() as data_dir, StubUpstream() as stub:
+        imports = import_time(data_dir, runs)
+        first_ok, warm = [], []
+        for _ in range(runs):
+            ok, warmed, home_status = launch_once(data_dir, stub.url)
+            if ok is None or home_status != 200:
+                raise RuntimeError('server did not start')
+            first_ok.append(ok)
+            if warmed is not None:
+                warm.append(warmed)
+
+    return {
+        'import_chatbot_app': stats_ms(imports),
+        'time_to_first_200': stats_ms(first_ok),
+        'time_to_warm': stats_ms(warm) if warm else None,
+    }
@@ -0,0 +1,235 @@
+# Save as: benchmarks/stub_upstream.py
+"""Local stand-ins for Wikipedia and Google, with configurable latency and failures
+
+    python -m benchmarks.stub_upstream --port 8099 --latency 0.05 --failure-rate 0.1
+
+Serves the same URL shapes the bot calls:
+    /api/rest_v1/page/summary/<title>    Wikipedia REST summary
+    /w/api.php?action=opensearch&...     Wikipedia opensearch
+    /w/api.php?action=query&titles=...   Wikipedia multi-title extracts
+    /search?q=...                        Google-style list of result URLs
+    /page/<n>?q=...                      a result page (HTML)
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = (
+    "This paragraph is unrelated filler that pads the page the way navigation, "
+    "adverts and comment sections do on real sites. "
+)
+
+
+def make_page(query, paragraphs=200):
+    """A result page with a few relevant sentences buried in filler"""
+    relevant = (
+        f"<p>{query} is a widely studied subject with a long history. "
+        f"Researchers describe {query} in many textbooks and articles. "
+        f"The study of {query} continues to grow every year. "
+        f"Many people search for {query} online.</p>"
+    )
+    body = ''.join(f"<p>{FILLER * 3}</p>" for _ in range(paragraphs // 2))
+    body += relevant
+    body += ''.join(f"<p>{FILLER * 3}</p>" for _ in range(paragraphs // 2))
+    return (
+        "<html><head><title>Result</title><script>var tracking = 'a. b. c.';</script>"
+        "<style>body { margin: 0 }</style></head><body><nav>Home. About. Contact.</nav>"
+        f"{body}<footer>Copyright. All rights reserved.</footer></body></html>"
+    )
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """Clients hang up mid-page on purpose (streamed extraction); don't log that"""
+
+    def handle_error(self, request, client_address):
+        import sys
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubUpstream:
+    """Threaded HTTP server answering like Wikipedia and Google
+
+    latency: seconds added to every response; failure_rate: share of
+    requests answered with a 503; missing: titles that 404.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0,
+                 missing=(), page_paragraphs=200, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.missing = {title.lower() for title in missing}
+        self.page_paragraphs = page_paragraphs
+        self.requests = Counter()  # endpoint -> count
+        self.connections = set()  # client (host, port) pairs seen
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._server = _QuietServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests.clear()
+            self.connections.clear()
+
+    def upstream_calls(self):
+        """Total requests served, across every endpoint"""
+        with self._lock:
+            return sum(self.requests.values())
+
+    def configure_bot(self, bot):
+        """Point a SmartChatBot (and config) at this stub instead of the internet"""
+        import config
+        config.WIKIPEDIA_REST_URL = self.url + '/api/rest_v1'
+        config.WIKIPEDIA_API_URL = self.url + '/w/api.php'
+        bot.web_search = self.search
+        return bot
+
+    def search(self, query, num_results=3, lang='en'):
+        """Drop-in replacement for googlesearch.search that asks the stub"""
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.get(self.url + '/search', params={'q': query, 'n': num_results}, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    # Request handling
+
+    def _record(self, endpoint, client_address):
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.connections.add(client_address)
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        return fail
+
+    def _summary(self, title):
+        if title.lower() in self.missing:
+            return 404, {'type': 'https://mediawiki.org/wiki/HyperSwitch/errors/not_found'}
+        return 200, {
+            'type': 'standard',
+            'title': title,
+            'extract': f"{title} is a topic served by the local stub upstream. "
+                       f"It exists so benchmarks never touch the real Wikipedia.",
+            'content_urls': {'desktop': {'page': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"}},
+        }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json'):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode('utf-8') if content_type == 'application/json' else body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type + '; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                params = urllib.parse.parse_qs(parsed.query)
+                path = parsed.path
+
+                if path.startswith('/api/rest_v1/page/summary/'):
+                    endpoint = 'wikipedia_summary'
+                elif path == '/w/api.php':
+                    endpoint = 'wikipedia_' + params.get('action', ['unknown'])[0]
+                elif path == '/search':
+                    endpoint = 'google_search'
+                elif path.startswith('/page/'):
+                    endpoint = 'google_page'
+                else:
+                    endpoint = 'unknown'
+
+                fail = stub._record(endpoint, self.client_address)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if fail:
+                    self._send(503, {'error': 'stub failure'})
+                    return
+
+                if endpoint == 'wikipedia_summary':
+                    title = urllib.parse.unquote(path.rsplit('/', 1)[1]).replace('_', ' ')
+                    status, body = stub._summary(title)
+                    self._send(status, body)
+                elif endpoint == 'wikipedia_opensearch':
+                    query = params.get('search', [''])[0]
+                    titles = [] if query.lower() in stub.missing else [query]
+                    self._send(200, [query, titles, [], [f"https://en.wikipedia.org/wiki/{t}" for t in titles]])
+                elif endpoint == 'wikipedia_query':
+                    titles = params.get('titles', [''])[0].split('|')
+                    pages = {}
+                    for i, title in enumerate(titles):
+                        status, summary = stub._summary(title)
+                        if status == 200:
+                            pages[str(i + 1)] = {'pageid': i + 1, 'title': title, 'extract': summary['extract']}
+                        else:
+                            pages[str(-i - 1)] = {'title': title, 'missing': ''}
+                    self._send(200, {'batchcomplete': '', 'query': {'pages': pages}})
+                elif endpoint == 'google_search':
+                    query = params.get('q', [''])[0]
+                    count = int(params.get('n', ['3'])[0])
+                    quoted = urllib.parse.quote(query)
+                    self._send(200, [f"{stub.url}/page/{i}?q={quoted}" for i in range(count)])
+                elif endpoint == 'google_page':
+                    query = params.get('q', [''])[0]
+                    self._send(200, make_page(query, stub.page_paragraphs), 'text/html')
+                else:
+                    self._send(404, {'error': 'not found'})
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the fake Wikipedia/Google upstream')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of requests answered with 503')
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.host, args.port, args.latency, args.failure_rate)
+    print(f"🧪 Stub upstream at {stub.url} (latency {args.latency}s, failures {args.failure_rate:.0%})")
+    print(f"   CHATBOT_WIKIPEDIA_REST_URL={stub.url}/api/rest_v1")
+    print(f"   CHATBOT_WIKIPEDIA_API_URL={stub.url}/w/api.php")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
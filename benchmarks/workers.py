@@ -0,0 +1,92 @@
+# Save as: benchmarks/workers.py
+"""Upstream calls from several worker processes, with and without the shared answer cache
+
+Each worker process runs its own SmartChatBot, as a gunicorn worker
+would, and answers the same popular questions in its own shuffled order
+(a load balancer spreads repeat questions over every worker). The stub
+upstream counts every request that reaches it. Without the shared cache
+each worker fetches every topic itself, so upstream calls grow with the
+worker count. With it, one worker fetches each topic and the others read
+the answer or wait for it.
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+
+def _worker(stub, shared_path, topics, threads, seed, barrier, results):
+    """One worker process: a fresh bot answering every topic, `threads` at a time"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import config
+    config.KNOWLEDGE_INDEX_PATH = ''
+    config.ANSWER_CACHE_PATH = ''
+    config.TITLE_INDEX_PATH = ''
+    config.TITLE_INDEX_LEARNED = 'off'
+    config.SPELLING_INDEX_PATH = 'off'
+    config.SHARED_CACHE_PATH = shared_path or 'off'
+
+    from smart_chatbot import SmartChatBot
+    bot = stub.configure_bot(SmartChatBot())
+
+    questions = list(topics)
+    random.Random(seed).shuffle(questions)
+    barrier.wait()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        answers = list(pool.map(bot.get_answer, questions))
+    shared = bot.cache.shared.stats() if bot.cache.shared is not None else {}
+    results.put({'answered': sum(1 for answer in answers if answer), 'waits': shared.get('waits', 0)})
+
+
+def run_workers(stub, workers, shared_path, topics, threads=4):
+    """Start `workers` processes on one batch of topics; upstream calls and timing"""
+    context = multiprocessing.get_context('fork')  # workers inherit the stub's address
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(stub, shared_path, topics, threads, seed, barrier, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()  # every worker has built its bot
+    stub.reset_counters()
+    started = time.perf_counter()
+    reports = [results.get(timeout=300) for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    calls = stub.upstream_calls()
+    questions = workers * len(topics)
+    return {
+        'workers': workers,
+        'questions': questions,
+        'answered': sum(report['answered'] for report in reports),
+        'upstream_calls': calls,
+        'calls_per_question': round(calls / questions, 3),
+        'upstream_calls_per_s': round(calls / elapsed, 1),
+        'waited_on_other_worker': sum(report['waits'] for report in reports),
+        'elapsed_s': round(elapsed, 3),
+    }
+
+
+def run(worker_counts=(1, 2, 4, 8), topics=40, latency=0.05):
+    """{'shared_off': [...], 'shared_on': [...]}, one entry per worker count"""
+    from benchmarks.stub_upstream import StubUpstream
+
+    report = {'settings': {'topics': topics, 'upstream_latency_s': latency}}
+    with tempfile.TemporaryDirectory() as data_dir, StubUpstream(latency=latency, page_paragraphs=100) as stub:
+        for label in ('shared_off', 'shared_on'):
+            rows = []
+            for workers in worker_counts:
+                shared_path = None
+                if label == 'shared_on':
+                    shared_path = os.path.join(data_dir, f"answers-{workers}.cache")
+                # New topic names each round, so no earlier round's answers help
+                batch = [f"Worker Topic {workers} {label} {i}" for i in range(topics)]
+                rows.append(run_workers(stub, workers, shared_path, batch))
+            report[label] = rows
+    return report
@@ -1,143 +1,316 @@
 # Save as: chatbot_app.py
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
+import atexit
+import bisect
+import hashlib
 import json
-import os
+import threading
+import time
 from datetime import datetime
 # from wikipedia_chatbot import WikipediaChatBot  # Import our new Wikipedia chatbot
 # from ai_chatbot import AIChatBot 
 from smart_chatbot import SmartChatBot
+from admission import Overloaded
+from user_store import open_user_store
+from history_archive import open_archive, entry_epoch
+from retention import RetentionSweeper
+from sessions import SessionManager
+import metrics
+import config
 
 app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'  # Change this for production
+app.secret_key = config.SECRET_KEY  # Set CHATBOT_SECRET_KEY in production
 
 # Initialize Wikipedia chatbot
 # bot = WikipediaChatBot()
 bot = SmartChatBot()
 
-# User data file
-USER_DATA_FILE = 'users_data.json'
+# Per-user conversation state; the bot above is shared and stateless
+sessions = SessionManager(
+    max_sessions=config.MAX_SESSIONS,
+    ttl=config.SESSION_TTL
+)
+
+# User data store (SQLite by default, see config.py); saves are written
+# behind the response unless CHATBOT_WRITE_BEHIND=0 (serve.py sets it for 2+ workers)
+store = open_user_store()
+atexit.register(store.close)  # drains pending saves
+
+# Messages older than the hot window move into compressed blocks here
+archive = open_archive()
+
+# Expires empty and idle user records and compacts the store on a schedule
+sweeper = RetentionSweeper(
+    store, archive,
+    is_active=lambda user_id: user_id in sessions,
+    interval=config.RETENTION_INTERVAL,
+    empty_after=config.RETENTION_EMPTY_HOURS * 3600,
+    idle_after=config.RETENTION_IDLE_DAYS * 86400
+)
+if config.RETENTION_INTERVAL > 0:
+    sweeper.start()
+
+# Scrape-time gauges for /metrics
+metrics.registry.gauge('chatbot_active_sessions', 'Sessions held in memory', lambda: len(sessions))
+metrics.registry.gauge('chatbot_lookups_in_flight', 'Distinct upstream lookups running', bot.flights.in_flight)
+metrics.registry.counter_from('chatbot_lookups_shared_total', 'Callers served by another caller\'s lookup', lambda: bot.flights.shared)
+for _key, _help in (
+    ('memory_hits', 'Answers served from the memory cache'),
+    ('shared_hits', 'Answers served from the cache shared by worker processes'),
+    ('disk_hits', 'Answers served from the disk cache'),
+    ('misses', 'Answer cache misses'),
+    ('evictions', 'Answers evicted from the memory cache'),
+):
+    metrics.registry.counter_from(f'chatbot_cache_{_key}_total', _help, lambda key=_key: bot.cache.stats()[key])
+metrics.registry.gauge('chatbot_cache_bytes', 'Bytes held by the memory cache', lambda: bot.cache.stats()['bytes'])
+metrics.registry.counter_from('chatbot_cache_negative_hits_total', 'Lookups skipped because the topic recently had no answer', lambda: bot.cache.negative_hits)
+if bot.cache.shared is not None:
+    metrics.registry.counter_from('chatbot_shared_cache_waits_total', 'Lookups that waited for another worker\'s fetch instead of calling upstream', lambda: bot.cache.shared.waits)
+    metrics.registry.counter_from('chatbot_shared_cache_evictions_total', 'Live answers evicted from the shared cache', lambda: bot.cache.shared.evictions)
+metrics.registry.gauge(
+    'chatbot_breaker_open', '1 while an upstream\'s circuit breaker is open or half-open',
+    lambda: {name: int(breaker.state != 'closed') for name, breaker in bot.breakers.items()}, ('upstream',))
+metrics.registry.counter_from(
+    'chatbot_breaker_rejected_total', 'Calls failed fast by an open circuit breaker',
+    lambda: {name: breaker.rejected for name, breaker in bot.breakers.items()}, ('upstream',))
+metrics.registry.counter_from(
+    'chatbot_breaker_opened_total', 'Times an upstream\'s circuit breaker has opened',
+    lambda: {name: breaker.opened for name, breaker in bot.breakers.items()}, ('upstream',))
+metrics.registry.gauge('chatbot_admission_queue_depth', 'Upstream lookups waiting for a slot', bot.scheduler.queue_depth)
+metrics.registry.gauge('chatbot_admission_running', 'Upstream lookups holding a slot', lambda: bot.scheduler.running)
+metrics.registry.counter_from('chatbot_admission_queued_total', 'Lookups admitted after waiting in the queue (wait times: chatbot_span_seconds{span="admission_wait"})', lambda: bot.scheduler.queued)
+metrics.registry.counter_from(
+    'chatbot_admission_shed_total', 'Lookups turned away with a busy reply',
+    lambda: dict(bot.scheduler.shed), ('reason',))
+metrics.registry.counter_from(
+    'chatbot_upstream_rate_limited_total', 'Upstream calls refused because the request budget was spent',
+    lambda: {name: bucket.rejected for name, bucket in bot.scheduler.buckets.items()}, ('upstream',))
+if hasattr(store, 'pending'):
+    metrics.registry.gauge('chatbot_user_writes_pending', 'User saves waiting for the write-behind flush', store.pending)
+    metrics.registry.counter_from('chatbot_user_write_flushes_total', 'Write-behind batches written', lambda: store.flushes)
+    metrics.registry.counter_from('chatbot_user_writes_coalesced_total', 'Saves merged into a later save before reaching disk', lambda: store.coalesced)
+
+metrics.registry.counter_from(
+    'chatbot_retention_records_reclaimed_total', 'User records removed by the retention sweeper',
+    lambda: dict(sweeper.reclaimed), ('reason',))
+metrics.registry.counter_from('chatbot_retention_bytes_reclaimed_total', 'Disk space freed by retention sweeps', lambda: sweeper.bytes_reclaimed)
+metrics.registry.counter_from('chatbot_retention_sweeps_total', 'Retention sweeps completed', lambda: sweeper.sweeps)
+metrics.registry.gauge('chatbot_retention_last_sweep_seconds', 'Duration of the last retention sweep', lambda: sweeper.last_duration)
+
+if config.PROFILE_PATH:
+    metrics.start_profiler(config.PROFILE_PATH, config.PROFILE_INTERVAL)
 
 def load_user_data(user_id):
-    """Load user data from file"""
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-                return data.get(user_id, {})
-            except:
-                return {}
-    return {}
+    """Load user data from the store"""
+    if not user_id:
+        return {}
+    with metrics.span('user_load'):
+        return store.get(user_id) or {}
 
 def save_user_data(user_id, user_data):
-    """Save user data to file"""
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
-            try:
-                all_data = json.load(f)
-            except:
-                all_data = {}
-    else:
-        all_data = {}
+    """Save user data to the store; the first save creates the record"""
+    if not user_id:
+        return  # nothing to key the record on
+    user_data.setdefault('username', None)
+    user_data.setdefault('chat_history', [])
+    user_data.setdefault('created_at', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    user_data['last_active'] = int(time.time())  # read by the retention sweeper
+    with metrics.span('user_save'):
+        store.put(user_id, user_data)
+
+warm = threading.Event()
+
+def start_warmup():
+    """Warm the bot up in the background; the server can accept requests meanwhile"""
+    if not config.WARMUP:
+        warm.set()
+        return
     
-    all_data[user_id] = user_data
+    def run():
+        try:
+            bot.warmup()
+        except Exception as e:
+            print(f"⚠️ Warmup failed: {e}")
+        finally:
+            warm.set()
     
-    with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, indent=2, ensure_ascii=False)
+    threading.Thread(target=run, name='warmup', daemon=True).start()
 
-@app.route('/')
-def home():
-    """Render the main chat page"""
-    # Initialize session if not exists
-    if 'user_id' not in session:
+def after_fork():
+    """Give a forked server worker its own database and network handles"""
+    store.reopen()
+    bot.reopen()
+    if archive is not None:
+        archive.reopen()
+    if config.RETENTION_INTERVAL > 0:
+        sweeper.reopen()
+    if config.PROFILE_PATH:
+        metrics.start_profiler(config.PROFILE_PATH, config.PROFILE_INTERVAL)
+    start_warmup()
+
+@app.before_request
+def start_request_trace():
+    metrics.start_trace()
+
+@app.after_request
+def finish_request_trace(response):
+    """Record latency once the response is closed, so streamed replies count in full"""
+    trace = metrics.current_trace()
+    if trace is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    status = response.status_code
+    
+    def finish():
+        metrics.end_trace()
+        elapsed = trace.elapsed()
+        metrics.REQUEST_SECONDS.observe(elapsed, route=route, method=method)
+        metrics.REQUESTS.inc(route=route, method=method, status=status)
+        if config.REQUEST_LOG and route not in ('/metrics', '/healthz'):
+            print(json.dumps({
+                'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'method': method,
+                'route': route,
+                'status': status,
+                'ms': round(elapsed * 1000, 2),
+                'spans': trace.breakdown()
+            }), flush=True)
+    
+    response.call_on_close(finish)
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness probe: 200 once the app is serving, with the warmup state"""
+    return jsonify({'status': 'ok', 'warm': warm.is_set()})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.registry.render(), mimetype=None, content_type=metrics.Registry.CONTENT_TYPE)
+
+def ensure_user_id():
+    """The session's user id, starting a session for clients that never loaded the page"""
+    if not session.get('user_id'):
         import uuid
         session['user_id'] = str(uuid.uuid4())
         session['username'] = None
+    return session['user_id']
+
+@app.route('/')
+def home():
+    """Render the main chat page"""
+    ensure_user_id()
     
-    # Load user data
+    # Load user data; the record is only created by the first real write
     user_data = load_user_data(session['user_id'])
-    if not user_data:
-        user_data = {
-            'username': None,
-            'chat_history': [],
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        save_user_data(session['user_id'], user_data)
     
     # Set username if available
     if user_data.get('username'):
         session['username'] = user_data['username']
-        bot.user_name = user_data['username']  # Pass username to bot
+        sessions.get(session['user_id']).user_name = user_data['username']
     
     return render_template('index.html', username=session['username'])
 
+def ensure_message_ids(user_data):
+    """Give every stored message a stable id (older records predate ids)"""
+    history = user_data.get('chat_history', [])
+    next_id = user_data.get('next_id', 1)
+    for entry in history:
+        if 'id' not in entry:
+            entry['id'] = next_id
+            next_id += 1
+    user_data['next_id'] = next_id
+
+def add_chat_entry(user_id, user_data, user_message, bot_response):
+    """Append one exchange to the user's chat history"""
+    ensure_message_ids(user_data)
+    timestamp = datetime.now().strftime("%H:%M")
+    chat_entry = {
+        'id': user_data['next_id'],
+        'timestamp': timestamp,
+        'user': user_message,
+        'bot': bot_response,
+        'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    user_data['chat_history'] = user_data.get('chat_history', [])
+    user_data['chat_history'].append(chat_entry)
+    user_data['next_id'] += 1
+    trim_history(user_id, user_data)
+
+def trim_history(user_id, user_data):
+    """Keep the newest messages in the record; archive (or drop) the rest"""
+    history = user_data['chat_history']
+    hot = config.HISTORY_HOT_SIZE
+    if archive is None:
+        if len(history) > hot:
+            user_data['chat_history'] = history[-hot:]
+        return
+    
+    # Archive a whole block at a time so blocks compress well
+    if len(history) >= hot + config.HISTORY_ARCHIVE_BLOCK:
+        archive.append(user_id, history[:-hot])
+        user_data['chat_history'] = history[-hot:]
+
+def handle_name_message(user_message, user_data, state):
+    """Reply to "my name is ..." for users without a name yet, else None"""
+    routes = bot.router.scan(user_message)
+    if not bot.is_name_message(user_message, routes) or user_data.get('username'):
+        return None
+    
+    # Extract name from message
+    name = bot.extract_name(user_message, routes)
+    if not name:
+        return None
+    
+    user_data['username'] = name
+    session['username'] = name
+    state.user_name = name
+    
+    # Create welcome response
+    return f"Nice to meet you, {name}! 😊 I'm your Wikipedia-powered chatbot. Ask me anything!"
+
+def sse_event(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages"""
     try:
         user_message = request.json.get('message', '').strip()
-        user_id = session.get('user_id')
+        user_id = ensure_user_id()
         
         if not user_message:
             return jsonify({'error': 'Empty message'})
         
         # Load user data
         user_data = load_user_data(user_id)
+        state = sessions.get(user_id)
         
         # Check if message is setting a name
-        if bot.is_name_message(user_message) and not user_data.get('username'):
-            # Extract name from message
-            name = bot.extract_name(user_message)
-            if name:
-                user_data['username'] = name
-                session['username'] = name
-                bot.user_name = name
-                save_user_data(user_id, user_data)
-                
-                # Create welcome response
-                bot_response = f"Nice to meet you, {name}! 😊 I'm your Wikipedia-powered chatbot. Ask me anything!"
-                
-                # Save to chat history
-                timestamp = datetime.now().strftime("%H:%M")
-                chat_entry = {
-                    'timestamp': timestamp,
-                    'user': user_message,
-                    'bot': bot_response,
-                    'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                user_data['chat_history'] = user_data.get('chat_history', [])
-                user_data['chat_history'].append(chat_entry)
-                save_user_data(user_id, user_data)
-                
-                return jsonify({
-                    'response': bot_response,
-                    'username': name
-                })
+        bot_response = handle_name_message(user_message, user_data, state)
+        if bot_response:
+            add_chat_entry(user_id, user_data, user_message, bot_response)
+            save_user_data(user_id, user_data)
+            
+            return jsonify({
+                'response': bot_response,
+                'username': user_data['username']
+            })
         
         # Process message through Wikipedia chatbot
-        bot_response = bot.process_message(user_message)
+        bot_response = bot.process_message(user_message, state)
         
         # Save to chat history
-        timestamp = datetime.now().strftime("%H:%M")
-        chat_entry = {
-            'timestamp': timestamp,
-            'user': user_message,
-            'bot': bot_response,
-            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        user_data['chat_history'] = user_data.get('chat_history', [])
-        user_data['chat_history'].append(chat_entry)
-        
-        # Keep only last 100 messages
-        if len(user_data['chat_history']) > 100:
-            user_data['chat_history'] = user_data['chat_history'][-100:]
-        
+        add_chat_entry(user_id, user_data, user_message, bot_response)
         save_user_data(user_id, user_data)
         
-        # Update bot's user name if we have one
+        # Update the session's user name if we have one
         if user_data.get('username'):
-            bot.user_name = user_data['username']
+            state.user_name = user_data['username']
         
         return jsonify({
             'response': bot_response,
@@ -153,14 +326,145 @@ def chat():
             'response': "Sorry, I encountered an error. Please try again! 😊"
         })
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming the reply as Server-Sent Events"""
+    user_message = (request.json or {}).get('message', '').strip()
+    user_id = ensure_user_id()
+    
+    if not user_message:
+        return jsonify({'error': 'Empty message'})
+    
+    # Load user data
+    user_data = load_user_data(user_id)
+    state = sessions.get(user_id)
+    username = session.get('username')
+    
+    # Name replies are instant, and must set the session before streaming starts
+    name_response = handle_name_message(user_message, user_data, state)
+    if name_response:
+        username = user_data['username']
+    
+    def generate():
+        try:
+            if name_response:
+                events = [('done', {'response': name_response})]
+            else:
+                events = bot.stream_message(user_message, state)
+            
+            for event, data in events:
+                if event == 'done':
+                    # Save to chat history before telling the client we're finished
+                    add_chat_entry(user_id, user_data, user_message, data['response'])
+                    save_user_data(user_id, user_data)
+                    data = dict(data, username=username)
+                yield sse_event(event, data)
+        
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield sse_event('error', {'response': "Sorry, I encountered an error. Please try again! 😊"})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # stop nginx from buffering the stream
+    })
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Answer a list of messages in one request (for tools; no chat history is kept)"""
+    messages = (request.get_json(silent=True) or {}).get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'Send {"messages": [...]}'}), 400
+    if len(messages) > config.BATCH_MAX_MESSAGES:
+        return jsonify({'error': f'At most {config.BATCH_MAX_MESSAGES} messages per batch'}), 413
+    
+    try:
+        results = bot.process_messages(messages)
+    except Exception as e:
+        print(f"Error in batch endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    return jsonify({'results': results})
+
+def history_etag(user_id, user_data, before, limit, since=None, until=None):
+    """Validator that changes whenever the requested page could change"""
+    history = user_data.get('chat_history', [])
+    newest = history[-1]['id'] if history else 0
+    key = f"{user_id}:{user_data.get('next_id', 1)}:{len(history)}:{newest}:{before}:{limit}:{since}:{until}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+def history_page(user_id, user_data, before, limit):
+    """One page of history ending before id `before`, reaching into the archive
+
+    Without a limit the page is everything before `before`, archive included.
+    """
+    history = user_data.get('chat_history', [])
+    if before is not None:
+        # ids only grow, so the page ends at the first id >= before
+        end = bisect.bisect_left([entry['id'] for entry in history], before)
+        history = history[:end]
+    if limit is not None and len(history) > limit:
+        return history[-limit:], True
+    
+    if archive is not None:
+        # Everything archived is older than the hot window
+        cursor = history[0]['id'] if history else (before if before is not None else user_data.get('next_id', 1))
+        wanted = None if limit is None else limit - len(history)
+        history = archive.before(user_id, cursor, wanted) + history
+        has_more = limit is not None and bool(history) and archive.has_before(user_id, history[0]['id'])
+        return history, has_more
+    return history, False
+
+def history_between(user_id, user_data, since, until, before, limit):
+    """History in a time range (epoch seconds), newest `limit` entries"""
+    history = user_data.get('chat_history', [])
+    lo = since if since is not None else 0
+    hi = until if until is not None else float('inf')
+    entries = [entry for entry in history if lo <= entry_epoch(entry) <= hi]
+    if archive is not None:
+        first_hot = history[0]['id'] if history else user_data.get('next_id', 1)
+        older = [entry for entry in archive.between(user_id, since, until) if entry['id'] < first_hot]
+        entries = older + entries
+    if before is not None:
+        entries = [entry for entry in entries if entry['id'] < before]
+    if limit is not None and len(entries) > limit:
+        return entries[-limit:], True
+    return entries, False
+
 @app.route('/history', methods=['GET'])
 def get_history():
-    """Get chat history"""
+    """Get chat history, one page at a time (?before=<id>&limit=N) or by time (?since=&until=)"""
     user_id = session.get('user_id')
-    if user_id:
-        user_data = load_user_data(user_id)
-        return jsonify({'history': user_data.get('chat_history', [])})
-    return jsonify({'history': []})
+    if not user_id:
+        return jsonify({'history': [], 'has_more': False})
+    
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, 100))
+    since = request.args.get('since', type=int)
+    until = request.args.get('until', type=int)
+    
+    user_data = load_user_data(user_id)
+    ensure_message_ids(user_data)
+    
+    # Answer revalidations before building the page
+    etag = history_etag(user_id, user_data, before, limit, since, until)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        if since is not None or until is not None:
+            history, has_more = history_between(user_id, user_data, since, until, before, limit)
+        else:
+            history, has_more = history_page(user_id, user_data, before, limit)
+        response = jsonify({
+            'history': history,
+            'has_more': has_more,
+            'next_before': history[0]['id'] if history and has_more else None
+        })
+    
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/clear', methods=['POST'])
 def clear_history():
@@ -168,8 +472,12 @@ def clear_history():
     user_id = session.get('user_id')
     if user_id:
         user_data = load_user_data(user_id)
-        user_data['chat_history'] = []
-        save_user_data(user_id, user_data)
+        if user_data:  # nothing stored yet means nothing to clear
+            ensure_message_ids(user_data)  # ids keep counting up after a clear
+            user_data['chat_history'] = []
+            save_user_data(user_id, user_data)
+        if archive is not None:
+            archive.delete_user(user_id)
         return jsonify({'success': True})
     return jsonify({'success': False})
 
@@ -184,22 +492,12 @@ def update_username():
             user_data = load_user_data(user_id)
             user_data['username'] = username
             session['username'] = username
-            bot.user_name = username
-            save_user_data(user_id, user_data)
+            sessions.get(user_id).user_name = username
             
             bot_response = f"Nice to meet you, {username}! 😊 I'm your Wikipedia-powered chatbot. Ask me anything!"
             
             # Add welcome message to history
-            timestamp = datetime.now().strftime("%H:%M")
-            chat_entry = {
-                'timestamp': timestamp,
-                'user': f"My name is {username}",
-                'bot': bot_response,
-                'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            user_data['chat_history'] = user_data.get('chat_history', [])
-            user_data['chat_history'].append(chat_entry)
+            add_chat_entry(user_id, user_data, f"My name is {username}", bot_response)
             save_user_data(user_id, user_data)
             
             return jsonify({
@@ -255,12 +553,15 @@ Just ask questions like:
 def search_topic():
     """Direct search endpoint for Wikipedia"""
     try:
-        topic = request.json.get('topic', '').strip()
+        topic = (request.get_json(silent=True) or {}).get('topic', '').strip()
         if not topic:
-            return jsonify({'error': 'No topic provided'})
+            return jsonify({'error': 'No topic provided'}), 400
         
-        # Use the bot's Wikipedia search
-        response = bot.search_wikipedia(topic)
+        # Straight to the lookup, skipping intent routing and chat history
+        try:
+            response = bot.search_wikipedia(topic)
+        except Overloaded:
+            return jsonify({'success': False, 'error': 'Too busy', 'response': bot.get_busy_response(topic)}), 503, {'Retry-After': '2'}
         
         return jsonify({
             'success': True,
@@ -269,7 +570,17 @@ def search_topic():
         
     except Exception as e:
         print(f"Error in search endpoint: {e}")
-        return jsonify({'success': False, 'error': 'Search failed'})
+        return jsonify({'success': False, 'error': 'Search failed'}), 500
+
+@app.route('/suggest', methods=['GET'])
+def suggest_titles():
+    """Title completions for autocomplete, served from the in-memory title index"""
+    prefix = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', config.SUGGEST_LIMIT)), 1), 20)
+    except ValueError:
+        limit = config.SUGGEST_LIMIT
+    return jsonify({'query': prefix, 'suggestions': bot.suggest(prefix, limit)})
 
 @app.route('/stats', methods=['GET'])
 def get_stats():
@@ -279,10 +590,17 @@ def get_stats():
         user_data = load_user_data(user_id) if user_id else {}
         
         stats = {
-            'total_conversations': len(bot.conversation_history) if hasattr(bot, 'conversation_history') else 0,
+            'total_conversations': len(sessions.get(user_id).history) if user_id else 0,
             'user_messages': len(user_data.get('chat_history', [])),
             'username': user_data.get('username'),
-            'since': user_data.get('created_at', 'Unknown')
+            'since': user_data.get('created_at', 'Unknown'),
+            'cache': bot.cache.stats(),
+            'coalescing': bot.flights.stats(),
+            'breakers': {name: breaker.stats() for name, breaker in bot.breakers.items()},
+            'admission': bot.scheduler.stats(),
+            'titles': bot.titles.stats(),
+            'retention': sweeper.stats(),
+            'active_sessions': len(sessions)
         }
         
         return jsonify(stats)
@@ -294,5 +612,7 @@ def get_stats():
 if __name__ == '__main__':
     print("🤖 Starting Wikipedia ChatBot Server...")
     print("📚 Powered by Wikipedia API")
-    print("🌐 Server will run at: http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    print(f"🌐 Server will run at: http://{config.HOST}:{config.PORT}")
+    print("💡 For production use: python serve.py")
+    start_warmup()
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.PORT)
\ No newline at end of file
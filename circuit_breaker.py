@@ -0,0 +1,134 @@
+# Save as: circuit_breaker.py
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+class UpstreamError(Exception):
+    """An upstream answered, but with a failure (429, 5xx)"""
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing, and probes it for recovery
+
+    Closed: calls go through; outcomes from the last `window` seconds are
+    kept. Once at least min_calls are recorded and the share of failures
+    reaches error_rate, the breaker opens.
+
+    Open: calls fail at once with CircuitOpenError for open_seconds.
+
+    Half-open: up to probes calls go through. A success closes the
+    breaker and clears its history; a failure opens it again.
+    """
+
+    def __init__(self, name, error_rate=0.5, min_calls=5, window=30.0, open_seconds=30.0, probes=1):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.opened = 0  # times the breaker has tripped
+        self.rejected = 0  # calls failed fast while open
+        self._outcomes = deque()  # (monotonic time, ok)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_out = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the upstream now (counts half-open probes)"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_out = 0
+            if self.state == HALF_OPEN:
+                if self._probes_out >= self.probes:
+                    self.rejected += 1
+                    return False
+                self._probes_out += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._close()
+                return
+            self._record(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._record(False)
+            total = len(self._outcomes)
+            if total >= self.min_calls and self._failures / total >= self.error_rate:
+                self._open()
+
+    def release(self):
+        """Hand back a call that was allowed but ended with neither outcome"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_out:
+                self._probes_out -= 1
+
+    def _record(self, ok):
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            if not self._outcomes.popleft()[1]:
+                self._failures -= 1
+
+    def _open(self):
+        if self.state != OPEN:
+            print(f"🚧 Circuit open for {self.name}; failing fast for {self.open_seconds:.0f}s")
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+
+    def _close(self):
+        print(f"✅ Circuit closed for {self.name}")
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker; any exception it raises counts as a failure"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Interrupted (KeyboardInterrupt, a worker timeout's SystemExit):
+            # says nothing about the upstream, but a probe must not stay out
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,140 @@
+# Save as: config.py
+import os
+
+
+def env_str(name, default):
+    """Read a string setting from the environment"""
+    value = os.environ.get(name)
+    return value if value not in (None, '') else default
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    """Read a float setting from the environment"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default=False):
+    """Read a yes/no setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# User data storage
+USER_DATA_FILE = env_str('CHATBOT_USER_DATA_FILE', 'users_data.json')  # legacy JSON file
+USER_STORE_BACKEND = env_str('CHATBOT_USER_STORE', 'sqlite')  # 'sqlite' or 'log'
+USER_STORE_PATH = env_str('CHATBOT_USER_STORE_PATH', '')  # defaults per backend
+
+# Answer cache in front of SmartChatBot.get_answer
+ANSWER_CACHE_TTL = env_int('CHATBOT_ANSWER_CACHE_TTL', 3600)  # seconds in memory
+ANSWER_CACHE_MAX_BYTES = env_int('CHATBOT_ANSWER_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+ANSWER_CACHE_PATH = env_str('CHATBOT_ANSWER_CACHE_PATH', '')  # empty = no disk tier
+ANSWER_CACHE_DISK_TTL = env_int('CHATBOT_ANSWER_CACHE_DISK_TTL', 7 * 24 * 3600)
+NEGATIVE_CACHE_TTL = env_int('CHATBOT_NEGATIVE_CACHE_TTL', 300)  # seconds to remember "not found"; 0 = off
+NEGATIVE_CACHE_MAX_BYTES = env_int('CHATBOT_NEGATIVE_CACHE_MAX_BYTES', 512 * 1024)
+SHARED_CACHE_PATH = env_str('CHATBOT_SHARED_CACHE', 'auto')  # file every worker maps; 'auto' = serve.py picks one for 2+ workers, 'off' disables
+SHARED_CACHE_MAX_BYTES = env_int('CHATBOT_SHARED_CACHE_MAX_BYTES', 32 * 1024 * 1024)  # fixed file size
+SHARED_CACHE_SLOT_BYTES = env_int('CHATBOT_SHARED_CACHE_SLOT_BYTES', 4096)  # largest answer it holds
+SHARED_CACHE_LEASE = env_float('CHATBOT_SHARED_CACHE_LEASE', 15.0)  # seconds other workers wait on one fetch
+
+# Retrieval engine
+RETRIEVAL_MODE = env_str('CHATBOT_RETRIEVAL_MODE', 'race')  # 'race' or 'sequential'
+RETRIEVAL_DEADLINE = env_float('CHATBOT_RETRIEVAL_DEADLINE', 12.0)  # seconds per message
+RETRIEVAL_WORKERS = env_int('CHATBOT_RETRIEVAL_WORKERS', 8)  # raised to fit every admitted lookup's providers
+GOOGLE_HEAD_START = env_float('CHATBOT_GOOGLE_HEAD_START', 0.5)  # race mode: seconds Google waits for Wikipedia to miss
+REQUEST_TIMEOUT = env_float('CHATBOT_REQUEST_TIMEOUT', 10.0)  # seconds per HTTP call
+
+# Circuit breakers, one per upstream (see circuit_breaker.py)
+BREAKER_ERROR_RATE = env_float('CHATBOT_BREAKER_ERROR_RATE', 0.5)  # failure share that opens the breaker
+BREAKER_MIN_CALLS = env_int('CHATBOT_BREAKER_MIN_CALLS', 5)  # calls in the window before it can open
+BREAKER_WINDOW = env_float('CHATBOT_BREAKER_WINDOW', 30.0)  # seconds of outcomes considered
+BREAKER_OPEN_SECONDS = env_float('CHATBOT_BREAKER_OPEN_SECONDS', 30.0)  # fail fast this long before probing
+
+# Admission control for lookups that go upstream (see admission.py); limits are per process
+ADMISSION_MAX_RUNNING = env_int('CHATBOT_ADMISSION_MAX_RUNNING', 8)  # lookups calling upstreams at once
+ADMISSION_MAX_QUEUE = env_int('CHATBOT_ADMISSION_MAX_QUEUE', 32)  # lookups waiting for a slot; more are shed at once
+ADMISSION_MAX_WAIT = env_float('CHATBOT_ADMISSION_MAX_WAIT', 3.0)  # seconds a lookup may wait before it is shed
+UPSTREAM_RATE_WIKIPEDIA = env_float('CHATBOT_UPSTREAM_RATE_WIKIPEDIA', 50.0)  # requests/s to each Wikipedia API; 0 = unlimited
+UPSTREAM_RATE_GOOGLE = env_float('CHATBOT_UPSTREAM_RATE_GOOGLE', 2.0)  # Google blocks fast scrapers
+UPSTREAM_BURST_SECONDS = env_float('CHATBOT_UPSTREAM_BURST_SECONDS', 5.0)  # unused budget saved up, in seconds of rate
+UPSTREAM_TOKEN_WAIT = env_float('CHATBOT_UPSTREAM_TOKEN_WAIT', 1.0)  # seconds a call may wait for its budget
+
+# Outbound HTTP connection pools
+HTTP_POOL_HOSTS = env_int('CHATBOT_HTTP_POOL_HOSTS', 10)  # hosts kept in the pool
+HTTP_POOL_PER_HOST = env_int('CHATBOT_HTTP_POOL_PER_HOST', 10)  # connections per host
+HTTP_RETRIES = env_int('CHATBOT_HTTP_RETRIES', 2)  # retries on 5xx and network errors (never 429)
+HTTP_BACKOFF = env_float('CHATBOT_HTTP_BACKOFF', 0.3)
+
+# /batch endpoint
+BATCH_MAX_MESSAGES = env_int('CHATBOT_BATCH_MAX_MESSAGES', 50)  # per request
+BATCH_WORKERS = env_int('CHATBOT_BATCH_WORKERS', 4)  # full lookups running at once, across requests
+
+# Google result pages
+PAGE_FETCH_WORKERS = env_int('CHATBOT_PAGE_FETCH_WORKERS', 4)
+PAGE_MAX_BYTES = env_int('CHATBOT_PAGE_MAX_BYTES', 512 * 1024)  # read at most this much per page
+SNIPPET_MAX_CANDIDATES = env_int('CHATBOT_SNIPPET_MAX_CANDIDATES', 12)  # stop reading once this many sentences match (sooner with a definition)
+SNIPPET_CHAR_BUDGET = env_int('CHATBOT_SNIPPET_CHAR_BUDGET', 800)  # characters of ranked sentences per answer
+
+# Upstream endpoints
+WIKIPEDIA_REST_URL = env_str('CHATBOT_WIKIPEDIA_REST_URL', 'https://en.wikipedia.org/api/rest_v1')
+WIKIPEDIA_API_URL = env_str('CHATBOT_WIKIPEDIA_API_URL', 'https://en.wikipedia.org/w/api.php')
+
+# Local offline knowledge index (built with knowledge_index.py)
+KNOWLEDGE_INDEX_PATH = env_str('CHATBOT_KNOWLEDGE_INDEX', 'knowledge.db')  # used when the file exists
+
+# Title index behind /search and /suggest
+TITLE_INDEX_PATH = env_str('CHATBOT_TITLE_INDEX', 'titles.txt')  # one title per line (or .gz); used when the file exists
+TITLE_INDEX_LEARNED = env_str('CHATBOT_TITLE_INDEX_LEARNED', 'learned_titles.txt')  # answered titles; 'off' to keep them in memory only
+SUGGEST_LIMIT = env_int('CHATBOT_SUGGEST_LIMIT', 8)  # default completions per /suggest call (max 20)
+SPELLING_INDEX_PATH = env_str('CHATBOT_SPELLING_INDEX', 'spelling.idx')  # typo dictionary built from the titles; 'off' disables
+
+# Web server (see serve.py)
+HOST = env_str('CHATBOT_HOST', '127.0.0.1')
+PORT = env_int('CHATBOT_PORT', 5000)
+DEBUG = env_bool('CHATBOT_DEBUG', False)  # Flask debugger; never enable in production
+SECRET_KEY = env_str('CHATBOT_SECRET_KEY', 'your_secret_key_here')  # set this in production
+SERVER = env_str('CHATBOT_SERVER', 'auto')  # 'auto', 'gunicorn', 'waitress', 'uvicorn' or 'flask'
+WORKERS = env_int('CHATBOT_WORKERS', 2)  # processes (gunicorn/uvicorn)
+THREADS = env_int('CHATBOT_THREADS', 8)  # threads per worker process
+GRACEFUL_TIMEOUT = env_int('CHATBOT_GRACEFUL_TIMEOUT', 30)  # seconds to finish in-flight requests
+REQUEST_TIMEOUT_SECONDS = env_int('CHATBOT_WORKER_TIMEOUT', 60)  # kill workers stuck longer than this
+
+# Per-user sessions kept in memory
+MAX_SESSIONS = env_int('CHATBOT_MAX_SESSIONS', 10000)
+SESSION_TTL = env_int('CHATBOT_SESSION_TTL', 1800)  # seconds idle before eviction
+
+# Observability (see metrics.py)
+REQUEST_LOG = env_bool('CHATBOT_REQUEST_LOG', True)  # one JSON line per request with span timings
+PROFILE_PATH = env_str('CHATBOT_PROFILE', '')  # e.g. 'profile-{pid}.folded'; empty = profiler off
+PROFILE_INTERVAL = env_float('CHATBOT_PROFILE_INTERVAL', 0.01)  # seconds between stack samples
+
+# Write-behind for user records (see user_store.WriteBehindStore)
+WRITE_BEHIND = env_bool('CHATBOT_WRITE_BEHIND', True)  # off = every save hits disk before replying; serve.py turns it off for 2+ workers unless set
+WRITE_BEHIND_INTERVAL_MS = env_int('CHATBOT_WRITE_BEHIND_MS', 200)  # max age of an unwritten save
+WRITE_BEHIND_BATCH = env_int('CHATBOT_WRITE_BEHIND_BATCH', 64)  # flush early once this many users wait
+WRITE_BEHIND_MAX_PENDING = env_int('CHATBOT_WRITE_BEHIND_MAX_PENDING', 10000)  # saves block beyond this
+
+# Startup
+WARMUP = env_bool('CHATBOT_WARMUP', True)  # pre-open connections and load providers in the background
+
+# Chat history kept per user
+HISTORY_HOT_SIZE = env_int('CHATBOT_HISTORY_HOT_SIZE', 100)  # newest messages kept in the user record
+HISTORY_ARCHIVE_PATH = env_str('CHATBOT_HISTORY_ARCHIVE', 'history_archive.db')  # older ones; 'off' = drop them
+HISTORY_ARCHIVE_BLOCK = env_int('CHATBOT_HISTORY_ARCHIVE_BLOCK', 64)  # messages per compressed block
+
+# Retention sweeper (see retention.py)
+RETENTION_INTERVAL = env_float('CHATBOT_RETENTION_INTERVAL', 3600.0)  # seconds between sweeps; 0 = never sweep
+RETENTION_EMPTY_HOURS = env_float('CHATBOT_RETENTION_EMPTY_HOURS', 24.0)  # drop records with no name or history after this
+RETENTION_IDLE_DAYS = env_float('CHATBOT_RETENTION_IDLE_DAYS', 0.0)  # drop users inactive this long; 0 = keep them
@@ -0,0 +1,251 @@
+# Save as: history_archive.py
+"""Compressed, columnar storage for chat history older than the hot window
+
+The user record keeps the newest messages as plain dicts. Older ones are
+moved here in blocks: ids and times become delta-encoded integer columns,
+each distinct line of text is stored once per block and referenced by
+index (greetings, tips, suggestion bullets and source lines repeat a lot),
+and the block is compressed with zstd when it is installed, else zlib,
+both primed with a dictionary of the bot's boilerplate.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import config
+
+# Phrases the bot repeats in nearly every reply; priming the compressor with
+# them lets even the first block of a user reference them. Changing this
+# text needs a new codec name, or old blocks will not decompress.
+BOILERPLATE = '\n'.join([
+    "📚 **About ", ":**\n\n", "\n\n🔗 **Source:** [Wikipedia - ", "](https://en.wikipedia.org/wiki/",
+    "\n\n🔗 *Information from ", "I couldn't find information about '", "'. Try these topics:",
+    "\n• ", "\n\n💡 **Tip:** Be specific and check spelling!", "Ask me a specific question! 😊",
+    "Hello! 👋 Ask me anything!", "Hi there! 😊 What would you like to know?", "Hey! Ready to help!",
+    "Nice to meet you, ", "! 😊 I'm your Wikipedia-powered chatbot. Ask me anything!",
+    "What is ", "Who was ", "Tell me about ", "Explain ", "My name is ",
+]).encode('utf-8')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress(raw):
+    """(codec, data) for a block, zstd when available"""
+    zstandard = _zstd()
+    if zstandard is not None:
+        dictionary = zstandard.ZstdCompressionDict(BOILERPLATE, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return 'zstd1', zstandard.ZstdCompressor(level=9, dict_data=dictionary).compress(raw)
+    compressor = zlib.compressobj(9, zdict=BOILERPLATE)
+    return 'zlib1', compressor.compress(raw) + compressor.flush()
+
+
+def decompress(codec, data):
+    if codec == 'zlib1':
+        decompressor = zlib.decompressobj(zdict=BOILERPLATE)
+        return decompressor.decompress(data) + decompressor.flush()
+    if codec == 'zstd1':
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError('History block is zstd-compressed; pip install zstandard to read it')
+        dictionary = zstandard.ZstdCompressionDict(BOILERPLATE, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+    raise ValueError(f"Unknown history block codec: {codec}")
+
+
+def entry_epoch(entry):
+    """Integer epoch seconds of a history entry ('time' is local time)"""
+    try:
+        return int(time.mktime(time.strptime(entry['time'], TIME_FORMAT)))
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def _deltas(values):
+    return [values[0]] + [b - a for a, b in zip(values, values[1:])] if values else []
+
+
+def _undeltas(deltas):
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def encode_block(entries):
+    """Columnar, line-deduplicated JSON for a run of history entries"""
+    strings = {}
+
+    def lines(text):
+        return [strings.setdefault(line, len(strings)) for line in (text or '').split('\n')]
+
+    block = {
+        'ids': _deltas([entry['id'] for entry in entries]),
+        'ts': _deltas([entry_epoch(entry) for entry in entries]),
+        'user': [lines(entry.get('user')) for entry in entries],
+        'bot': [lines(entry.get('bot')) for entry in entries],
+    }
+    block['strings'] = list(strings)
+    return json.dumps(block, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_block(raw):
+    """Back to the dicts the hot window uses"""
+    block = json.loads(raw)
+    strings = block['strings']
+    entries = []
+    for id_, epoch, user, bot in zip(_undeltas(block['ids']), _undeltas(block['ts']), block['user'], block['bot']):
+        local = time.localtime(epoch)
+        entries.append({
+            'id': id_,
+            'timestamp': time.strftime("%H:%M", local),
+            'user': '\n'.join(strings[i] for i in user),
+            'bot': '\n'.join(strings[i] for i in bot),
+            'time': time.strftime(TIME_FORMAT, local),
+        })
+    return entries
+
+
+class HistoryArchive:
+    """Per-user compressed history blocks in SQLite, read by id or by time"""
+
+    def __init__(self, path='history_archive.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS blocks ('
+            'user_id TEXT NOT NULL, '
+            'first_id INTEGER NOT NULL, '
+            'last_id INTEGER NOT NULL, '
+            'first_ts INTEGER NOT NULL, '
+            'last_ts INTEGER NOT NULL, '
+            'count INTEGER NOT NULL, '
+            'codec TEXT NOT NULL, '
+            'data BLOB NOT NULL, '
+            'PRIMARY KEY (user_id, first_id))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS blocks_by_time ON blocks (user_id, last_ts)')
+
+    def append(self, user_id, entries):
+        """Store entries (oldest first) as one block; ids already archived are skipped
+
+        Skipping makes a retry safe when the user record was not saved
+        after an earlier append.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MAX(last_id) FROM blocks WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            newest = row[0] or 0
+            entries = [entry for entry in entries if entry['id'] > newest]
+            if not entries:
+                return 0
+            codec, data = compress(encode_block(entries))
+            self._conn.execute(
+                'INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (user_id, entries[0]['id'], entries[-1]['id'], entry_epoch(entries[0]),
+                 entry_epoch(entries[-1]), len(entries), codec, data)
+            )
+        return len(entries)
+
+    def _blocks(self, sql, params):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for codec, data in rows:
+            yield decode_block(decompress(codec, data))
+
+    def before(self, user_id, before_id, limit):
+        """Up to limit (None: all) archived entries with id < before_id, oldest first"""
+        if limit is not None and limit <= 0:
+            return []
+        # Walk block headers newest first and decompress only as many blocks as needed
+        with self._lock:
+            first_ids = [row[0] for row in self._conn.execute(
+                'SELECT first_id FROM blocks WHERE user_id = ? AND first_id < ? ORDER BY first_id DESC',
+                (user_id, before_id)
+            )]
+        collected = []
+        for first_id in first_ids:
+            for entries in self._blocks(
+                'SELECT codec, data FROM blocks WHERE user_id = ? AND first_id = ?', (user_id, first_id)
+            ):
+                collected[:0] = [entry for entry in entries if entry['id'] < before_id]
+            if limit is not None and len(collected) >= limit:
+                break
+        return collected if limit is None else collected[-limit:]
+
+    def has_before(self, user_id, before_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM blocks WHERE user_id = ? AND first_id < ? LIMIT 1', (user_id, before_id)
+            ).fetchone()
+        return row is not None
+
+    def between(self, user_id, start=None, end=None):
+        """Archived entries with start <= epoch time <= end, oldest first"""
+        start = 0 if start is None else int(start)
+        end = 2 ** 62 if end is None else int(end)
+        entries = []
+        for block in self._blocks(
+            'SELECT codec, data FROM blocks WHERE user_id = ? AND last_ts >= ? AND first_ts <= ? ORDER BY first_id',
+            (user_id, start, end)
+        ):
+            entries.extend(entry for entry in block if start <= entry_epoch(entry) <= end)
+        return entries
+
+    def delete_user(self, user_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM blocks WHERE user_id = ?', (user_id,))
+
+    def compact(self):
+        """VACUUM when deleted users have left free pages, then truncate the WAL"""
+        with self._lock:
+            if self._conn.execute('PRAGMA freelist_count').fetchone()[0]:
+                self._conn.execute('VACUUM')
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def size_bytes(self):
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ('', '-wal') if os.path.exists(self.path + suffix)
+        )
+
+    def stats(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(count), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blocks'
+            ).fetchone()
+        return {'blocks': row[0], 'entries': row[1], 'bytes': row[2]}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        """Open a fresh connection in a forked worker process"""
+        self._lock = threading.Lock()
+        self._open()
+
+
+def open_archive():
+    """The configured archive, or None when CHATBOT_HISTORY_ARCHIVE is 'off'"""
+    if config.HISTORY_ARCHIVE_PATH in ('', 'off'):
+        return None
+    return HistoryArchive(config.HISTORY_ARCHIVE_PATH)
@@ -0,0 +1,237 @@
+# Save as: html_extract.py
+import codecs
+import re
+from html.parser import HTMLParser
+
+from snippets import SentenceIndex, definition_pattern, tokenize
+
+_etree = None  # lxml.etree once imported, False when lxml is not installed
+
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'aside', 'noscript', 'template'}
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'table', 'tr', 'td', 'th', 'section', 'article',
+    'header', 'main', 'blockquote', 'pre', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title',
+}
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+WHITESPACE = re.compile(r'\s+')
+FEED_SLICE = 4096  # characters handed to the parser at a time
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def header_charset(content_type):
+    """Charset a Content-Type header declares, or None (requests' ISO-8859-1 guess is not a declaration)"""
+    match = HEADER_CHARSET.search(content_type or '')
+    return match.group(1) if match else None
+
+
+def sniff_charset(head):
+    """Encoding of a page from its first bytes: BOM, then <meta charset>, then UTF-8"""
+    for bom, name in BOMS:
+        if head.startswith(bom):
+            return name
+    match = META_CHARSET.search(head[:4096])
+    if match:
+        name = match.group(1).decode('ascii', 'replace')
+        try:
+            codecs.lookup(name)
+            return name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+class SentenceCollector:
+    """Parser target that turns page text into sentences as it streams in
+
+    Text inside script/style/nav/footer/aside is dropped. Complete
+    sentences are handed to on_sentence; it returns True to stop parsing.
+    """
+
+    def __init__(self, on_sentence):
+        self.on_sentence = on_sentence
+        self.skip_depth = 0
+        self.pending = ''
+        self.text_length = 0
+        self.done = False
+
+    def start(self, tag, attrib=None):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def _flush(self):
+        """A block boundary ends whatever sentence is in progress"""
+        if self.pending and not self.done:
+            self._emit(self.pending)
+        self.pending = ''
+
+    def data(self, text):
+        if self.skip_depth or self.done:
+            return
+        self.pending += text
+        parts = SENTENCE_END.split(self.pending)
+        self.pending = parts.pop()
+        for part in parts:
+            self._emit(part)
+            if self.done:
+                return
+
+    def close(self):
+        self._flush()
+
+    def _emit(self, sentence):
+        sentence = WHITESPACE.sub(' ', sentence).strip()
+        if not sentence:
+            return
+        self.text_length += len(sentence) + 1
+        if self.on_sentence(sentence):
+            self.done = True
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser front-end feeding a SentenceCollector"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def lxml_etree():
+    """lxml.etree, imported on first use; None when lxml is not installed"""
+    global _etree
+    if _etree is None:
+        try:
+            from lxml import etree
+        except ImportError:  # lxml is optional; the stdlib parser is the fallback
+            etree = False
+        _etree = etree
+    return _etree or None
+
+
+def make_parser(target):
+    """Incremental parser for target: lxml when installed, else html.parser"""
+    etree = lxml_etree()
+    if etree is not None:
+        return etree.HTMLParser(target=target, remove_comments=True)
+    return _StdlibParser(target)
+
+
+class RelevantSentences:
+    """Collects the first max_sentences sentences that mention a query word
+
+    The unranked picker extract_from_chunks used before RankedSentences;
+    kept as the baseline for benchmarks/snippets.py.
+    """
+
+    def __init__(self, query, max_sentences=4, min_length=20):
+        self.query_words = query.lower().split()
+        self.max_sentences = max_sentences
+        self.min_length = min_length
+        self.sentences = []
+
+    def __call__(self, sentence):
+        if len(sentence) > self.min_length:
+            sentence_lower = sentence.lower()
+            if any(word in sentence_lower for word in self.query_words):
+                self.sentences.append(sentence)
+        return len(self.sentences) >= self.max_sentences
+
+
+class RankedSentences:
+    """Indexes a page's sentences until it has enough to pick a good answer
+
+    The sentences are ranked afterwards with SentenceIndex.top, so a
+    definition deeper in the article can beat a menu line that happens to
+    contain the query near the top. Reading stops once max_sentences
+    sentences mention the query and one of them defines it ("X is ..."),
+    or once max_candidates mention it: parsing is most of the cost, so
+    the rest of a long page is never read.
+    """
+
+    def __init__(self, query, max_sentences=4, max_candidates=12):
+        query_tokens = tokenize(query)
+        self.query_tokens = set(query_tokens)
+        self.max_sentences = max_sentences
+        self.max_candidates = max_candidates
+        self.index = SentenceIndex(vocabulary=self.query_tokens)
+        self.definition = definition_pattern(query_tokens)
+        self.candidates = 0
+        self.defined = False
+
+    def __call__(self, sentence):
+        if self.index.add(sentence):
+            self.candidates += 1
+            if not self.defined and self.definition is not None:
+                self.defined = self.definition.search(sentence) is not None
+        if self.defined and self.candidates >= self.max_sentences:
+            return True
+        return self.candidates >= self.max_candidates
+
+
+def extract_from_chunks(chunks, query, max_bytes=512 * 1024, encoding=None, max_sentences=4,
+                        char_budget=800, max_candidates=12):
+    """Stream HTML chunks through the parser and return the best sentences for query
+
+    Returns (sentences, text_length): up to max_sentences sentences within
+    char_budget, in page order. Reading stops after max_bytes of the page,
+    or once RankedSentences has enough candidates. Byte chunks are
+    decoded with encoding when given (a charset the server declared),
+    otherwise with what sniff_charset finds in the first chunk.
+    """
+    picker = RankedSentences(query, max_sentences=max_sentences, max_candidates=max_candidates)
+    collector = SentenceCollector(picker)
+    parser = make_parser(collector)
+    decoder = None
+
+    bytes_read = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        bytes_read += len(chunk)
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = _decoder(encoding or sniff_charset(chunk))
+            chunk = decoder.decode(chunk)
+        # Feed in slices so parsing stops soon after the picker has enough
+        for start in range(0, len(chunk), FEED_SLICE):
+            parser.feed(chunk[start:start + FEED_SLICE])
+            if collector.done:
+                break
+        if collector.done or bytes_read >= max_bytes:
+            break
+
+    if not collector.done:
+        try:
+            parser.close()
+        except Exception:
+            pass  # lxml raises on truncated documents
+        collector.close()
+    sentences = picker.index.top(query, k=max_sentences, char_budget=char_budget)
+    return sentences, collector.text_length
+
+
+def _decoder(encoding):
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
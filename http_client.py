@@ -0,0 +1,195 @@
+# Save as: http_client.py
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+from metrics import registry, span
+from retrieval import remaining_time
+
+UPSTREAM_REQUESTS = registry.counter(
+    'chatbot_upstream_requests_total', 'Outbound HTTP requests by host and status', ('host', 'status'))
+
+
+def accept_encoding():
+    """Compression we can decode: brotli only when a brotli package is installed"""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+class HttpClient:
+    """Shared, thread-safe HTTP layer with pooled keep-alive connections
+
+    All threads share one urllib3 connection pool per host (capped at
+    pool_maxsize connections), so repeat requests to en.wikipedia.org reuse
+    an open TCP+TLS connection instead of handshaking again. 5xx answers,
+    timeouts and connection errors are retried with exponential backoff,
+    but only while the retry still fits in the lookup's remaining budget
+    (retrieval.remaining_time). 429 is not retried and Retry-After is not
+    honoured: the breaker and the request budget deal with throttling.
+    Responses that carry an ETag or Last-Modified header are revalidated
+    with conditional requests.
+
+    requests itself is imported when the first session is needed, which
+    keeps it off the app's import path.
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    def __init__(self, headers=None, pool_connections=10, pool_maxsize=10,
+                 retries=2, backoff=0.3, validator_cache_size=256):
+        self.headers = dict(headers or {})
+        self.headers.setdefault('Accept-Encoding', accept_encoding())
+        self.headers.setdefault('Connection', 'keep-alive')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self._adapter = None
+        self.validator_cache_size = validator_cache_size
+        self._validators = OrderedDict()  # url -> (etag, last_modified, status, headers, content)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def adapter(self):
+        """The HTTPAdapter (and so the pools) shared by every thread's session"""
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = self._build_adapter()
+        return self._adapter
+
+    def _build_adapter(self):
+        from requests.adapters import HTTPAdapter
+
+        # Retries happen in _send, where the lookup's deadline is known
+        return HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0,
+            pool_block=True
+        )
+
+    def session(self):
+        """requests.Session for the calling thread, mounted on the shared pools"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, timeout=10, stream=False, **kwargs):
+        """GET url through the pool, revalidating cached bodies when possible"""
+        if stream:
+            # Headers only; the caller's own span covers reading the body
+            return self._send(url, timeout=timeout, stream=True, **kwargs)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        with self._lock:
+            cached = self._validators.get(url)
+        if cached is not None:
+            etag, last_modified = cached[0], cached[1]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = self._send(url, timeout=timeout, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                self._validators.move_to_end(url, last=True)
+            return self._from_cache(url, cached)
+
+        if response.status_code == 200:
+            self._remember(url, response)
+        return response
+
+    def _send(self, url, timeout=10, **kwargs):
+        """GET with retries on 5xx and network errors, none past the lookup's deadline"""
+        import requests
+        host = urllib.parse.urlsplit(url).hostname or ''
+        left = remaining_time()
+        deadline = None if left is None else time.monotonic() + left
+        attempt = 0
+        while True:
+            try:
+                with span('http'):
+                    response = self.session().get(url, timeout=timeout, **kwargs)
+                error = None
+                UPSTREAM_REQUESTS.inc(host=host, status=response.status_code)
+                if response.status_code not in self.RETRY_STATUSES:
+                    return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                UPSTREAM_REQUESTS.inc(host=host, status='error')
+                response, error = None, e
+            except requests.RequestException:
+                UPSTREAM_REQUESTS.inc(host=host, status='error')
+                raise
+
+            delay = self.backoff * (2 ** attempt)
+            attempt += 1
+            out_of_time = deadline is not None and time.monotonic() + delay + min(timeout, 0.1) > deadline
+            if attempt > self.retries or out_of_time:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            if deadline is not None:
+                timeout = max(0.1, min(timeout, deadline - time.monotonic()))
+
+    def _remember(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        entry = (etag, last_modified, response.status_code, dict(response.headers), response.content)
+        with self._lock:
+            self._validators[url] = entry
+            self._validators.move_to_end(url)
+            while len(self._validators) > self.validator_cache_size:
+                self._validators.popitem(last=False)
+
+    def _from_cache(self, url, cached):
+        """Rebuild a 200 response from a body the server said is still fresh"""
+        import requests
+        response = requests.Response()
+        response.status_code = cached[2]
+        response.headers.update(cached[3])
+        response._content = cached[4]
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def warm(self, url, timeout=5):
+        """Open a pooled connection to url's host ahead of the first real request"""
+        try:
+            self.session().head(url, timeout=timeout, allow_redirects=False)
+        except Exception as e:
+            print(f"⚠️ Warmup request to {url} failed: {e}")
+
+    def reopen(self):
+        """Drop inherited connections in a forked worker process"""
+        if self._adapter is not None:
+            self._adapter.close()
+        self._adapter = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def close(self):
+        if self._adapter is not None:
+            self._adapter.close()
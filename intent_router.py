@@ -0,0 +1,78 @@
+# Save as: intent_router.py
+import re
+from collections import namedtuple
+
+# group: 'chat' (answered locally), 'name' (user introduces themselves),
+# 'query' (needs a lookup). takes_slot: the text after the phrase is the slot.
+Intent = namedtuple('Intent', 'name group phrases takes_slot')
+Route = namedtuple('Route', 'intent group slot priority')
+
+# Earlier entries win when several intents match one message
+INTENTS = [
+    Intent('greeting', 'chat', ['hello', 'hi', 'hey'], False),
+    Intent('farewell', 'chat', ['bye', 'goodbye'], False),
+    Intent('thanks', 'chat', ['thank', 'thanks', 'thank you'], False),
+    Intent('identity', 'chat', ['your name', 'who are you'], False),
+    Intent('time', 'chat', ['time'], False),
+    Intent('date', 'chat', ['date'], False),
+    Intent('help', 'chat', ['help'], False),
+    Intent('fact', 'chat', ['fact', 'facts'], False),
+    Intent('joke', 'chat', ['joke', 'jokes'], False),
+
+    Intent('name', 'name', ['my name is', 'i am', "i'm", 'i’m', 'call me'], True),
+
+    Intent('what_is', 'query', ['what is'], True),
+    Intent('who_is', 'query', ['who is'], True),
+    Intent('tell_me_about', 'query', ['tell me about'], True),
+    Intent('explain', 'query', ['explain'], True),
+    Intent('what_are', 'query', ['what are'], True),
+    Intent('how_does', 'query', ['how does'], True),
+]
+
+
+class IntentRouter:
+    """Matches a message against every intent phrase in a single regex pass
+
+    All phrases are compiled once into one alternation with word
+    boundaries, so "time" no longer fires inside "sometimes" and "hi" no
+    longer fires inside "this".
+    """
+
+    def __init__(self, intents=INTENTS):
+        self.intents = list(intents)
+        self._phrase_owner = {}
+        for priority, intent in enumerate(self.intents):
+            for phrase in intent.phrases:
+                self._phrase_owner.setdefault(phrase, priority)
+
+        # Longest phrases first so "thank you" beats "thank"
+        phrases = sorted(self._phrase_owner, key=len, reverse=True)
+        alternation = '|'.join(re.escape(phrase).replace(r'\ ', r'\s+') for phrase in phrases)
+        self._pattern = re.compile(r'\b(?:' + alternation + r')\b')
+
+    def scan(self, text):
+        """Best route for each intent group found in text, e.g. {'chat': Route(...)}"""
+        text_lower = text.lower()
+        best = {}
+        for match in self._pattern.finditer(text_lower):
+            phrase = re.sub(r'\s+', ' ', match.group(0))
+            priority = self._phrase_owner[phrase]
+            intent = self.intents[priority]
+            current = best.get(intent.group)
+            if current is not None and current.priority <= priority:
+                continue
+            slot = text_lower[match.end():].strip() if intent.takes_slot else None
+            best[intent.group] = Route(intent.name, intent.group, slot, priority)
+        return best
+
+    def route(self, text, group=None):
+        """Highest-priority route in text (optionally within one group), or None"""
+        routes = self.scan(text)
+        if group is not None:
+            return routes.get(group)
+        if not routes:
+            return None
+        return min(routes.values(), key=lambda route: route.priority)
+
+
+default_router = IntentRouter()
@@ -0,0 +1,289 @@
+# Save as: knowledge_index.py
+import json
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+import config
+from answer_cache import normalize_query
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS docs ('
+    'id INTEGER PRIMARY KEY, '
+    'title TEXT NOT NULL UNIQUE, '
+    'url TEXT, '
+    'extract TEXT NOT NULL, '
+    'fetched_at REAL NOT NULL)',
+    # Every lookup key (canonical title, redirects, aliases) -> document
+    'CREATE TABLE IF NOT EXISTS aliases ('
+    'alias TEXT PRIMARY KEY, '
+    'doc_id INTEGER NOT NULL)',
+    "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+    "title, extract, content='docs', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN '
+    'INSERT INTO docs_fts(rowid, title, extract) VALUES (new.id, new.title, new.extract); END',
+    'CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN '
+    "INSERT INTO docs_fts(docs_fts, rowid, title, extract) VALUES ('delete', old.id, old.title, old.extract); END",
+    'CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN '
+    "INSERT INTO docs_fts(docs_fts, rowid, title, extract) VALUES ('delete', old.id, old.title, old.extract); "
+    'INSERT INTO docs_fts(rowid, title, extract) VALUES (new.id, new.title, new.extract); END',
+]
+
+
+def fts_phrase(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+class KnowledgeIndex:
+    """Local Wikipedia summary index in SQLite FTS5
+
+    Lookups go title/alias first, then BM25 ranking over titles. The file is
+    memory-mapped by SQLite, so opening it at startup reads nothing up front
+    and answers work with no network at all.
+    """
+
+    def __init__(self, path='knowledge.db', mmap_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA mmap_size={int(self.mmap_bytes)}')
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+
+    def _doc(self, row):
+        if row is None:
+            return None
+        title, url, extract = row
+        return {'title': title, 'url': url or '', 'extract': extract}
+
+    def get(self, title):
+        """Exact lookup by title, redirect or alias"""
+        key = normalize_query(title)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT d.title, d.url, d.extract FROM aliases a '
+                'JOIN docs d ON d.id = a.doc_id WHERE a.alias = ?', (key,)
+            ).fetchone()
+        return self._doc(row)
+
+    def search(self, query, limit=5, title_only=False):
+        """BM25-ranked documents for query (titles weigh ten times the text)"""
+        tokens = TOKEN.findall(normalize_query(query))
+        if not tokens:
+            return []
+        if title_only:
+            match = ' AND '.join('title : ' + fts_phrase(token) for token in tokens)
+        else:
+            match = ' '.join(fts_phrase(token) for token in tokens)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT d.title, d.url, d.extract FROM docs_fts f '
+                'JOIN docs d ON d.id = f.rowid '
+                'WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts, 10.0, 1.0) LIMIT ?',
+                (match, limit)
+            ).fetchall()
+        return [self._doc(row) for row in rows]
+
+    def lookup(self, query):
+        """Best local document for query, or None to fall through to the network"""
+        doc = self.get(query)
+        if doc is not None:
+            return doc
+
+        # Only trust ranked hits whose title holds every query word and at
+        # most one more ("Black Holes" -> "Black hole", "Einstein" -> "Albert Einstein")
+        matches = self.search(query, limit=1, title_only=True)
+        if not matches:
+            return None
+        query_words = len(TOKEN.findall(normalize_query(query)))
+        if len(TOKEN.findall(matches[0]['title'])) > query_words + 1:
+            return None
+        return matches[0]
+
+    def answer(self, query):
+        """Provider entry point: a get_answer-style result dict, or None"""
+        doc = self.lookup(query)
+        if doc is None:
+            return None
+        return {
+            'answer': doc['extract'],
+            'source': doc['title'],
+            'url': doc['url'],
+            'type': 'local'
+        }
+
+    def add(self, title, extract, url='', aliases=()):
+        """Insert or refresh one document and its aliases"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                row = self._conn.execute('SELECT id FROM docs WHERE title = ?', (title,)).fetchone()
+                if row is None:
+                    doc_id = self._conn.execute(
+                        'INSERT INTO docs (title, url, extract, fetched_at) VALUES (?, ?, ?, ?)',
+                        (title, url, extract, now)
+                    ).lastrowid
+                else:
+                    doc_id = row[0]
+                    self._conn.execute(
+                        'UPDATE docs SET url = ?, extract = ?, fetched_at = ? WHERE id = ?',
+                        (url, extract, now, doc_id)
+                    )
+                for alias in {title, *aliases}:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO aliases (alias, doc_id) VALUES (?, ?)',
+                        (normalize_query(alias), doc_id)
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def is_fresh(self, title, max_age):
+        """Check whether title was fetched within the last max_age seconds"""
+        key = normalize_query(title)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT d.fetched_at FROM aliases a JOIN docs d ON d.id = a.doc_id '
+                'WHERE a.alias = ?', (key,)
+            ).fetchone()
+        return row is not None and row[0] >= time.time() - max_age
+
+    def titles(self):
+        """Every canonical title in the index"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT title FROM docs')]
+
+    def aliases(self):
+        """(alias, canonical title) pairs, including each title itself"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT a.alias, d.title FROM aliases a JOIN docs d ON d.id = a.doc_id'
+            ).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        """Open a fresh connection in a forked worker process"""
+        self._lock = threading.Lock()
+        self._open()
+
+
+def fetch_summary(http, title, timeout=10):
+    """Fetch one Wikipedia REST summary as an index document"""
+    url = f"{config.WIKIPEDIA_REST_URL}/page/summary/{urllib.parse.quote(title.replace(' ', '_'))}"
+    response = http.get(url, timeout=timeout)
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if not data.get('extract') or data.get('type') == 'disambiguation':
+        return None
+    return {
+        'title': data.get('title', title),
+        'extract': data['extract'],
+        'url': data.get('content_urls', {}).get('desktop', {}).get('page', ''),
+        'aliases': [title],
+    }
+
+
+def build_from_titles(index, titles, refresh_days=30, workers=4):
+    """Fetch summaries for titles that are missing or stale; returns (added, skipped, failed)"""
+    from concurrent.futures import ThreadPoolExecutor
+    from http_client import HttpClient
+
+    max_age = refresh_days * 24 * 3600
+    todo = [title for title in titles if not index.is_fresh(title, max_age)]
+    skipped = len(titles) - len(todo)
+    http = HttpClient(headers={'User-Agent': 'SmartChatBot index builder'})
+    added = failed = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for title, doc in zip(todo, pool.map(lambda t: _safe_fetch(http, t), todo)):
+            if doc is None:
+                failed += 1
+                print(f"⚠️ No summary for: {title}")
+                continue
+            index.add(doc['title'], doc['extract'], doc['url'], doc['aliases'])
+            added += 1
+    return added, skipped, failed
+
+
+def _safe_fetch(http, title):
+    try:
+        return fetch_summary(http, title)
+    except Exception as e:
+        print(f"Fetch error for {title}: {e}")
+        return None
+
+
+def import_jsonl(index, path):
+    """Load an offline dump: one {"title", "extract", "url", "aliases"} object per line"""
+    count = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            doc = json.loads(line)
+            index.add(doc['title'], doc['extract'], doc.get('url', ''), doc.get('aliases', ()))
+            count += 1
+    return count
+
+
+def read_titles(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the local knowledge index')
+    parser.add_argument('--index', default=config.KNOWLEDGE_INDEX_PATH or 'knowledge.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='fetch Wikipedia summaries for a list of titles')
+    build.add_argument('titles', help='text file with one title per line')
+    build.add_argument('--refresh-days', type=float, default=30, help='refetch entries older than this')
+    build.add_argument('--workers', type=int, default=4)
+
+    load = commands.add_parser('import', help='load an offline JSON-lines dump')
+    load.add_argument('dump')
+
+    lookup = commands.add_parser('lookup', help='query the index')
+    lookup.add_argument('query')
+
+    args = parser.parse_args()
+    index = KnowledgeIndex(args.index)
+
+    if args.command == 'build':
+        added, skipped, failed = build_from_titles(
+            index, read_titles(args.titles), args.refresh_days, args.workers
+        )
+        print(f"✅ Added {added}, up to date {skipped}, failed {failed} ({len(index)} documents)")
+    elif args.command == 'import':
+        count = import_jsonl(index, args.dump)
+        print(f"✅ Imported {count} documents ({len(index)} total)")
+    else:
+        start = time.perf_counter()
+        result = index.answer(args.query)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(json.dumps(result, ensure_ascii=False, indent=2) if result else 'Not found')
+        print(f"⏱️ {elapsed:.3f} ms")
+    index.close()
@@ -4,27 +4,47 @@ import threading
 import time
 import os
 import sys
+import urllib.request
+import config
+
+def wait_until_ready(url, timeout=30.0, interval=0.05):
+    """Poll the readiness probe until it answers 200 (or give up after timeout)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(interval)
+    return False
 
 def launch_chatbot():
     """Launch the Flask chatbot server"""
     try:
         # Import and run the Flask app
-        from chatbot_app import app
+        from chatbot_app import app, start_warmup
         
-        # Open browser after a short delay
+        # Open the browser as soon as the server answers
+        url = f"http://localhost:{config.PORT}"
         def open_browser():
-            time.sleep(2)  # Wait for server to start
-            webbrowser.open('http://localhost:5000')
+            probe_host = '127.0.0.1' if config.HOST in ('0.0.0.0', '::', '') else config.HOST
+            if wait_until_ready(f"http://{probe_host}:{config.PORT}/healthz"):
+                webbrowser.open(url)
+            else:
+                print(f"⚠️ Server did not come up; open {url} yourself")
         
         # Start browser in separate thread
         threading.Thread(target=open_browser, daemon=True).start()
+        start_warmup()
         
         # Run the Flask app
         print("🚀 Starting ChatBot Server...")
-        print("🌐 Opening browser at: http://localhost:5000")
+        print(f"🌐 Opening browser at: {url}")
         print("🛑 Press Ctrl+C to stop the server")
         print("=" * 50)
-        app.run(debug=True, use_reloader=False)
+        app.run(debug=config.DEBUG, host=config.HOST, port=config.PORT, use_reloader=False)
         
     except ImportError as e:
         print(f"❌ Error: {e}")
@@ -37,4 +57,3 @@ def launch_chatbot():
 
 if __name__ == "__main__":
     launch_chatbot()
-    
\ No newline at end of file
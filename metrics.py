@@ -0,0 +1,388 @@
+# Save as: metrics.py
+"""Timing spans, Prometheus-format metrics and an opt-in sampling profiler
+
+    with span('wikipedia'):
+        ...
+
+Every span feeds the chatbot_span_seconds histogram and, when a request
+trace is active on the thread, that request's per-span breakdown. Metrics
+live in the process, so with several server workers each /metrics scrape
+reports the worker that answered it.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from functools import wraps
+
+# Seconds; upstream calls dominate, so the buckets stretch to the retrieval deadline
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name + _format_labels(self.labelnames, key), value
+
+
+class Callback:
+    """Gauge or counter whose value is read from a function at scrape time
+
+    With labelnames, fn returns {label value (or tuple of values): value}.
+    """
+
+    def __init__(self, name, help_text, fn, kind='gauge', labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return
+        if value is None:
+            return
+        if not self.labelnames:
+            yield self.name, value
+            return
+        for key, item in sorted(value.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            yield self.name + _format_labels(self.labelnames, key), item
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                yield self.name + '_bucket' + _format_labels(self.labelnames, key, ('le', _format_value(bound))), cumulative
+            yield self.name + '_bucket' + _format_labels(self.labelnames, key, ('le', '+Inf')), series[-1]
+            yield self.name + '_sum' + _format_labels(self.labelnames, key), series[-2]
+            yield self.name + '_count' + _format_labels(self.labelnames, key), series[-1]
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # Re-registering a name returns the metric already there
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=()):
+        return self._add(Callback(name, help_text, fn, labelnames=labelnames))
+
+    def counter_from(self, name, help_text, fn, labelnames=()):
+        """Counter kept elsewhere (e.g. a stats attribute), read when scraped"""
+        return self._add(Callback(name, help_text, fn, kind='counter', labelnames=labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram(
+    'chatbot_span_seconds', 'Time spent in instrumented sections of a request', ('span',))
+SPAN_ERRORS = registry.counter(
+    'chatbot_span_errors_total', 'Instrumented sections that raised', ('span',))
+REQUEST_SECONDS = registry.histogram(
+    'chatbot_request_seconds', 'HTTP request latency, measured until the response is closed', ('route', 'method'))
+REQUESTS = registry.counter(
+    'chatbot_requests_total', 'HTTP requests served', ('route', 'method', 'status'))
+
+
+class RequestTrace:
+    """Per-request span totals, filled in from any thread working on the request"""
+
+    __slots__ = ('started', 'spans', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # span name -> [seconds, calls]
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def breakdown(self):
+        """{span: milliseconds}, with a call count for spans that ran more than once"""
+        with self._lock:
+            items = sorted(self.spans.items())
+        result = {}
+        for name, (seconds, calls) in items:
+            result[name] = round(seconds * 1000, 2)
+            if calls > 1:
+                result[name + '_calls'] = calls
+        return result
+
+
+_local = threading.local()
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def start_trace():
+    """Begin collecting spans for the request handled by this thread"""
+    trace = RequestTrace()
+    _local.trace = trace
+    return trace
+
+
+def end_trace():
+    """Stop collecting spans on this thread and return what was collected"""
+    trace = current_trace()
+    _local.trace = None
+    return trace
+
+
+@contextmanager
+def span(name):
+    """Time a block into the span histogram and the current request's trace"""
+    trace = current_trace()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, span=name)
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn):
+    """Wrap fn so it records spans into the caller's trace on a pool thread"""
+    trace = current_trace()
+    if trace is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = current_trace()
+        _local.trace = trace
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return wrapper
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on a timer and writes collapsed stacks
+
+    The output has one "frame;frame;frame count" line per distinct stack,
+    which flamegraph.pl, speedscope and inferno read directly. Sampling
+    costs one sys._current_frames() call per interval, so it is cheap
+    enough to leave on under load, but it is off unless asked for.
+    """
+
+    def __init__(self, path, interval=0.01, flush_every=30.0):
+        self.path = path
+        self.interval = interval
+        self.flush_every = flush_every
+        self.samples = 0
+        self._stacks = _Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self.dump()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    self._stacks[self._collapse(names.get(thread_id, 'thread'), frame)] += 1
+                self.samples += 1
+            if time.monotonic() - last_flush >= self.flush_every:
+                self.dump()
+                last_flush = time.monotonic()
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            stack.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        stack.append(thread_name.split('_')[0].split('-')[0])  # group pool threads
+        return ';'.join(reversed(stack))
+
+    def dump(self):
+        """Rewrite the output file with every stack sampled so far"""
+        with self._lock:
+            lines = [f"{stack} {count}\n" for stack, count in self._stacks.most_common()]
+        if not lines:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.path)
+
+
+_profiler = None
+
+
+def start_profiler(path, interval=0.01):
+    """Start (or restart after a fork) the process's sampling profiler
+
+    A '{pid}' in path is replaced so each server worker writes its own file.
+    """
+    global _profiler
+    path = path.replace('{pid}', str(os.getpid()))
+    if _profiler is not None and _profiler.path == path:
+        return _profiler.start()
+    _profiler = SamplingProfiler(path, interval)
+    print(f"🔥 Sampling profiler writing collapsed stacks to {path}")
+    return _profiler.start()
@@ -0,0 +1,162 @@
+# Save as: retention.py
+"""Background sweeper that expires unused user records and compacts storage
+
+Each sweep walks the user store once. Records with no name and no history
+(left by page views before records were created lazily) go after
+empty_after seconds. With idle_after set, users whose last activity is
+older than that go too, along with their archived history. A user is
+never removed while their session is live, and a record that changed
+since it was read is left alone. The store and the archive are then
+compacted so the freed space goes back to the filesystem.
+
+With several server processes, a lock file next to the store lets one
+of them sweep at a time; the others skip that round.
+"""
+import json
+import threading
+import time
+from collections import Counter
+
+from history_archive import entry_epoch
+from user_store import is_empty_record
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process sweeps
+    fcntl = None
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def last_active(user_data):
+    """Epoch seconds of the user's last write, falling back to history and creation time"""
+    if user_data.get('last_active'):
+        return user_data['last_active']
+    history = user_data.get('chat_history') or []
+    if history:
+        return entry_epoch(history[-1])
+    try:
+        return int(time.mktime(time.strptime(user_data.get('created_at', ''), TIME_FORMAT)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class RetentionSweeper:
+    """Deletes empty and idle user records on a schedule, then compacts"""
+
+    def __init__(self, store, archive=None, is_active=None, interval=3600.0,
+                 empty_after=86400.0, idle_after=0.0, first_delay=60.0):
+        self.store = store
+        self.archive = archive
+        self.is_active = is_active or (lambda user_id: False)
+        self.interval = interval
+        self.empty_after = empty_after
+        self.idle_after = idle_after
+        self.first_delay = first_delay
+        self.lock_path = store.path + '.sweep.lock' if getattr(store, 'path', None) else None
+        self.sweeps = 0
+        self.reclaimed = Counter()  # reason -> records deleted
+        self.bytes_reclaimed = 0
+        self.last_duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='retention-sweeper', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def reopen(self):
+        """Restart the sweeper thread in a forked worker"""
+        self._thread = None
+        return self.start()
+
+    def _run(self):
+        delay = self.first_delay
+        while not self._stop.wait(delay):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Retention sweep failed: {e}")
+            delay = self.interval
+
+    def expired(self, user_data, now):
+        """Why a record should go ('empty' or 'idle'), or None to keep it"""
+        age = now - last_active(user_data)
+        if is_empty_record(user_data) and age > self.empty_after:
+            return 'empty'
+        if self.idle_after and age > self.idle_after:
+            return 'idle'
+        return None
+
+    def sweep(self):
+        """One pass over every user; returns {'scanned', 'reclaimed', 'bytes_reclaimed'}"""
+        lock = self._try_lock()
+        if lock is False:
+            return None  # another process is sweeping
+        try:
+            started = time.perf_counter()
+            before = self._size()
+            now = time.time()
+            scanned = 0
+            reclaimed = Counter()
+            for user_id, record in self.store.scan():
+                scanned += 1
+                reason = self.expired(json.loads(record), now)
+                if reason is None or self.is_active(user_id):
+                    continue
+                if not self.store.delete_if_unchanged(user_id, record):
+                    continue  # written since we read it
+                if self.archive is not None:
+                    self.archive.delete_user(user_id)
+                reclaimed[reason] += 1
+
+            self.store.compact()
+            if self.archive is not None:
+                self.archive.compact()
+            saved = max(0, before - self._size())
+
+            self.sweeps += 1
+            self.reclaimed.update(reclaimed)
+            self.bytes_reclaimed += saved
+            self.last_duration = time.perf_counter() - started
+            total = sum(reclaimed.values())
+            if total or saved:
+                print(f"🧹 Retention sweep: removed {total} of {scanned} users "
+                      f"({dict(reclaimed)}), freed {saved // 1024} KB in {self.last_duration:.2f}s")
+            return {'scanned': scanned, 'reclaimed': dict(reclaimed), 'bytes_reclaimed': saved}
+        finally:
+            if lock:
+                lock.close()
+
+    def _size(self):
+        size = self.store.size_bytes()
+        if self.archive is not None:
+            size += self.archive.size_bytes()
+        return size
+
+    def _try_lock(self):
+        """Open lock file when held, None when there is nothing to lock, False when busy"""
+        if fcntl is None or not self.lock_path:
+            return None
+        lock = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        return lock
+
+    def stats(self):
+        return {
+            'sweeps': self.sweeps,
+            'reclaimed': dict(self.reclaimed),
+            'bytes_reclaimed': self.bytes_reclaimed,
+            'last_duration': round(self.last_duration, 3),
+        }
@@ -0,0 +1,209 @@
+# Save as: retrieval.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from admission import RateLimited
+from circuit_breaker import CircuitOpenError
+from metrics import propagate
+
+MODES = ('race', 'sequential')
+
+# Deadline and cancel flag of the provider call running on this thread
+_call_state = threading.local()
+
+
+def remaining_time(default=None):
+    """Seconds left in the current lookup's budget (default outside the engine)"""
+    deadline = getattr(_call_state, 'deadline', None)
+    if deadline is None:
+        return default
+    left = max(0.0, deadline - time.monotonic())
+    return left if default is None else min(default, left)
+
+
+def cancelled():
+    """Check whether the engine has given up on the current provider call"""
+    event = getattr(_call_state, 'cancel', None)
+    return event is not None and event.is_set()
+
+
+def is_acceptable(result):
+    """A provider result is usable if it carries a non-empty answer"""
+    return bool(result) and bool(result.get('answer'))
+
+
+class RetrievalEngine:
+    """Runs answer providers under one end-to-end latency budget
+
+    Providers are (name, function) pairs in priority order; each function
+    takes the query and returns a result dict or None.
+
+    'race' mode starts every provider at once and returns the best result by
+    priority as soon as no higher-priority provider can still beat it, then
+    cancels the rest. 'sequential' mode keeps the original behaviour of
+    trying providers one after another.
+
+    head_starts maps a provider name to seconds it waits, in race mode,
+    before calling its function: it starts once every higher-priority
+    provider has finished without an answer, or when its head start runs
+    out. A provider that costs scarce request budget then never spends it
+    on lookups the providers ahead of it answer quickly.
+    """
+
+    def __init__(self, providers, mode='race', deadline=12.0, max_workers=8, head_starts=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        self.providers = list(providers)
+        self.mode = mode
+        self.deadline = deadline
+        self.head_starts = dict(head_starts or {})
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='retrieval')
+
+    def run(self, query, deadline=None):
+        """Return the best provider result for query, or None"""
+        return self.lookup(query, deadline)[0]
+
+    def lookup(self, query, deadline=None, on_finished=None):
+        """(best result or None, conclusive)
+
+        conclusive is True when the result is final: an acceptable answer,
+        or every provider finished in time without raising and found nothing.
+
+        on_finished is called once every provider call has returned. In race
+        mode that can be after lookup itself returns, while cancelled losers
+        wind down, so the admission scheduler can keep their slot until then.
+        """
+        budget = self.deadline if deadline is None else deadline
+        ends_at = time.monotonic() + budget
+        if self.mode == 'sequential':
+            try:
+                return self._run_sequential(query, ends_at)
+            finally:
+                if on_finished is not None:
+                    on_finished()
+        return self._run_race(query, ends_at, on_finished)
+
+    def _call(self, name, fn, query, ends_at, cancel, go=None):
+        head_start = self.head_starts.get(name, 0.0)
+        if go is not None and head_start > 0:
+            go.wait(min(head_start, max(0.0, ends_at - time.monotonic())))
+            if cancel.is_set():
+                return None  # a higher-priority provider answered first
+        _call_state.deadline = ends_at
+        _call_state.cancel = cancel
+        try:
+            return fn(query)
+        except (CircuitOpenError, RateLimited):
+            raise  # expected while an upstream is down or over budget; no need to log each one
+        except Exception as e:
+            print(f"{name} provider error: {e}")
+            raise
+        finally:
+            _call_state.deadline = None
+            _call_state.cancel = None
+
+    def _run_sequential(self, query, ends_at):
+        cancel = threading.Event()
+        conclusive = True
+        for name, fn in self.providers:
+            if time.monotonic() >= ends_at:
+                print(f"⏱️ Retrieval budget spent before {name}")
+                return None, False
+            try:
+                result = self._call(name, fn, query, ends_at, cancel)
+            except Exception:
+                conclusive = False
+                continue
+            if is_acceptable(result):
+                return result, True
+        return None, conclusive
+
+    def _run_race(self, query, ends_at, on_finished=None):
+        cancel = threading.Event()
+        # go[i] is set once every provider ahead of provider i has finished
+        go = [threading.Event() for _ in self.providers]
+        futures = []
+        try:
+            for (name, fn), ready in zip(self.providers, go):
+                futures.append(self._executor.submit(propagate(self._call), name, fn, query, ends_at, cancel, ready))
+        except BaseException:
+            cancel.set()
+            for ready in go:
+                ready.set()
+            _when_done(futures, on_finished)
+            raise
+        try:
+            pending = set(futures)
+            while True:
+                for index, ready in enumerate(go):
+                    if all(future.done() for future in futures[:index]):
+                        ready.set()
+                best = self._best_settled(futures)
+                if best is not None:
+                    return best, True
+                if not pending:
+                    return None, not any(future.cancelled() or future.exception() for future in futures)
+                left = ends_at - time.monotonic()
+                if left <= 0:
+                    print(f"⏱️ Retrieval budget spent for: {query}")
+                    best = self._best_finished(futures)
+                    return best, best is not None
+                _, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+        finally:
+            # Losers stop at their next cancelled() check or request timeout
+            cancel.set()
+            for ready in go:
+                ready.set()
+            for future in futures:
+                future.cancel()
+            _when_done(futures, on_finished)
+
+    def _best_settled(self, futures):
+        """Highest-priority acceptable result that no pending provider can beat"""
+        for (name, _), future in zip(self.providers, futures):
+            if not future.done():
+                return None
+            result = self._result(name, future)
+            if is_acceptable(result):
+                return result
+        return None
+
+    def _best_finished(self, futures):
+        """Highest-priority acceptable result among providers that finished in time"""
+        for (name, _), future in zip(self.providers, futures):
+            if future.done():
+                result = self._result(name, future)
+                if is_acceptable(result):
+                    return result
+        return None
+
+    def _result(self, name, future):
+        if future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None  # already logged by _call
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _when_done(futures, callback):
+    """Call callback once, after every future has finished or been cancelled"""
+    if callback is None:
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def one_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    if not futures:
+        callback()
+    for future in futures:
+        future.add_done_callback(one_done)
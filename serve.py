@@ -0,0 +1,182 @@
+# Save as: serve.py
+"""Production entry point for the chatbot
+
+    python serve.py                          # best available server
+    CHATBOT_SERVER=gunicorn CHATBOT_WORKERS=4 CHATBOT_THREADS=16 python serve.py
+    CHATBOT_SERVER=uvicorn python serve.py   # ASGI
+
+All settings come from CHATBOT_* environment variables (see config.py).
+"""
+import importlib.util
+import os
+import tempfile
+
+import config
+
+SERVERS = ('gunicorn', 'waitress', 'uvicorn', 'flask')
+
+
+def installed(module_name):
+    return importlib.util.find_spec(module_name) is not None
+
+
+def pick_server(name=None):
+    """Resolve 'auto' to the best server installed on this machine"""
+    name = name or config.SERVER
+    if name != 'auto':
+        if name not in SERVERS:
+            raise ValueError(f"Unknown server: {name} (choose from {', '.join(SERVERS)})")
+        return name
+    # gunicorn needs fork(), so it is not an option on Windows
+    if os.name == 'posix' and installed('gunicorn'):
+        return 'gunicorn'
+    if installed('waitress'):
+        return 'waitress'
+    return 'flask'
+
+
+def share_answer_cache():
+    """Resolve CHATBOT_SHARED_CACHE=auto: one cache file per port when there are several workers
+
+    Set in the environment too, so workers that re-import config (uvicorn) see it.
+    """
+    if config.SHARED_CACHE_PATH != 'auto':
+        return
+    path = 'off'
+    if config.WORKERS > 1 and os.name == 'posix':
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        path = os.path.join(directory, f"chatbot-{config.PORT}-answers.cache")
+    config.SHARED_CACHE_PATH = os.environ['CHATBOT_SHARED_CACHE'] = path
+
+
+def sync_user_saves():
+    """Turn write-behind off when several workers serve the same users
+
+    A save held back in one worker's memory is invisible to the others,
+    so a user's next request landing on another worker would read the
+    older record and overwrite the reply just added to its history.
+    An explicit CHATBOT_WRITE_BEHIND=1 is kept, with a warning.
+    """
+    if config.WORKERS <= 1 or not config.WRITE_BEHIND:
+        return
+    if os.environ.get('CHATBOT_WRITE_BEHIND'):
+        print("⚠️ Write-behind with several workers can lose history entries when "
+              "a user's requests alternate between workers")
+        return
+    config.WRITE_BEHIND = False
+    os.environ['CHATBOT_WRITE_BEHIND'] = '0'
+
+
+def run_gunicorn():
+    """Pre-forking gunicorn with threaded workers and the app preloaded"""
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        from chatbot_app import after_fork
+        after_fork()  # also starts this worker's warmup
+
+    class ChatBotApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f"{config.HOST}:{config.PORT}",
+                'workers': config.WORKERS,
+                'threads': config.THREADS,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'graceful_timeout': config.GRACEFUL_TIMEOUT,
+                'timeout': config.REQUEST_TIMEOUT_SECONDS,
+                'keepalive': 5,
+                'post_fork': post_fork,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from chatbot_app import app
+            return app
+
+    ChatBotApplication().run()
+
+
+def run_waitress():
+    """Multi-threaded waitress server (single process, works on Windows)"""
+    import signal
+    import threading
+    import time
+    from waitress import create_server
+    from chatbot_app import app, start_warmup
+
+    start_warmup()
+    server = create_server(app, host=config.HOST, port=config.PORT, threads=config.THREADS)
+    dispatcher = server.task_dispatcher
+
+    def drain_then_exit():
+        deadline = time.monotonic() + config.GRACEFUL_TIMEOUT
+        while time.monotonic() < deadline and (dispatcher.active_count or dispatcher.queue):
+            time.sleep(0.1)
+        time.sleep(0.2)  # let the loop flush the last responses
+        os.kill(os.getpid(), signal.SIGINT)
+
+    def stop(signum, frame):
+        # Stop accepting new connections, finish what is running, then exit
+        print("🛑 Shutting down, finishing open requests...")
+        server.del_channel()
+        threading.Thread(target=drain_then_exit, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        dispatcher.shutdown(timeout=config.GRACEFUL_TIMEOUT)
+
+
+def run_uvicorn():
+    """ASGI serving through uvicorn (see asgi.py)"""
+    import uvicorn
+
+    # Several workers need an import string so each process loads the app itself
+    uvicorn.run(
+        'asgi:asgi_app',
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT,
+        log_level='info'
+    )
+
+
+def run_flask():
+    """Flask's own threaded server, for when nothing better is installed"""
+    from chatbot_app import app, start_warmup
+
+    print("⚠️ No production server installed (pip install gunicorn or waitress)")
+    start_warmup()
+    app.run(host=config.HOST, port=config.PORT, debug=False, threaded=True, use_reloader=False)
+
+
+def main():
+    server = pick_server()
+    print(f"🚀 Starting ChatBot with {server} on http://{config.HOST}:{config.PORT}")
+    if server in ('gunicorn', 'uvicorn'):
+        print(f"⚙️ {config.WORKERS} workers")
+        share_answer_cache()
+        if config.SHARED_CACHE_PATH != 'off':
+            print(f"⚙️ Shared answer cache at {config.SHARED_CACHE_PATH}")
+        sync_user_saves()
+        if config.WORKERS > 1 and not config.WRITE_BEHIND:
+            print("⚙️ User saves are written synchronously (several workers)")
+    if server in ('gunicorn', 'waitress'):
+        print(f"⚙️ {config.THREADS} threads per worker")
+    {
+        'gunicorn': run_gunicorn,
+        'waitress': run_waitress,
+        'uvicorn': run_uvicorn,
+        'flask': run_flask,
+    }[server]()
+
+
+if __name__ == '__main__':
+    main()
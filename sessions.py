@@ -0,0 +1,73 @@
+# Save as: sessions.py
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SessionState:
+    """Lightweight per-user conversation state"""
+
+    __slots__ = ('user_id', 'user_name', 'history', 'last_seen')
+
+    def __init__(self, user_id, history_size=50):
+        self.user_id = user_id
+        self.user_name = None
+        self.history = deque(maxlen=history_size)
+        self.last_seen = time.monotonic()
+
+    def remember(self, user_input, response):
+        """Keep a turn of the conversation (oldest turns fall off)"""
+        self.history.append({
+            'user': user_input,
+            'bot': response,
+            'timestamp': time.strftime("%H:%M")
+        })
+
+
+class SessionManager:
+    """Thread-safe map of user id -> SessionState with LRU + idle TTL eviction"""
+
+    def __init__(self, max_sessions=10000, ttl=1800, history_size=50):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_size = history_size
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Session for user_id, created on first use"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(user_id)
+            if state is None:
+                state = SessionState(user_id, self.history_size)
+                self._sessions[user_id] = state
+            else:
+                self._sessions.move_to_end(user_id)
+            state.last_seen = now
+            self._evict(now)
+            return state
+
+    def drop(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def _evict(self, now):
+        # Least recently used sessions sit at the front
+        while self._sessions:
+            user_id, oldest = next(iter(self._sessions.items()))
+            idle = now - oldest.last_seen > self.ttl
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[user_id]
+            self.evictions += 1
+
+    def __contains__(self, user_id):
+        """Whether user_id has a session that has not gone idle"""
+        with self._lock:
+            state = self._sessions.get(user_id)
+            return state is not None and time.monotonic() - state.last_seen <= self.ttl
+
+    def __len__(self):
+        return len(self._sessions)
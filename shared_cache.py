@@ -0,0 +1,284 @@
+# Save as: shared_cache.py
+"""Answer cache shared by every worker process on one host
+
+The table is a fixed-size file that each worker memory-maps (keep it on
+/dev/shm so it never touches the disk). A key hashes to a bucket of WAYS
+slots, each holding the key, an expiry time and the JSON value. When a
+bucket is full, the entry that expires first is evicted, so the file
+never grows past the size it was created with. Each bucket is guarded by
+an fcntl byte-range lock on the file, which works across processes. A
+thread lock covers the threads inside one process, since fcntl locks
+belong to the process.
+
+get_or_set() is what makes it more than a cache. The first worker to
+miss a key claims its slot and computes the value. Workers asking for
+the same key meanwhile wait for that value instead of calling upstream
+themselves. A claim carries a deadline, so a worker that dies
+mid-lookup only delays the others until then.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared tier, each process keeps its own cache
+    fcntl = None
+
+MAGIC = b'ANSCACH1'
+HEADER = struct.Struct('<8sIII')  # magic, slot size, buckets, ways
+HEADER_BYTES = 64
+SLOT = struct.Struct('<B3xIIQd4x')  # state, key length, value length, key hash, expires_at
+WAYS = 4
+LOCK_STRIPES = 64
+
+EMPTY, READY, PENDING = 0, 1, 2
+POLL_MIN, POLL_MAX = 0.005, 0.05  # seconds between checks while another worker computes
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class SharedCache:
+    """Fixed-size hash table in a memory-mapped file; see the module docstring
+
+    Every worker must open the file with the same size settings; the
+    first to open it (or one that finds a different layout) lays it out.
+    """
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024, slot_bytes=4096, lease=15.0):
+        if fcntl is None:
+            raise OSError("the shared answer cache needs fcntl (POSIX only)")
+        self.path = path
+        self.slot_bytes = slot_bytes
+        self.ways = WAYS
+        self.buckets = max(1, (max_bytes - HEADER_BYTES) // (slot_bytes * WAYS))
+        self.size_bytes = HEADER_BYTES + self.buckets * WAYS * slot_bytes
+        self.lease = lease
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0  # misses served by another worker's fetch
+        self.wait_timeouts = 0
+        self.evictions = 0
+        self.too_large = 0
+        self._open()
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = HEADER.pack(MAGIC, self.slot_bytes, self.buckets, self.ways)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, HEADER_BYTES, 0)
+        try:
+            if os.pread(self._fd, HEADER.size, 0) != header or os.fstat(self._fd).st_size != self.size_bytes:
+                os.ftruncate(self._fd, 0)  # zero-filled again below
+                os.ftruncate(self._fd, self.size_bytes)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, HEADER_BYTES, 0)
+        self._mmap = mmap.mmap(self._fd, self.size_bytes)
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def reopen(self):
+        """Fresh thread locks in a forked worker; the mapping itself is inherited"""
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+    # Bucket access, always under _locked()
+
+    def _bucket(self, hashed):
+        bucket = hashed % self.buckets
+        return bucket, HEADER_BYTES + bucket * self.ways * self.slot_bytes
+
+    def _locked(self, bucket):
+        return _BucketLock(self._stripes[bucket % LOCK_STRIPES], self._fd, HEADER_BYTES + bucket)
+
+    def _find(self, base, key, hashed):
+        """(offset, slot fields) of key's slot in the bucket, or (None, None)"""
+        for way in range(self.ways):
+            offset = base + way * self.slot_bytes
+            fields = SLOT.unpack_from(self._mmap, offset)
+            if fields[0] != EMPTY and fields[3] == hashed and fields[1] == len(key):
+                start = offset + SLOT.size
+                if self._mmap[start:start + len(key)] == key:
+                    return offset, fields
+        return None, None
+
+    def _victim(self, base, now):
+        """Offset of the slot to reuse: empty, else expired, else the one expiring first"""
+        best, best_expires = None, None
+        for way in range(self.ways):
+            offset = base + way * self.slot_bytes
+            state, _, _, _, expires_at = SLOT.unpack_from(self._mmap, offset)
+            if state == EMPTY:
+                return offset
+            if best is None or expires_at < best_expires:
+                best, best_expires = offset, expires_at
+        if best_expires >= now:
+            self.evictions += 1
+        return best
+
+    def _write(self, offset, state, key, hashed, expires_at, data=b''):
+        start = offset + SLOT.size
+        self._mmap[start:start + len(key)] = key
+        self._mmap[start + len(key):start + len(key) + len(data)] = data
+        SLOT.pack_into(self._mmap, offset, state, len(key), len(data), hashed, expires_at)
+
+    def _read(self, offset, fields):
+        start = offset + SLOT.size + fields[1]
+        return json.loads(self._mmap[start:start + fields[2]])
+
+    # Public API
+
+    def _fits(self, key, data=b''):
+        return SLOT.size + len(key) + len(data) <= self.slot_bytes
+
+    def get(self, key):
+        """(found, value); value may be None for a cached "no answer" """
+        key = key.encode('utf-8')
+        if not self._fits(key):
+            return False, None
+        hashed = key_hash(key)
+        bucket, base = self._bucket(hashed)
+        with self._locked(bucket):
+            offset, fields = self._find(base, key, hashed)
+            if offset is None or fields[0] != READY or fields[4] < time.time():
+                return False, None
+            return True, self._read(offset, fields)
+
+    def set(self, key, value, ttl):
+        """Store value for ttl seconds; False if it does not fit in a slot"""
+        key = key.encode('utf-8')
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        if not self._fits(key, data):
+            self.too_large += 1
+            return False
+        hashed = key_hash(key)
+        bucket, base = self._bucket(hashed)
+        with self._locked(bucket):
+            now = time.time()
+            offset, _ = self._find(base, key, hashed)
+            if offset is None:
+                offset = self._victim(base, now)
+            self._write(offset, READY, key, hashed, now + ttl, data)
+        return True
+
+    def _claim(self, key, hashed):
+        """(state, value): READY and the value, PENDING while another worker
+        holds a live claim, or EMPTY and the expiry of the claim we just wrote"""
+        bucket, base = self._bucket(hashed)
+        with self._locked(bucket):
+            now = time.time()
+            offset, fields = self._find(base, key, hashed)
+            if offset is not None and fields[4] >= now:
+                if fields[0] == READY:
+                    return READY, self._read(offset, fields)
+                return PENDING, None
+            if offset is None:
+                offset = self._victim(base, now)
+            expires_at = now + self.lease
+            self._write(offset, PENDING, key, hashed, expires_at)
+            return EMPTY, expires_at
+
+    def _release(self, key, hashed, expires_at):
+        """Drop our claim so a waiting worker can take over
+
+        A claim that expired may since have been taken by another worker;
+        its expiry differs from ours, so it is left alone.
+        """
+        bucket, base = self._bucket(hashed)
+        with self._locked(bucket):
+            offset, fields = self._find(base, key, hashed)
+            if offset is not None and fields[0] == PENDING and fields[4] == expires_at:
+                SLOT.pack_into(self._mmap, offset, EMPTY, 0, 0, 0, 0.0)
+
+    def get_or_set(self, key, compute):
+        """(value, hit): the cached value, or compute()'s with at most one worker computing
+
+        compute() returns (value, ttl); a ttl of 0 stores nothing. hit is
+        True when the value came from the table, including values another
+        worker computed while this one waited. A worker that waits longer
+        than the lease computes the value itself. A key too long for a
+        slot bypasses the table.
+        """
+        encoded = key.encode('utf-8')
+        if not self._fits(encoded):
+            self.too_large += 1
+            self.misses += 1
+            value, _ = compute()
+            return value, False
+        hashed = key_hash(encoded)
+        deadline = time.monotonic() + self.lease
+        delay = POLL_MIN
+        waited = False
+        while True:
+            state, value = self._claim(encoded, hashed)
+            claim = value if state == EMPTY else None
+            if state == READY:
+                if waited:
+                    self.waits += 1
+                else:
+                    self.hits += 1
+                return value, True
+            if state == EMPTY:
+                break
+            if time.monotonic() >= deadline:
+                self.wait_timeouts += 1
+                break
+            waited = True
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+        self.misses += 1
+        try:
+            value, ttl = compute()
+        except BaseException:
+            if claim is not None:
+                self._release(encoded, hashed, claim)
+            raise
+        if not (ttl > 0 and self.set(key, value, ttl)) and claim is not None:
+            self._release(encoded, hashed, claim)
+        return value, False
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'wait_timeouts': self.wait_timeouts,
+            'evictions': self.evictions,
+            'too_large': self.too_large,
+            'slots': self.buckets * self.ways,
+            'slot_bytes': self.slot_bytes,
+        }
+
+
+class _BucketLock:
+    """Thread lock plus an fcntl lock on one byte standing for the bucket"""
+
+    __slots__ = ('thread_lock', 'fd', 'position')
+
+    def __init__(self, thread_lock, fd, position):
+        self.thread_lock = thread_lock
+        self.fd = fd
+        self.position = position
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.position)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.position)
+        finally:
+            self.thread_lock.release()
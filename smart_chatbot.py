@@ -1,197 +1,499 @@
 # Save as: smart_chatbot.py
-from googlesearch import search
-import requests
-from bs4 import BeautifulSoup
 import re
 import random
 from datetime import datetime
 import urllib.parse
+import os
+import threading
+import time
+from answer_cache import AnswerCache, normalize_query
+from single_flight import SingleFlight
+from admission import Scheduler, Overloaded, INTERACTIVE, BATCH
+from retrieval import RetrievalEngine, remaining_time, cancelled
+from circuit_breaker import CircuitBreaker, UpstreamError
+from http_client import HttpClient
+from html_extract import extract_from_chunks, header_charset, lxml_etree
+from intent_router import default_router
+from knowledge_index import KnowledgeIndex
+from title_index import open_title_index
+from spelling import open_spelling
+from metrics import span, timed, propagate
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+LEADING_ARTICLE = re.compile(r'^(the|a|an|about)\s+')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+WIKIPEDIA_BATCH_TITLES = 20  # the action API's limit for intro extracts
+BUSY_RESPONSE = ("⏳ I'm answering a lot of questions right now, so I couldn't look up '{query}'. "
+                 "Please try again in a few seconds!")
+
+def google_search(query, **kwargs):
+    """googlesearch.search, imported on first use (it pulls in bs4 and requests)"""
+    from googlesearch import search
+    return search(query, **kwargs)
 
 class SmartChatBot:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        self.conversation_history = []
-        self.user_name = None
+        # Per-user state (name, history) lives in sessions.SessionState;
+        # the bot itself is shared by every request thread
+        self.cache = cache if cache is not None else AnswerCache.from_config()
+        self.router = default_router
+        self.flights = SingleFlight()
+        
+        # Offline index of popular topics, consulted before any network lookup
+        self.knowledge = None
+        if config.KNOWLEDGE_INDEX_PATH and os.path.exists(config.KNOWLEDGE_INDEX_PATH):
+            self.knowledge = KnowledgeIndex(config.KNOWLEDGE_INDEX_PATH)
+        # Title index for /search and /suggest, loaded on first use (a full dump takes a while)
+        self._titles = None
+        self._learned_titles = None
+        self._titles_lock = threading.Lock()
+        self._spelling = None
+        self._spelling_loaded = False
+        self.timeout = config.REQUEST_TIMEOUT
+        self.web_search = google_search  # swappable for a local stub
+        
+        # Keep-alive connection pools shared by every request thread
+        self.http = HttpClient(
+            headers=self.headers,
+            pool_connections=config.HTTP_POOL_HOSTS,
+            pool_maxsize=config.HTTP_POOL_PER_HOST,
+            retries=config.HTTP_RETRIES,
+            backoff=config.HTTP_BACKOFF
+        )
+        self.page_pool = ThreadPoolExecutor(max_workers=config.PAGE_FETCH_WORKERS, thread_name_prefix='pages')
+        self.batch_pool = ThreadPoolExecutor(max_workers=config.BATCH_WORKERS, thread_name_prefix='batch')
+        
+        # One breaker per upstream, so a struggling one fails fast
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                error_rate=config.BREAKER_ERROR_RATE,
+                min_calls=config.BREAKER_MIN_CALLS,
+                window=config.BREAKER_WINDOW,
+                open_seconds=config.BREAKER_OPEN_SECONDS
+            )
+            for name in ('wikipedia_rest', 'wikipedia_search', 'google')
+        }
         
-    def is_name_message(self, text):
+        # Caps lookups in flight and requests per second to each upstream
+        wikipedia_budget = (config.UPSTREAM_RATE_WIKIPEDIA, config.UPSTREAM_RATE_WIKIPEDIA * config.UPSTREAM_BURST_SECONDS)
+        self.scheduler = Scheduler(
+            max_running=config.ADMISSION_MAX_RUNNING,
+            max_queue=config.ADMISSION_MAX_QUEUE,
+            max_wait=config.ADMISSION_MAX_WAIT,
+            budgets={
+                'wikipedia_rest': wikipedia_budget,
+                'wikipedia_search': wikipedia_budget,
+                'google': (config.UPSTREAM_RATE_GOOGLE, config.UPSTREAM_RATE_GOOGLE * config.UPSTREAM_BURST_SECONDS),
+            }
+        )
+        
+        # Providers in priority order. Race mode runs all of them per lookup,
+        # so the pool must fit every admitted lookup's providers at once
+        providers = [('wikipedia', self.search_wikipedia_api), ('google', self.search_google)]
+        self.retrieval = RetrievalEngine(
+            providers,
+            mode=config.RETRIEVAL_MODE,
+            deadline=config.RETRIEVAL_DEADLINE,
+            max_workers=max(config.RETRIEVAL_WORKERS, config.ADMISSION_MAX_RUNNING * len(providers)),
+            # Google's budget is small; don't spend it on lookups Wikipedia answers
+            head_starts={'google': config.GOOGLE_HEAD_START}
+        )
+    
+    def reopen(self):
+        """Re-create per-process resources after the server forks a worker"""
+        self.cache.reopen()
+        self.http.reopen()
+        self.scheduler.reopen()
+        if self.knowledge is not None:
+            self.knowledge.reopen()
+    
+    def warmup(self):
+        """Do first-use work ahead of the first message (run it in the background)
+
+        Imports the lazily loaded provider modules, opens a pooled
+        connection to Wikipedia and touches the local index.
+        """
+        started = time.perf_counter()
+        try:
+            import googlesearch  # noqa: F401
+        except ImportError as e:
+            print(f"⚠️ Google search unavailable: {e}")
+        lxml_etree()
+        self.http.warm(f"{config.WIKIPEDIA_REST_URL}/page/summary/Wikipedia")
+        if self.knowledge is not None:
+            len(self.knowledge)
+        self.titles
+        self.spelling
+        print(f"🔥 Warmed up in {time.perf_counter() - started:.2f}s")
+    
+    @property
+    def titles(self):
+        """The TitleIndex, built from the titles dump and answered titles on first use"""
+        if self._titles is None:
+            with self._titles_lock:
+                if self._titles is None:
+                    started = time.perf_counter()
+                    titles, self._learned_titles = open_title_index(self.knowledge)
+                    self._titles = titles
+                    stats = titles.stats()
+                    print(f"🔤 Title index: {stats['titles']} titles, {stats['learned']} learned "
+                          f"({time.perf_counter() - started:.2f}s)")
+        return self._titles
+    
+    @property
+    def spelling(self):
+        """The memory-mapped SpellingIndex (built first if missing or stale), or None"""
+        if not self._spelling_loaded:
+            with self._titles_lock:
+                if not self._spelling_loaded:
+                    self._spelling = open_spelling(self.knowledge)
+                    self._spelling_loaded = True
+        return self._spelling
+    
+    def resolve_query(self, query):
+        """Canonical title for an exact title or alias; the query itself otherwise
+
+        Runs before any lookup, so "Black hole" and "black holes" share one
+        cached answer. Typos are not corrected here: a word missing from the
+        title vocabulary is often a real word ("Parks"), so correction waits
+        until the query itself finds nothing (see answer_or_correct).
+        """
+        title = self.titles.get(query)
+        if title is None and self.spelling is not None:
+            title = self.spelling.title(query)
+        return title or query
+    
+    def correct_spelling(self, query):
+        """Known title the query is a misspelling of, or None"""
+        if self.spelling is None:
+            return None
+        with span('spelling'):
+            title = self.spelling.correct(query)
+        if title is None or normalize_query(title) == normalize_query(query):
+            return None
+        return title
+    
+    def answer_or_correct(self, query, priority=INTERACTIVE):
+        """(query, result), retrying as a corrected title when the query found nothing"""
+        result = self.get_answer(query, priority)
+        if result is None:
+            return self.answer_corrected(query, priority) or (query, None)
+        return query, result
+    
+    def answer_corrected(self, query, priority=INTERACTIVE):
+        """(title, result) for the title a query that found nothing was misspelling, or None"""
+        title = self.correct_spelling(query)
+        if title is None:
+            return None
+        result = self.get_answer(title, priority)
+        if result is None:
+            return None
+        print(f"🔤 Resolved '{query}' to '{title}'")
+        return title, result
+    
+    def learn_title(self, result):
+        """Remember an answered article title for suggestions"""
+        if result.get('type') not in ('wikipedia', 'local') or not result.get('source'):
+            return
+        if self.titles.learn(result['source']) and self._learned_titles is not None:
+            try:
+                self._learned_titles.append(result['source'])
+            except OSError as e:
+                print(f"Could not record learned title: {e}")
+    
+    def suggest(self, prefix, limit=None):
+        """Title completions for prefix, from memory only"""
+        return self.titles.suggest(prefix, limit or config.SUGGEST_LIMIT)
+    
+    def search_wikipedia(self, topic):
+        """Direct lookup for /search: the topic's formatted answer, skipping chat handling
+
+        The topic is resolved to its canonical title first, so "black
+        hole", "Black Hole" and "blakc hole" share one answer.
+        """
+        title, result = self.answer_or_correct(self.resolve_query(topic.strip()))
+        return self.format_response(result, title)
+    
+    def request_timeout(self):
+        """Per-request timeout, capped by what is left of the message's budget"""
+        return max(0.1, remaining_time(self.timeout))
+        
+    def is_name_message(self, text, routes=None):
         """Check if message contains name information"""
-        text_lower = text.lower()
-        name_patterns = ['my name is', 'i am', 'i\'m', 'call me']
-        return any(pattern in text_lower for pattern in name_patterns)
+        routes = routes if routes is not None else self.router.scan(text)
+        return 'name' in routes
     
-    def extract_name(self, text):
+    def extract_name(self, text, routes=None):
         """Extract name from message"""
-        text_lower = text.lower()
-        
-        name_patterns = ['my name is', 'i am', 'i\'m', 'call me']
-        for pattern in name_patterns:
-            if pattern in text_lower:
-                try:
-                    rest = text_lower.split(pattern)[1].strip()
-                    name = rest.split()[0].title()
-                    return name
-                except:
-                    continue
+        routes = routes if routes is not None else self.router.scan(text)
+        route = routes.get('name')
+        if route and route.slot:
+            return route.slot.split()[0].title()
         return None
     
+    @timed('google')
     def search_google(self, query, num_results=3):
-        """Search Google and extract information"""
+        """Search Google and extract information
+
+        Returns None when nothing useful was found; raises when Google or
+        every result page failed, so the miss is not cached as "not found".
+        """
+        print(f"🔍 Googling: {query}")
+        
+        # Get Google search results (rate limiting trips the google breaker)
+        self.scheduler.spend('google', remaining_time(config.UPSTREAM_TOKEN_WAIT))
+        if cancelled():
+            return None  # Wikipedia answered while we waited for budget
+        with span('google_search'):
+            search_results = self.breakers['google'].call(
+                lambda: list(self.web_search(query, num_results=num_results, lang='en'))
+            )
+        
+        if not search_results or cancelled():
+            return None  # nothing found, or Wikipedia answered during the search
+        
+        # Fetch the top pages at the same time, prefer them in result order
+        timeout = self.request_timeout()
+        futures = [
+            self.page_pool.submit(propagate(self.fetch_page_answer), url, query, timeout)
+            for url in search_results[:2]
+        ]
+        errors = []
         try:
-            print(f"🔍 Googling: {query}")
-            
-            # Get Google search results
-            search_results = list(search(query, num_results=num_results, lang='en'))
-            
-            if not search_results:
-                return None
-            
-            # Try each result
-            for url in search_results[:2]:
+            for future in futures:
+                if cancelled():
+                    return None
                 try:
-                    # Fetch page content
-                    response = requests.get(url, headers=self.headers, timeout=10)
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Remove unwanted elements
-                    for element in soup(['script', 'style', 'nav', 'footer', 'aside']):
-                        element.decompose()
-                    
-                    # Get text
-                    text = soup.get_text()
-                    
-                    # Clean text
-                    lines = (line.strip() for line in text.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    text = ' '.join(chunk for chunk in chunks if chunk)
-                    
-                    if len(text) > 200:
-                        # Extract relevant sentences
-                        sentences = re.split(r'(?<=[.!?])\s+', text)
-                        
-                        # Find sentences with query words
-                        query_words = query.lower().split()
-                        relevant = []
-                        
-                        for sentence in sentences:
-                            sentence_lower = sentence.lower()
-                            if any(word in sentence_lower for word in query_words):
-                                if len(sentence) > 20:
-                                    relevant.append(sentence)
-                            
-                            if len(relevant) >= 4:
-                                break
-                        
-                        if relevant:
-                            answer = ' '.join(relevant)
-                            return {
-                                'answer': answer[:800] + '...' if len(answer) > 800 else answer,
-                                'source': url,
-                                'type': 'google'
-                            }
-                    
+                    result = future.result(timeout=max(0.1, remaining_time(timeout)))
                 except Exception as e:
+                    errors.append(e)
                     continue
-            
+                if result:
+                    return result
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        if len(errors) == len(futures):
+            raise UpstreamError(f"no result page could be read: {errors[0]}")
+        return None
+    
+    def fetch_page_answer(self, url, query, timeout):
+        """Stream one result page and pick the sentences that best answer the query"""
+        response = self.http.get(url, timeout=timeout, stream=True)
+        try:
+            chunks = response.iter_content(chunk_size=16 * 1024)
+            # Includes reading the body, which streams in as it is parsed
+            with span('html_extract'):
+                relevant, text_length = extract_from_chunks(
+                    chunks, query,
+                    max_bytes=config.PAGE_MAX_BYTES,
+                    encoding=header_charset(response.headers.get('Content-Type')),
+                    char_budget=config.SNIPPET_CHAR_BUDGET,
+                    max_candidates=config.SNIPPET_MAX_CANDIDATES
+                )
+        finally:
+            response.close()
+        
+        # Skip near-empty pages (consent walls, redirects)
+        if not relevant or (text_length <= 200 and len(relevant) < 4):
             return None
-            
-        except Exception as e:
-            print(f"Google search error: {e}")
+        
+        answer = ' '.join(relevant)
+        return {
+            'answer': answer[:800] + '...' if len(answer) > 800 else answer,
+            'source': url,
+            'type': 'google'
+        }
+    
+    def get_json(self, breaker, url):
+        """GET url through a provider's breaker: parsed JSON, or None on a 404
+
+        429 and 5xx answers (after the HTTP client's retries), timeouts and
+        connection errors raise and count against the breaker. The call
+        first takes a token from the upstream's budget (breaker names the
+        upstream) and raises RateLimited when there is none.
+        """
+        def fetch():
+            response = self.http.get(url, timeout=self.request_timeout())
+            if response.status_code == 429 or response.status_code >= 500:
+                raise UpstreamError(f"HTTP {response.status_code} from {breaker}")
+            return response
+        
+        self.scheduler.spend(breaker, remaining_time(config.UPSTREAM_TOKEN_WAIT))
+        response = self.breakers[breaker].call(fetch)
+        if response.status_code != 200:
             return None
+        return response.json()
     
-    def search_wikipedia_api(self, query):
-        """Search Wikipedia using API"""
-        try:
-            print(f"📚 Searching Wikipedia: {query}")
-            
-            # Clean query
-            clean_query = urllib.parse.quote(query.replace(' ', '_'))
-            
-            # Wikipedia API
-            url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{clean_query}"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'extract' in data and data['extract']:
-                    return {
-                        'answer': data['extract'],
-                        'source': data.get('title', 'Wikipedia'),
-                        'url': data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                        'type': 'wikipedia'
-                    }
-            
-            # Try search if direct page doesn't exist
-            search_url = f"https://en.wikipedia.org/w/api.php?action=opensearch&search={urllib.parse.quote(query)}&limit=3&format=json"
-            search_response = requests.get(search_url, headers=self.headers, timeout=10)
-            
-            if search_response.status_code == 200:
-                search_data = search_response.json()
-                
-                if len(search_data) >= 3 and search_data[1]:
-                    # Try first result
-                    first_result = search_data[1][0]
-                    page_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{urllib.parse.quote(first_result.replace(' ', '_'))}"
-                    
-                    page_response = requests.get(page_url, headers=self.headers, timeout=10)
-                    if page_response.status_code == 200:
-                        page_data = page_response.json()
-                        
-                        if 'extract' in page_data and page_data['extract']:
-                            return {
-                                'answer': page_data['extract'],
-                                'source': page_data.get('title', first_result),
-                                'url': page_data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                                'type': 'wikipedia'
-                            }
-            
+    def wikipedia_summary(self, title):
+        """REST summary for an article title, or None when there is no such page"""
+        url = f"{config.WIKIPEDIA_REST_URL}/page/summary/{urllib.parse.quote(title.replace(' ', '_'))}"
+        data = self.get_json('wikipedia_rest', url)
+        if not data or not data.get('extract'):
             return None
+        return {
+            'answer': data['extract'],
+            'source': data.get('title', title),
+            'url': data.get('content_urls', {}).get('desktop', {}).get('page', ''),
+            'type': 'wikipedia'
+        }
+    
+    def wikipedia_opensearch(self, query, limit=3):
+        """Titles Wikipedia's search suggests for query"""
+        url = f"{config.WIKIPEDIA_API_URL}?action=opensearch&search={urllib.parse.quote(query)}&limit={limit}&format=json"
+        data = self.get_json('wikipedia_search', url)
+        if not data or len(data) < 3:
+            return []
+        return data[1]
+    
+    def wikipedia_summaries(self, titles):
+        """Intro extracts for many titles at once: {requested title: result}
+
+        Uses the action API's multi-title query (up to 20 titles a request),
+        following Wikipedia's title normalization and redirects. Titles with
+        no article are left out.
+        """
+        found = {}
+        for start in range(0, len(titles), WIKIPEDIA_BATCH_TITLES):
+            chunk = titles[start:start + WIKIPEDIA_BATCH_TITLES]
+            params = urllib.parse.urlencode({
+                'action': 'query', 'prop': 'extracts', 'exintro': 1, 'explaintext': 1,
+                'exlimit': 'max', 'redirects': 1, 'format': 'json', 'titles': '|'.join(chunk)
+            })
+            # Same host and endpoint as opensearch, so the same breaker
+            data = self.get_json('wikipedia_search', f"{config.WIKIPEDIA_API_URL}?{params}")
+            query_data = (data or {}).get('query', {})
             
-        except Exception as e:
-            print(f"Wikipedia error: {e}")
-            return None
+            # requested title -> final article title
+            renamed = {}
+            for step in query_data.get('normalized', []) + query_data.get('redirects', []):
+                renamed[step['from']] = step['to']
+            pages = {page.get('title'): page for page in query_data.get('pages', {}).values()}
+            
+            for title in chunk:
+                final = title
+                for _ in range(3):  # normalized, then redirected
+                    final = renamed.get(final, final)
+                page = pages.get(final)
+                if not page or 'missing' in page or not page.get('extract'):
+                    continue
+                found[title] = {
+                    'answer': page['extract'],
+                    'source': page['title'],
+                    'url': f"https://en.wikipedia.org/wiki/{urllib.parse.quote(page['title'].replace(' ', '_'))}",
+                    'type': 'wikipedia'
+                }
+        return found
     
-    def get_answer(self, query):
-        """Get answer from multiple sources"""
-        # Try Wikipedia first
-        wikipedia_result = self.search_wikipedia_api(query)
-        if wikipedia_result:
-            return wikipedia_result
+    @timed('wikipedia')
+    def search_wikipedia_api(self, query):
+        """Search Wikipedia using API"""
+        print(f"📚 Searching Wikipedia: {query}")
         
-        # Then try Google
-        google_result = self.search_google(query)
-        if google_result:
-            return google_result
+        # Direct page first
+        result = self.wikipedia_summary(query)
+        if result or cancelled():
+            return result
         
-        return None
+        # Try search if direct page doesn't exist
+        titles = self.wikipedia_opensearch(query)
+        if not titles or cancelled():
+            return None
+        return self.wikipedia_summary(titles[0])
+    
+    def get_answer(self, query, priority=INTERACTIVE):
+        """Get answer from multiple sources
+
+        Raises admission.Overloaded when the lookup had to go upstream and
+        the scheduler shed it.
+        """
+        # Repeat topics are served from the cache
+        cache_key = normalize_query(query)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # So are topics that recently turned out not to exist
+        if self.cache.is_known_missing(cache_key):
+            return None
+        
+        # Identical lookups already in flight share one upstream fetch
+        return self.flights.do(cache_key, lambda: self._fetch_and_cache(query, cache_key, priority))
+    
+    def _fetch_and_cache(self, query, cache_key, priority=INTERACTIVE):
+        """Fetch an answer and cache it if one was found"""
+        # A previous flight may have filled the cache since our miss
+        cached = self.cache.memory.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # With a shared cache, one worker process fetches and the others wait for it
+        return self.cache.get_or_compute(cache_key, lambda: self._lookup_and_learn(query, priority))
+    
+    def _lookup_and_learn(self, query, priority):
+        result, conclusive = self.lookup(query, priority)
+        if result:
+            self.learn_title(result)
+        return result, conclusive
+    
+    def fetch_answer(self, query):
+        """Look the query up locally, then online, skipping the cache"""
+        return self.lookup(query)[0]
+    
+    def lookup(self, query, priority=INTERACTIVE):
+        """(result, conclusive): conclusive is False if a provider failed or ran out of time"""
+        # The local index answers in well under a millisecond, so it runs
+        # inline rather than racing the network providers
+        if self.knowledge is not None:
+            try:
+                with span('knowledge_index'):
+                    local_result = self.knowledge.answer(query)
+            except Exception as e:
+                print(f"Knowledge index error: {e}")
+                local_result = None
+            if local_result:
+                return local_result, True
+        
+        # Wikipedia wins over Google; see retrieval.py for race vs sequential.
+        # Only this part waits for admission: it is the one that goes upstream.
+        # The slot is held until the losing providers have stopped too
+        self.scheduler.acquire(priority)
+        return self.retrieval.lookup(query, on_finished=self.scheduler.release)
     
     def format_response(self, result, query):
         """Format the response"""
         if not result:
             return self.get_fallback_response(query)
         
-        answer = result['answer']
-        source = result.get('source', 'Search result')
-        url = result.get('url', '')
-        
+        return ''.join(self.format_chunks(result, query)) + self.format_source(result)
+    
+    def format_chunks(self, result, query):
+        """Heading and answer split into sentence-sized pieces for streaming"""
         # Clean answer
-        answer = re.sub(r'\s+', ' ', answer).strip()
+        answer = re.sub(r'\s+', ' ', result['answer']).strip()
         
-        # Format
-        response = f"📚 **About {query}:**\n\n{answer}"
+        chunks = [f"📚 **About {query}:**\n\n"]
+        sentences = SENTENCE_SPLIT.split(answer)
+        for i, sentence in enumerate(sentences):
+            chunks.append(sentence if i == len(sentences) - 1 else sentence + ' ')
+        return chunks
+    
+    def format_source(self, result):
+        """Source line appended under an answer"""
+        source = result.get('source', 'Search result')
+        url = result.get('url', '')
         
-        # Add source
         if url:
             if 'wikipedia' in url.lower():
-                response += f"\n\n🔗 **Source:** [Wikipedia - {source}]({url})"
-            else:
-                response += f"\n\n🔗 **Source:** [{source}]({url})"
-        else:
-            response += f"\n\n🔗 *Information from {source}*"
-        
-        return response
+                return f"\n\n🔗 **Source:** [Wikipedia - {source}]({url})"
+            return f"\n\n🔗 **Source:** [{source}]({url})"
+        return f"\n\n🔗 *Information from {source}*"
     
     def get_fallback_response(self, query):
         """Fallback with suggestions"""
@@ -208,36 +510,42 @@ class SmartChatBot:
         
         return f"I couldn't find information about '{query}'. Try these topics:{suggestion_text}\n\n💡 **Tip:** Be specific and check spelling!"
     
-    def handle_general_conversation(self, user_input):
+    def get_busy_response(self, query):
+        """Quick reply for a lookup shed by the scheduler"""
+        return BUSY_RESPONSE.format(query=query)
+    
+    def handle_general_conversation(self, user_input, routes=None):
         """Handle general chat"""
-        user_lower = user_input.lower()
+        routes = routes if routes is not None else self.router.scan(user_input)
+        route = routes.get('chat')
+        intent = route.intent if route else None
         
-        if any(word in user_lower for word in ['hello', 'hi', 'hey']):
+        if intent == 'greeting':
             return random.choice([
                 "Hello! 👋 Ask me anything!",
                 "Hi there! 😊 What would you like to know?",
                 "Hey! Ready to help!"
             ])
         
-        elif any(word in user_lower for word in ['bye', 'goodbye']):
+        elif intent == 'farewell':
             return "Goodbye! 👋"
         
-        elif 'thank' in user_lower:
+        elif intent == 'thanks':
             return "You're welcome! 😊"
         
-        elif any(word in user_lower for word in ['your name', 'who are you']):
+        elif intent == 'identity':
             return "I'm SmartChatBot! 🤖"
         
-        elif 'time' in user_lower:
+        elif intent == 'time':
             return f"⏰ {datetime.now().strftime('%I:%M %p')}"
         
-        elif 'date' in user_lower:
+        elif intent == 'date':
             return f"📅 {datetime.now().strftime('%A, %B %d, %Y')}"
         
-        elif 'help' in user_lower:
+        elif intent == 'help':
             return "Ask me questions like: 'What is AI?', 'Who was Einstein?', 'Explain quantum physics'"
         
-        elif 'fact' in user_lower:
+        elif intent == 'fact':
             facts = [
                 "🧠 Your brain generates enough electricity to power a small light bulb!",
                 "🌌 There are more stars than grains of sand on Earth!",
@@ -246,7 +554,7 @@ class SmartChatBot:
             ]
             return random.choice(facts)
         
-        elif 'joke' in user_lower:
+        elif intent == 'joke':
             jokes = [
                 "😂 Why don't scientists trust atoms? Because they make up everything!",
                 "🐻 What do you call a bear with no teeth? A gummy bear!"
@@ -258,62 +566,168 @@ class SmartChatBot:
         
         return None
     
-    def extract_query(self, text):
+    def extract_query(self, text, routes=None):
         """Extract search query"""
-        text_lower = text.lower().strip().replace('?', '')
-        
-        patterns = [
-            r'what is (.*)',
-            r'who is (.*)',
-            r'tell me about (.*)',
-            r'explain (.*)',
-            r'what are (.*)',
-            r'how does (.*)'
-        ]
+        routes = routes if routes is not None else self.router.scan(text)
+        route = routes.get('query')
         
-        for pattern in patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                query = match.group(1).strip()
-                query = re.sub(r'^(the|a|an|about)\s+', '', query)
-                return query.title()
+        if route:
+            query = route.slot.replace('?', '').strip()
+            query = LEADING_ARTICLE.sub('', query)
+            return query.title()
         
-        return text_lower.title()
+        return text.lower().strip().replace('?', '').title()
     
     # ADD THIS MISSING METHOD:
-    def process_message(self, user_input):
+    def process_message(self, user_input, session=None):
         """Main processing method"""
+        response = None
+        with span('process_message'):
+            for event, data in self.stream_message(user_input, session):
+                if event == 'done':
+                    response = data['response']
+        return response
+    
+    def process_messages(self, messages):
+        """Answer many messages at once; one {'message', 'response'} or {'message', 'error'} per input
+
+        Chat replies are answered inline. Distinct queries are looked up
+        once: cache first, then one multi-title Wikipedia request for all
+        of them, then the full lookup (search, Google) for the rest, at
+        most config.BATCH_WORKERS at a time. Nothing is added to any
+        user's history.
+        """
+        with span('process_messages'):
+            results = [None] * len(messages)
+            queries = {}  # cache key -> (query, [input positions])
+            for i, message in enumerate(messages):
+                if not isinstance(message, str) or not message.strip():
+                    results[i] = {'message': message, 'error': 'Message must be non-empty text'}
+                    continue
+                text = message.strip()
+                routes = self.router.scan(text)
+                reply = self.handle_general_conversation(text, routes)
+                if reply:
+                    results[i] = {'message': message, 'response': reply}
+                    continue
+                query = self.extract_query(text, routes)
+                if not query:
+                    results[i] = {'message': message, 'error': "Couldn't tell what to look up"}
+                    continue
+                query = self.resolve_query(query)
+                queries.setdefault(normalize_query(query), (query, []))[1].append(i)
+            
+            answers = self._answer_queries(queries)
+            for key, (query, positions) in queries.items():
+                outcome = answers[key]
+                if outcome is None:
+                    # Nothing under this name: try it as a misspelt title
+                    try:
+                        query, outcome = self.answer_corrected(query, BATCH) or (query, None)
+                    except Exception as e:
+                        print(f"Batch correction error for {query}: {e}")
+                for i in positions:
+                    if isinstance(outcome, Overloaded):
+                        results[i] = {'message': messages[i], 'error': 'Too busy, try again shortly'}
+                    elif isinstance(outcome, Exception):
+                        results[i] = {'message': messages[i], 'error': 'Lookup failed'}
+                    else:
+                        results[i] = {'message': messages[i], 'response': self.format_response(outcome, query)}
+            return results
+    
+    def _answer_queries(self, queries):
+        """{cache key: result, None or the exception} for {cache key: (query, positions)}"""
+        answers = {}
+        misses = {}
+        for key, (query, _) in queries.items():
+            cached = self.cache.get(key)
+            if cached is not None:
+                answers[key] = cached
+            elif self.cache.is_known_missing(key):
+                answers[key] = None
+            else:
+                misses[key] = query
+        
+        # One request per 20 titles instead of one lookup per query
+        if len(misses) > 1:
+            try:
+                with self.scheduler.admit(BATCH):
+                    found = self.wikipedia_summaries(list(misses.values()))
+            except Overloaded:
+                found = {}
+            except Exception as e:
+                print(f"Wikipedia batch error: {e}")
+                found = {}
+            for key, query in list(misses.items()):
+                if query in found:
+                    answers[key] = found[query]
+                    self.cache.set(key, found[query])
+                    self.learn_title(found[query])
+                    del misses[key]
+        
+        futures = {key: self.batch_pool.submit(propagate(self.get_answer), query, BATCH) for key, query in misses.items()}
+        for key, future in futures.items():
+            try:
+                answers[key] = future.result()
+            except Overloaded as e:
+                answers[key] = e
+            except Exception as e:
+                print(f"Batch lookup error for {misses[key]}: {e}")
+                answers[key] = e
+        return answers
+    
+    def stream_message(self, user_input, session=None):
+        """Process a message as a series of (event, data) steps
+
+        Yields 'searching' before any lookup starts, then 'chunk' pieces of
+        the answer, the 'source' line and finally 'done' with the full reply.
+        Quick replies only yield 'done'.
+        """
         user_input = user_input.strip()
         
         if not user_input:
-            return "Please type a question!"
+            yield 'done', {'response': "Please type a question!"}
+            return
+        
+        # One routing pass serves both the chat and the query checks
+        routes = self.router.scan(user_input)
         
         # General conversation
-        general_response = self.handle_general_conversation(user_input)
+        general_response = self.handle_general_conversation(user_input, routes)
         if general_response:
-            return general_response
+            yield 'done', {'response': general_response}
+            return
         
         # Extract query
-        query = self.extract_query(user_input)
+        query = self.extract_query(user_input, routes)
         
         if not query:
-            return "I'm not sure what you're asking. Try being more specific!"
+            yield 'done', {'response': "I'm not sure what you're asking. Try being more specific!"}
+            return
+        
+        # Typos and aliases map to the canonical title before any lookup
+        query = self.resolve_query(query)
+        
+        yield 'searching', {'query': query}
         
-        # Get answer
-        result = self.get_answer(query)
+        # Get answer; when the scheduler sheds the lookup, say so at once
+        try:
+            query, result = self.answer_or_correct(query)
+        except Overloaded:
+            yield 'done', {'response': self.get_busy_response(query), 'degraded': True}
+            return
+        if result:
+            for chunk in self.format_chunks(result, query):
+                yield 'chunk', {'text': chunk}
+            source = self.format_source(result)
+            yield 'source', {'text': source, 'url': result.get('url', ''), 'type': result.get('type')}
         response = self.format_response(result, query)
         
         # Store history
-        self.conversation_history.append({
-            'user': user_input,
-            'bot': response,
-            'timestamp': datetime.now().strftime("%H:%M")
-        })
-        
-        if len(self.conversation_history) > 50:
-            self.conversation_history = self.conversation_history[-50:]
+        if session is not None:
+            session.remember(user_input, response)
         
-        return response
+        yield 'done', {'response': response}
 
 # Test
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+# Save as: snippets.py
+"""Ranked snippet extraction: pick the sentences that best answer a query
+
+    index = SentenceIndex()
+    for sentence in sentences:
+        index.add(sentence)
+    best = index.top('black holes', k=4, char_budget=800)
+
+Each sentence is tokenized once into an inverted index (token -> sentence
+ids and term counts). Queries are scored with BM25 over the postings of
+the query's tokens only, so the cost grows with how often the query words
+occur, not with sentences x words. NumPy is used for the scoring when it
+is installed.
+
+BM25 alone favours short lines (titles, promos, "Is X real?" comments),
+so rank() also weighs how much of the query a sentence covers, its length,
+and whether it reads like a definition ("X is ...").
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python scorer gives the same ranking
+    np = None
+
+TOKEN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his how i in is it its of on or "
+    "she that the their they this to was were what when where which who why will with you".split()
+)
+FULL_LENGTH = 8  # tokens; shorter sentences are scaled down
+DEFINITION_BOOST = 2.0
+EXCLAIM_PENALTY = 0.5
+
+
+def fold(token):
+    """Cheap plural folding so 'holes' matches 'hole' and 'galaxies' matches 'galaxy'"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lower-cased, folded word tokens without stopwords"""
+    return [fold(token) for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def definition_pattern(query_tokens):
+    """Matches sentences that open with the query and a linking verb: 'A black hole is ...'"""
+    if not query_tokens:
+        return None
+    # 'galaxy' was folded from 'galaxies'; match either form
+    words = r'\W+'.join(re.escape(token[:-1] if token.endswith('y') else token) for token in query_tokens)
+    return re.compile(rf"^(?:the |an? )?{words}\w*\s+(?:is|are|was|were|refers)\b", re.IGNORECASE)
+
+
+class SentenceIndex:
+    """Inverted index over a page's sentences, scored with BM25
+
+    With a vocabulary (the query's tokens, when it is known up front),
+    only those tokens get postings and sentences that cannot contain
+    them are counted without being tokenized.
+    """
+
+    def __init__(self, vocabulary=None, k1=1.2, b=0.5):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = None if vocabulary is None else frozenset(vocabulary)
+        # Substrings every form of a vocabulary token contains ('galax' for 'galaxy')
+        self._probes = tuple({token[:-1] if len(token) > 3 else token for token in self.vocabulary or ()})
+        self.sentences = []
+        self.lengths = []  # tokens (words, with a vocabulary) per sentence
+        self.postings = defaultdict(list)  # token -> [(sentence id, term count)]
+        self._seen = set()
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def add(self, sentence):
+        """Index a sentence; returns its indexed tokens (empty for duplicates)"""
+        if sentence in self._seen:
+            return []
+        self._seen.add(sentence)
+        sentence_id = len(self.sentences)
+        self.sentences.append(sentence)
+
+        if self.vocabulary is not None:
+            lower = sentence.lower()
+            self.lengths.append(lower.count(' ') + 1)  # sentences arrive whitespace-normalized
+            if not any(probe in lower for probe in self._probes):
+                return []
+            tokens = [token for token in tokenize(lower) if token in self.vocabulary]
+        else:
+            tokens = tokenize(sentence)
+            self.lengths.append(len(tokens))
+        for token, count in Counter(tokens).items():
+            self.postings[token].append((sentence_id, count))
+        return tokens
+
+    def scores(self, query_tokens):
+        """{sentence id: BM25 score} for sentences containing any query token"""
+        n = len(self.sentences)
+        if not n:
+            return {}
+        avg_length = sum(self.lengths) / n or 1.0
+        query_tokens = [token for token in dict.fromkeys(query_tokens) if token in self.postings]
+        if np is not None and query_tokens:
+            return self._scores_numpy(query_tokens, n, avg_length)
+
+        scores = defaultdict(float)
+        norm = self.k1 * (1 - self.b)
+        slope = self.k1 * self.b / avg_length
+        for token in query_tokens:
+            postings = self.postings[token]
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for sentence_id, count in postings:
+                scores[sentence_id] += idf * count * (self.k1 + 1) / (
+                    count + norm + slope * self.lengths[sentence_id])
+        return scores
+
+    def _scores_numpy(self, query_tokens, n, avg_length):
+        lengths = np.asarray(self.lengths, dtype=np.float64)
+        scores = np.zeros(n)
+        for token in query_tokens:
+            postings = np.asarray(self.postings[token], dtype=np.float64)
+            ids = postings[:, 0].astype(np.intp)
+            counts = postings[:, 1]
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            # ids are unique within one token's postings, so += is safe here
+            scores[ids] += idf * counts * (self.k1 + 1) / (
+                counts + self.k1 * (1 - self.b + self.b * lengths[ids] / avg_length))
+        hit = np.nonzero(scores)[0]
+        return dict(zip(hit.tolist(), scores[hit].tolist()))
+
+    def rank(self, query):
+        """[(score, sentence id)] for sentences mentioning the query, best first"""
+        query_tokens = tokenize(query)
+        scores = self.scores(query_tokens)
+        if not scores:
+            return []
+        wanted = set(query_tokens)
+        covered = Counter(
+            sentence_id for token in wanted for sentence_id, _ in self.postings.get(token, ())
+        )
+        definition = definition_pattern(query_tokens)
+        ranked = []
+        for sentence_id, score in scores.items():
+            sentence = self.sentences[sentence_id]
+            score *= 1 + covered[sentence_id] / len(wanted)
+            score *= min(1.0, self.lengths[sentence_id] / FULL_LENGTH)
+            if sentence.endswith(('?', '!')):
+                score *= EXCLAIM_PENALTY
+            if definition.match(sentence):
+                score *= DEFINITION_BOOST
+            ranked.append((score, sentence_id))
+        # Best score first; earlier sentences win ties
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return ranked
+
+    def top(self, query, k=4, char_budget=800, min_length=20):
+        """Best k sentences for query within char_budget, in page order"""
+        chosen, used = [], 0
+        for _, sentence_id in self.rank(query):
+            sentence = self.sentences[sentence_id]
+            if len(sentence) <= min_length:
+                continue
+            extra = len(sentence) + (1 if chosen else 0)
+            if used + extra > char_budget:
+                continue
+            chosen.append(sentence_id)
+            used += extra
+            if len(chosen) >= k:
+                break
+        return [self.sentences[sentence_id] for sentence_id in sorted(chosen)]
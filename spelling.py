@@ -0,0 +1,364 @@
+# Save as: spelling.py
+"""Typo-tolerant query resolution against known titles and aliases
+
+    python spelling.py build            # rebuild spelling.idx from the title sources
+    python spelling.py lookup 'albert einstien'
+
+Each query word not in the title vocabulary is corrected SymSpell-style.
+Every word of the vocabulary is stored under each string reachable from
+its first PREFIX_LENGTH characters by deleting up to MAX_DISTANCE
+characters. A misspelt word's own deletes then find its candidates
+without scanning the vocabulary, and a Damerau-Levenshtein check keeps
+the real ones. A corrected query is only accepted when the whole phrase
+is a known title or alias, so a rewrite never lands on a made-up topic.
+
+The dictionary is built once into a flat file of sorted string tables
+and uint32 arrays, and memory-mapped. Opening it reads nothing up front;
+lookups binary-search the mapped pages, and worker processes share them
+through the page cache.
+"""
+import itertools
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+import config
+from answer_cache import normalize_query
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within the process
+    fcntl = None
+
+MAGIC = b'SYMSPL1' + (b'L' if sys.byteorder == 'little' else b'B')  # arrays are native-endian
+HEADER = struct.Struct('<8sII8Q')
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MAX_CANDIDATES = 3  # corrections tried per unknown word
+MAX_PHRASES = 27  # corrected phrases checked per query
+
+
+def max_edits(word):
+    """Edits allowed for a word of this length: none for very short words"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 5 else MAX_DISTANCE
+
+
+def deletes(word, distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+    """Every string made by deleting up to distance characters from word's prefix"""
+    word = word[:prefix_length]
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, limit):
+    """Optimal-string-alignment distance between a and b, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _string_table(strings):
+    """uint32 count, uint32 offsets[count + 1], then the UTF-8 bytes"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = array('I', [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return struct.pack('<I', len(encoded)) + offsets.tobytes() + b''.join(encoded)
+
+
+def build(path, pairs):
+    """Write the dictionary for (alias, canonical title) pairs to path, atomically"""
+    phrases = {}
+    for alias, title in pairs:
+        key = normalize_query(alias)
+        if key:
+            phrases.setdefault(key, title)
+    word_freq = Counter(word for key in phrases for word in key.split())
+
+    words = sorted(word_freq, key=lambda w: w.encode('utf-8'))
+    postings = {}
+    for word_id, word in enumerate(words):
+        if max_edits(word):
+            for item in deletes(word):
+                postings.setdefault(item, []).append(word_id)
+    delete_keys = sorted(postings, key=lambda d: d.encode('utf-8'))
+    starts = array('I', [0])
+    ids = array('I')
+    for item in delete_keys:
+        ids.extend(postings[item])
+        starts.append(len(ids))
+
+    phrase_keys = sorted(phrases, key=lambda p: p.encode('utf-8'))
+    titles = sorted(set(phrases.values()))
+    title_ids = {title: i for i, title in enumerate(titles)}
+    phrase_titles = array('I', (title_ids[phrases[key]] for key in phrase_keys))
+
+    sections = [
+        _string_table(words),
+        array('I', (word_freq[word] for word in words)).tobytes(),
+        _string_table(delete_keys),
+        starts.tobytes(),
+        ids.tobytes(),
+        _string_table(phrase_keys),
+        phrase_titles.tobytes(),
+        _string_table(titles),
+    ]
+    offsets, position = [], HEADER.size
+    for section in sections:
+        position += -position % 4  # keep uint32 arrays aligned
+        offsets.append(position)
+        position += len(section)
+
+    # A temporary file of our own, so concurrent builders never share one
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, MAX_DISTANCE, PREFIX_LENGTH, *offsets))
+            for offset, section in zip(offsets, sections):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(section)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {'phrases': len(phrase_keys), 'words': len(words), 'deletes': len(delete_keys)}
+
+
+class _Strings:
+    """Sorted string table read straight from the mapped file"""
+
+    def __init__(self, view, offset):
+        self.count = struct.unpack_from('<I', view, offset)[0]
+        start = offset + 4
+        self.offsets = view[start:start + 4 * (self.count + 1)].cast('I')
+        self.blob = start + 4 * (self.count + 1)
+        self.view = view
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, i):
+        return bytes(self.view[self.blob + self.offsets[i]:self.blob + self.offsets[i + 1]])
+
+    def __getitem__(self, i):
+        return self.raw(i).decode('utf-8')
+
+    def find(self, text):
+        """Position of text in the table, or -1"""
+        key = text.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self.raw(lo) == key else -1
+
+
+class SpellingIndex:
+    """Memory-mapped dictionary written by build(); see the module docstring"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.max_distance, self.prefix_length, *offsets = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a spelling index for this machine")
+        view = memoryview(self._mmap)
+        self.words = _Strings(view, offsets[0])
+        self.word_freq = view[offsets[1]:offsets[1] + 4 * len(self.words)].cast('I')
+        self.deletes = _Strings(view, offsets[2])
+        self.delete_starts = view[offsets[3]:offsets[3] + 4 * (len(self.deletes) + 1)].cast('I')
+        self.delete_ids = view[offsets[4]:offsets[4] + 4 * self.delete_starts[-1]].cast('I')
+        self.phrases = _Strings(view, offsets[5])
+        self.phrase_titles = view[offsets[6]:offsets[6] + 4 * len(self.phrases)].cast('I')
+        self.titles = _Strings(view, offsets[7])
+
+    def title(self, query):
+        """Canonical title for an exact (normalized) title or alias, or None"""
+        i = self.phrases.find(normalize_query(query))
+        return None if i < 0 else self.titles[self.phrase_titles[i]]
+
+    def candidates(self, word):
+        """[(distance, -frequency, word)] for vocabulary words close to word, best first"""
+        i = self.words.find(word)
+        if i >= 0:
+            return [(0, -self.word_freq[i], word)]
+        limit = min(max_edits(word), self.max_distance)
+        if not limit:
+            return []
+        word_ids = set()
+        for item in deletes(word, limit, self.prefix_length):
+            j = self.deletes.find(item)
+            if j >= 0:
+                word_ids.update(self.delete_ids[self.delete_starts[j]:self.delete_starts[j + 1]])
+        found = []
+        for word_id in word_ids:
+            candidate = self.words[word_id]
+            distance = edit_distance(word, candidate, limit)
+            if distance <= limit:
+                found.append((distance, -self.word_freq[word_id], candidate))
+        found.sort()
+        return found
+
+    def correct(self, query):
+        """Canonical title the query most likely meant, or None
+
+        Tries the exact phrase first, then corrected phrases in order of
+        total edit distance, and accepts the first that is a known title.
+        """
+        title = self.title(query)
+        if title is not None:
+            return title
+        words = normalize_query(query).split()
+        if not words:
+            return None
+        options = []
+        for word in words:
+            found = self.candidates(word)[:MAX_CANDIDATES]
+            if not found:
+                return None
+            options.append(found)
+        combos = sorted(
+            itertools.islice(itertools.product(*options), MAX_PHRASES * 4),
+            key=lambda combo: sum(option[0] for option in combo)
+        )
+        for combo in combos[:MAX_PHRASES]:
+            i = self.phrases.find(' '.join(option[2] for option in combo))
+            if i >= 0:
+                return self.titles[self.phrase_titles[i]]
+        return None
+
+    def stats(self):
+        return {'phrases': len(self.phrases), 'words': len(self.words), 'deletes': len(self.deletes)}
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # views into the map are still referenced; it is unmapped once they go
+
+
+def title_sources(knowledge=None):
+    """(alias, title) pairs from the titles dump, learned titles and the knowledge index"""
+    from title_index import LearnedTitles, read_titles_file
+
+    if config.TITLE_INDEX_PATH and os.path.exists(config.TITLE_INDEX_PATH):
+        for title in read_titles_file(config.TITLE_INDEX_PATH):
+            yield title, title
+    if config.TITLE_INDEX_LEARNED not in ('', 'off'):
+        for title in LearnedTitles(config.TITLE_INDEX_LEARNED).read():
+            yield title, title
+    if knowledge is not None:
+        yield from knowledge.aliases()
+
+
+def _source_mtime(knowledge=None):
+    paths = [config.TITLE_INDEX_PATH, config.TITLE_INDEX_LEARNED]
+    if knowledge is not None:
+        paths.append(knowledge.path)
+    return max((os.path.getmtime(p) for p in paths if p and os.path.exists(p)), default=0)
+
+
+_build_lock = threading.Lock()
+
+
+@contextmanager
+def _process_lock(lock_path):
+    """Exclusive flock on lock_path across worker processes (a no-op without fcntl)"""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def open_spelling(knowledge=None):
+    """The configured SpellingIndex, rebuilt first if a title source is newer; None when off
+
+    Returns None when there are no titles to build from. Building goes
+    to a temporary file and is swapped in, so a worker that opens the
+    index meanwhile sees the old file or the new one, never half of one.
+    A lock file next to the index lets one worker process build at a
+    time; the others wait, then find the index fresh and just open it.
+    """
+    path = config.SPELLING_INDEX_PATH
+    if path in ('', 'off'):
+        return None
+    with _build_lock, _process_lock(path + '.lock'):
+        newest = _source_mtime(knowledge)
+        if not newest:
+            return None
+        if not os.path.exists(path) or os.path.getmtime(path) < newest:
+            started = time.perf_counter()
+            counts = build(path, title_sources(knowledge))
+            print(f"🔤 Built spelling index: {counts['phrases']} titles, {counts['words']} words "
+                  f"({time.perf_counter() - started:.2f}s)")
+    try:
+        return SpellingIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Spelling index unavailable: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the spelling index')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='rebuild from titles.txt, learned titles and knowledge.db')
+    lookup = commands.add_parser('lookup', help='correct a query')
+    lookup.add_argument('query')
+    args = parser.parse_args()
+
+    knowledge = None
+    if config.KNOWLEDGE_INDEX_PATH and os.path.exists(config.KNOWLEDGE_INDEX_PATH):
+        from knowledge_index import KnowledgeIndex
+        knowledge = KnowledgeIndex(config.KNOWLEDGE_INDEX_PATH)
+
+    if args.command == 'build':
+        counts = build(config.SPELLING_INDEX_PATH, title_sources(knowledge))
+        print(f"✅ {counts['phrases']} titles, {counts['words']} words, {counts['deletes']} deletes")
+    else:
+        index = open_spelling(knowledge)
+        if index is None:
+            print('No titles to build a spelling index from')
+        else:
+            start = time.perf_counter()
+            title = index.correct(args.query)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(title or 'No correction')
+            print(f"⏱️ {elapsed:.3f} ms")
@@ -23,7 +23,11 @@ document.addEventListener('DOMContentLoaded', function() {
                    "🎯", "✨", "💡", "🚀", "📚", "🎨", "🎵", "🏆", "💪", "🙏"];
 
     // Initialize
+    const HISTORY_PAGE_SIZE = 20;
     let messageCounter = 0;
+    let oldestMessageId = null;
+    let hasMoreHistory = false;
+    let loadingHistory = false;
     updateCurrentTime();
     loadChatHistory();
     populateEmojis();
@@ -40,6 +44,12 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     sendBtn.addEventListener('click', sendMessage);
+
+    messagesContainer.addEventListener('scroll', function() {
+        if (messagesContainer.scrollTop < 80) {
+            loadOlderHistory();
+        }
+    });
     
     clearChatBtn.addEventListener('click', function() {
         if (confirm('Are you sure you want to clear all chat messages?')) {
@@ -105,6 +115,20 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function addMessage(message, sender, isBot = false) {
+        const messageDiv = buildMessage(message, sender, isBot);
+        
+        messagesContainer.appendChild(messageDiv);
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        
+        if (!isBot) {
+            messageCounter++;
+            messageCount.textContent = messageCounter;
+        }
+
+        return messageDiv;
+    }
+
+    function buildMessage(message, sender, isBot = false) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${isBot ? 'bot-message' : 'user-message'}`;
         
@@ -122,13 +146,12 @@ document.addEventListener('DOMContentLoaded', function() {
             </div>
         `;
         
-        messagesContainer.appendChild(messageDiv);
+        return messageDiv;
+    }
+
+    function updateMessage(messageDiv, message) {
+        messageDiv.querySelector('.message-text').innerHTML = formatMessage(message);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
-        
-        if (!isBot) {
-            messageCounter++;
-            messageCount.textContent = messageCounter;
-        }
     }
 
     function formatMessage(text) {
@@ -167,8 +190,8 @@ document.addEventListener('DOMContentLoaded', function() {
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
 
         try {
-            // Send message to server
-            const response = await fetch('/chat', {
+            // Send message to server; the reply streams back as Server-Sent Events
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -176,22 +199,53 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({ message: message })
             });
 
-            const data = await response.json();
-
-            // Remove typing indicator
-            typingIndicator.remove();
-
-            if (data.error) {
-                addMessage('Sorry, I encountered an error. Please try again.', 'AI Assistant', true);
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.body || !contentType.includes('text/event-stream')) {
+                // Errors come back as plain JSON
+                const data = await response.json();
+                typingIndicator.remove();
+                if (data.error) {
+                    addMessage('Sorry, I encountered an error. Please try again.', 'AI Assistant', true);
+                    return;
+                }
+                addMessage(data.response, 'AI Assistant', true);
                 return;
             }
 
-            // Add bot response
-            addMessage(data.response, 'AI Assistant', true);
+            let botMessage = null;
+            let botText = '';
+
+            function showText(text) {
+                botText = text;
+                if (!botMessage) {
+                    typingIndicator.remove();
+                    botMessage = addMessage(botText, 'AI Assistant', true);
+                } else {
+                    updateMessage(botMessage, botText);
+                }
+            }
 
-            // Update username display if name was detected
-            if (data.username && !document.querySelector('.welcome')) {
-                updateUsernameDisplay(data.username);
+            await readEventStream(response, function(event, data) {
+                if (event === 'searching') {
+                    typingIndicator.querySelector('.message-sender').textContent =
+                        `AI Assistant · searching for "${data.query}"…`;
+                } else if (event === 'chunk' || event === 'source') {
+                    showText(botText + data.text);
+                } else if (event === 'done') {
+                    showText(data.response);
+
+                    // Update username display if name was detected
+                    if (data.username && !document.querySelector('.welcome')) {
+                        updateUsernameDisplay(data.username);
+                    }
+                } else if (event === 'error') {
+                    showText(data.response);
+                }
+            });
+
+            if (!botMessage) {
+                typingIndicator.remove();
+                addMessage('Sorry, I encountered an error. Please try again.', 'AI Assistant', true);
             }
 
         } catch (error) {
@@ -201,6 +255,35 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    async function readEventStream(response, onEvent) {
+        // Minimal Server-Sent Events parser for a fetch() body
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                const dataLines = [];
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                });
+                if (dataLines.length) {
+                    onEvent(event, JSON.parse(dataLines.join('\n')));
+                }
+            }
+        }
+    }
+
     async function sendQuickAction(action) {
         try {
             const response = await fetch('/quick_actions', {
@@ -220,7 +303,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
     async function loadChatHistory() {
         try {
-            const response = await fetch('/history');
+            // Only the newest page; older pages load as the user scrolls up
+            const response = await fetch(`/history?limit=${HISTORY_PAGE_SIZE}`);
             const data = await response.json();
             
             if (data.history && data.history.length > 0) {
@@ -234,12 +318,46 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
                 
                 messageCount.textContent = messageCounter;
+                oldestMessageId = data.history[0].id;
+                hasMoreHistory = data.has_more;
             }
         } catch (error) {
             console.error('Error loading history:', error);
         }
     }
 
+    async function loadOlderHistory() {
+        if (!hasMoreHistory || loadingHistory) return;
+        loadingHistory = true;
+
+        try {
+            const response = await fetch(`/history?limit=${HISTORY_PAGE_SIZE}&before=${oldestMessageId}`);
+            const data = await response.json();
+
+            if (data.history && data.history.length > 0) {
+                // Prepend without making the visible messages jump
+                const previousHeight = messagesContainer.scrollHeight;
+                const fragment = document.createDocumentFragment();
+
+                data.history.forEach(msg => {
+                    fragment.appendChild(buildMessage(msg.user, 'You', false));
+                    fragment.appendChild(buildMessage(msg.bot, 'AI Assistant', true));
+                    messageCounter += 2;
+                });
+
+                messagesContainer.insertBefore(fragment, messagesContainer.firstChild);
+                messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+                messageCount.textContent = messageCounter;
+                oldestMessageId = data.history[0].id;
+            }
+            hasMoreHistory = Boolean(data.has_more);
+        } catch (error) {
+            console.error('Error loading older history:', error);
+        } finally {
+            loadingHistory = false;
+        }
+    }
+
     async function clearChat() {
         try {
             const response = await fetch('/clear', {
@@ -251,6 +369,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 messagesContainer.innerHTML = '';
                 messageCounter = 0;
                 messageCount.textContent = '0';
+                hasMoreHistory = false;
                 
                 // Add welcome message
                 const welcomeMessage = `🎉 Welcome to AI ChatBot! 🎉\n\nI'm your intelligent AI assistant ready to help you with:\n• Time and date information ⏰📅\n• Funny jokes and humor 😂\n• General conversation and questions 💬\n\nYou can type your message below or use the quick action buttons! 😊\n\nWhat would you like to do today?`;
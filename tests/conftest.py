@@ -0,0 +1,33 @@
+# Save as: tests/conftest.py
+"""Shared fixtures: a local stub upstream and a bot that never touches disk or the internet"""
+import pytest
+
+import config
+from benchmarks.stub_upstream import StubUpstream
+
+
+@pytest.fixture
+def stub():
+    with StubUpstream() as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def bot(stub, monkeypatch):
+    """A fresh SmartChatBot wired to the stub, with every on-disk index turned off"""
+    monkeypatch.setattr(config, 'ANSWER_CACHE_PATH', '')
+    monkeypatch.setattr(config, 'KNOWLEDGE_INDEX_PATH', '')
+    monkeypatch.setattr(config, 'TITLE_INDEX_PATH', '')
+    monkeypatch.setattr(config, 'TITLE_INDEX_LEARNED', 'off')
+    monkeypatch.setattr(config, 'SPELLING_INDEX_PATH', 'off')
+    monkeypatch.setattr(config, 'SHARED_CACHE_PATH', 'off')
+    # configure_bot points these at the stub; monkeypatch puts them back afterwards
+    monkeypatch.setattr(config, 'WIKIPEDIA_REST_URL', config.WIKIPEDIA_REST_URL)
+    monkeypatch.setattr(config, 'WIKIPEDIA_API_URL', config.WIKIPEDIA_API_URL)
+
+    from smart_chatbot import SmartChatBot
+    chatbot = stub.configure_bot(SmartChatBot())
+    yield chatbot
+    chatbot.retrieval.shutdown()
+    chatbot.page_pool.shutdown(wait=False)
+    chatbot.batch_pool.shutdown(wait=False)
@@ -0,0 +1,43 @@
+# Save as: tests/test_circuit_breaker.py
+"""Half-open probes are always handed back, however the probe call ends"""
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def failing():
+    raise ValueError("upstream down")
+
+
+def interrupted():
+    raise SystemExit(1)  # what gunicorn's worker timeout raises
+
+
+def tripped_breaker():
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=0.01)
+    with pytest.raises(ValueError):
+        breaker.call(failing)
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    return breaker
+
+
+def test_interrupted_probe_lets_the_next_probe_through():
+    breaker = tripped_breaker()
+    with pytest.raises(SystemExit):
+        breaker.call(interrupted)
+    assert breaker.state == HALF_OPEN
+
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_second_probe_is_rejected_while_one_is_out():
+    breaker = tripped_breaker()
+    assert breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+    breaker.release()
+    assert breaker.call(lambda: 'ok') == 'ok'
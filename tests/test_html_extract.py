@@ -0,0 +1,40 @@
+# Save as: tests/test_html_extract.py
+"""The ranked picker stops reading a page as soon as it has a good answer"""
+import os
+
+from benchmarks.snippets import FIXTURES_DIR, GENERATED, counted, legacy_extract
+from benchmarks.stub_upstream import make_page
+from html_extract import extract_from_chunks
+
+
+def chunked(page, size=16384):
+    return [page[i:i + size] for i in range(0, len(page), size)]
+
+
+def read_with(extract, chunks, query):
+    seen = [0]
+    sentences, _ = extract(counted(chunks, seen), query)
+    return ' '.join(sentences), seen[0]
+
+
+def test_large_page_reads_no_more_than_the_old_loop():
+    query, phrase, paragraphs = GENERATED
+    chunks = chunked(make_page(query, paragraphs).encode('utf-8'))
+
+    ranked, ranked_chunks = read_with(extract_from_chunks, chunks, query)
+    _, legacy_chunks = read_with(legacy_extract, chunks, query)
+
+    assert phrase in ranked
+    assert ranked_chunks <= legacy_chunks < len(chunks)
+
+
+def test_stops_soon_after_a_deep_definition():
+    with open(os.path.join(FIXTURES_DIR, 'roman_empire.html'), 'rb') as f:
+        page = f.read()
+    chunks = chunked(page)
+
+    answer, read = read_with(extract_from_chunks, chunks, 'Roman Empire')
+
+    assert 'ruled by emperors' in answer
+    # The definition sits at about 63 KB of a 440 KB page
+    assert read <= page.find(b'ruled by emperors') // 16384 + 2
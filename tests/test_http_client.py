@@ -0,0 +1,44 @@
+# Save as: tests/test_http_client.py
+"""HttpClient keeps connections alive and shares them between threads"""
+import threading
+
+from http_client import HttpClient
+
+
+def summary_url(stub, title):
+    return f"{stub.url}/api/rest_v1/page/summary/{title}"
+
+
+def test_sequential_requests_reuse_one_connection(stub):
+    client = HttpClient()
+    for i in range(20):
+        assert client.get(summary_url(stub, f"Topic_{i}")).status_code == 200
+
+    assert stub.requests['wikipedia_summary'] == 20
+    assert len(stub.connections) == 1
+    client.close()
+
+
+def test_threads_share_the_pool(stub):
+    client = HttpClient(pool_maxsize=4)
+    threads, per_thread = 8, 10
+    barrier = threading.Barrier(threads)
+    statuses = []
+
+    def fetch(index):
+        barrier.wait()
+        for i in range(per_thread):
+            statuses.append(client.get(summary_url(stub, f"Topic_{index}_{i}")).status_code)
+
+    workers = [threading.Thread(target=fetch, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert statuses == [200] * threads * per_thread
+    assert stub.requests['wikipedia_summary'] == threads * per_thread
+    # pool_block caps open connections at pool_maxsize, however many threads ask
+    assert len(stub.connections) <= 4
+    client.close()
+
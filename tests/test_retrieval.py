@@ -0,0 +1,44 @@
+# Save as: tests/test_retrieval.py
+"""Race mode head starts: a budgeted provider only runs when the ones ahead of it miss"""
+import time
+
+from retrieval import RetrievalEngine
+
+
+def answer(name, delay=0.0):
+    def provider(query):
+        time.sleep(delay)
+        return {'answer': f"{query} from {name}", 'source': name, 'type': name}
+    return provider
+
+
+def test_head_start_skips_provider_when_first_answers():
+    calls = []
+
+    def google(query):
+        calls.append(query)
+        return {'answer': 'late', 'source': 'google', 'type': 'google'}
+
+    engine = RetrievalEngine(
+        [('wikipedia', answer('wikipedia', 0.05)), ('google', google)],
+        head_starts={'google': 1.0}
+    )
+    result, conclusive = engine.lookup('topic')
+    time.sleep(0.1)  # give a wrongly started loser time to run
+
+    assert result['source'] == 'wikipedia' and conclusive
+    assert calls == []
+    engine.shutdown()
+
+
+def test_head_start_ends_when_first_misses():
+    engine = RetrievalEngine(
+        [('wikipedia', lambda query: time.sleep(0.05)), ('google', answer('google'))],
+        head_starts={'google': 5.0}
+    )
+    started = time.monotonic()
+    result, _ = engine.lookup('topic')
+
+    assert result['source'] == 'google'
+    assert time.monotonic() - started < 1.0
+    engine.shutdown()
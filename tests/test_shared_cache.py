@@ -0,0 +1,49 @@
+# Save as: tests/test_shared_cache.py
+"""SharedCache never writes outside a slot and only drops its own claims"""
+import pytest
+
+shared_cache = pytest.importorskip('shared_cache')
+if shared_cache.fcntl is None:
+    pytest.skip("the shared cache needs fcntl", allow_module_level=True)
+
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    table = SharedCache(str(tmp_path / 'answers.cache'), max_bytes=64 * 1024, slot_bytes=512, lease=5.0)
+    yield table
+    table.close()
+
+
+def test_oversized_key_bypasses_the_table(cache):
+    slots = cache.buckets * cache.ways
+    for i in range(slots):
+        cache.set(f"topic {i}", {'answer': i}, ttl=60)
+    stored = sum(cache.get(f"topic {i}")[0] for i in range(slots))
+
+    value, hit = cache.get_or_set('x' * 1500, lambda: ('computed', 60))
+
+    assert (value, hit) == ('computed', False)
+    assert cache.too_large == 1
+    assert sum(cache.get(f"topic {i}")[0] for i in range(slots)) == stored
+    assert cache.get('x' * 1500) == (False, None)
+
+
+def test_release_leaves_a_newer_claim_alone(cache):
+    key = b'topic'
+    hashed = shared_cache.key_hash(key)
+    state, ours = cache._claim(key, hashed)
+    assert state == shared_cache.EMPTY
+
+    # Our claim lapses and another worker claims the key
+    bucket, base = cache._bucket(hashed)
+    with cache._locked(bucket):
+        offset, _ = cache._find(base, key, hashed)
+        cache._write(offset, shared_cache.PENDING, key, hashed, ours + 100)
+
+    cache._release(key, hashed, ours)
+    assert cache._claim(key, hashed) == (shared_cache.PENDING, None)
+
+    cache._release(key, hashed, ours + 100)
+    assert cache._claim(key, hashed)[0] == shared_cache.EMPTY
@@ -0,0 +1,73 @@
+# Save as: tests/test_single_flight.py
+"""Concurrent identical questions share one upstream fetch"""
+import threading
+import time
+
+from single_flight import SingleFlight
+
+
+def ask_together(bot, questions):
+    """Ask every question on its own thread, all released at once"""
+    barrier = threading.Barrier(len(questions))
+    answers = [None] * len(questions)
+
+    def ask(index):
+        barrier.wait()
+        answers[index] = bot.get_answer(questions[index])
+
+    threads = [threading.Thread(target=ask, args=(index,)) for index in range(len(questions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers
+
+
+def test_burst_makes_one_upstream_call(bot, stub):
+    stub.latency = 0.2  # keep the first fetch in flight while the others arrive
+    answers = ask_together(bot, ["Burst Topic"] * 16)
+
+    assert stub.requests['wikipedia_summary'] == 1
+    assert all(answer == answers[0] for answer in answers)
+    assert answers[0]['source'] == 'Burst Topic'
+    assert bot.flights.executions == 1
+
+
+def test_different_questions_are_not_merged(bot, stub):
+    stub.latency = 0.1
+    answers = ask_together(bot, [f"Separate Topic {i}" for i in range(4)])
+
+    assert stub.requests['wikipedia_summary'] == 4
+    assert [answer['source'] for answer in answers] == [f"Separate Topic {i}" for i in range(4)]
+
+
+def test_failure_is_shared_but_not_remembered():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flights.do('topic', failing)
+        except ValueError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flights.shared == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flights.do('topic', lambda: 'recovered') == 'recovered'
+    assert flights.executions == 2
@@ -0,0 +1,30 @@
+# Save as: tests/test_user_store.py
+"""WriteBehindStore drains on close and refuses saves it can no longer write"""
+import pytest
+
+from user_store import SQLiteUserStore, StoreClosed, WriteBehindStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'users.db')
+
+
+def test_close_writes_pending_saves(path):
+    store = WriteBehindStore(SQLiteUserStore(path), interval=60)
+    store.put('alice', {'username': 'Alice', 'chat_history': []})
+    assert store.pending() == 1
+    store.close()
+
+    reopened = SQLiteUserStore(path)
+    assert reopened.get('alice')['username'] == 'Alice'
+    reopened.close()
+
+
+def test_put_after_close_raises(path):
+    store = WriteBehindStore(SQLiteUserStore(path), interval=60)
+    store.close()
+
+    with pytest.raises(StoreClosed):
+        store.put('late', {'username': 'Late', 'chat_history': []})
+    assert store.pending() == 0
@@ -0,0 +1,149 @@
+# Save as: title_index.py
+"""In-memory article title index for /search and /suggest autocomplete
+
+Titles are kept as a sorted array of normalized keys with the display
+titles alongside; a prefix is looked up with two bisects, so a suggestion
+costs O(log n + k) whatever the number of titles. Titles come from a
+local dump (one per line, plain or .gz, e.g. Wikipedia's
+all-titles-in-ns0 file) and from queries the bot has already answered,
+which rank first in suggestions.
+"""
+import bisect
+import gzip
+import heapq
+import os
+import threading
+
+import config
+from answer_cache import normalize_query
+
+PREFIX_END = '\U0010ffff'  # sorts after every character a title can continue with
+
+
+def read_titles_file(path):
+    """Titles from a dump: one per line, '_' for spaces allowed, gzip by extension"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            title = line.strip().replace('_', ' ')
+            if title and not line.startswith('#') and title != 'page title':
+                yield title
+
+
+class TitleIndex:
+    """Sorted title keys with bisect prefix lookup, plus a small set of answered titles
+
+    The dump is loaded once into parallel sorted lists. Titles the bot
+    answers later go into a second, much smaller sorted list with hit
+    counts, so learning a title never shifts the large array.
+    """
+
+    def __init__(self, titles=()):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._titles = []
+        self._learned_keys = []
+        self._learned = {}  # key -> [title, hits]
+        if titles:
+            self.load(titles)
+
+    def load(self, titles):
+        """Replace the dump part of the index with titles (any iterable)"""
+        by_key = {}
+        for title in titles:
+            by_key.setdefault(normalize_query(title), title)
+        keys = sorted(by_key)
+        titles = [by_key[key] for key in keys]
+        with self._lock:
+            self._keys, self._titles = keys, titles
+        return len(keys)
+
+    def learn(self, title, hits=1):
+        """Add (or bump) a title the bot has answered; True if it was new"""
+        key = normalize_query(title)
+        if not key:
+            return False
+        with self._lock:
+            entry = self._learned.get(key)
+            if entry is not None:
+                entry[1] += hits
+                return False
+            self._learned[key] = [title, hits]
+            bisect.insort(self._learned_keys, key)
+            return True
+
+    def get(self, title):
+        """Display title for an exact (normalized) match, or None"""
+        key = normalize_query(title)
+        with self._lock:
+            entry = self._learned.get(key)
+            if entry is not None:
+                return entry[0]
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                return self._titles[i]
+        return None
+
+    def suggest(self, prefix, limit=8):
+        """Up to limit titles starting with prefix: answered ones by hits, then the dump in order"""
+        key = normalize_query(prefix)
+        if not key or limit <= 0:
+            return []
+        with self._lock:
+            lo = bisect.bisect_left(self._learned_keys, key)
+            hi = bisect.bisect_left(self._learned_keys, key + PREFIX_END, lo)
+            learned = heapq.nlargest(
+                limit, self._learned_keys[lo:hi], key=lambda k: self._learned[k][1])
+            results = [self._learned[k][0] for k in learned]
+            seen = set(learned)
+
+            # The exact title sorts first, then its multi-word extensions
+            # (' ' sorts before letters), so the range starts with the closest matches
+            i = bisect.bisect_left(self._keys, key)
+            while len(results) < limit and i < len(self._keys) and self._keys[i].startswith(key):
+                if self._keys[i] not in seen:
+                    results.append(self._titles[i])
+                i += 1
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {'titles': len(self._keys), 'learned': len(self._learned)}
+
+
+class LearnedTitles:
+    """Append-only file of answered titles, so they survive a restart"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f if line.strip()]
+
+    def append(self, title):
+        # One short line per write; O_APPEND keeps lines whole across workers
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(title.replace('\n', ' ') + '\n')
+
+
+def open_title_index(knowledge=None):
+    """Index built from the titles dump, the learned-titles file and the local knowledge index"""
+    index = TitleIndex()
+    path = config.TITLE_INDEX_PATH
+    titles = []
+    if path and os.path.exists(path):
+        titles.extend(read_titles_file(path))
+    if knowledge is not None:
+        titles.extend(knowledge.titles())
+    index.load(titles)
+
+    learned = None
+    if config.TITLE_INDEX_LEARNED not in ('', 'off'):
+        learned = LearnedTitles(config.TITLE_INDEX_LEARNED)
+        for title in learned.read():
+            index.learn(title)
+    return index, learned
@@ -0,0 +1,624 @@
+# Save as: user_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+
+class StoreClosed(RuntimeError):
+    """Raised by a put that arrives after the store was closed"""
+
+
+def encode_record(user_data):
+    """Compact JSON text for a user record, as every backend stores it"""
+    return json.dumps(user_data, ensure_ascii=False, separators=(',', ':'))
+
+
+def is_empty_record(user_data):
+    """A record with nothing worth keeping: no name and no chat history"""
+    return not user_data.get('username') and not user_data.get('chat_history')
+
+
+class UserStore:
+    """Keyed storage for per-user records (username, chat history, ...)"""
+
+    def get(self, user_id):
+        """Return the record for user_id, or None if there is none"""
+        raise NotImplementedError
+
+    def put(self, user_id, user_data):
+        """Insert or replace the record for user_id"""
+        raise NotImplementedError
+
+    def put_many(self, records):
+        """Write (user_id, encoded_record) pairs as one batch"""
+        for user_id, record in records:
+            self.put(user_id, json.loads(record))
+
+    def delete(self, user_id):
+        """Remove the record for user_id if it exists"""
+        raise NotImplementedError
+
+    def user_ids(self):
+        """Return a list of every stored user id"""
+        raise NotImplementedError
+
+    def scan(self):
+        """Yield (user_id, encoded_record) for every user"""
+        for user_id in self.user_ids():
+            user_data = self.get(user_id)
+            if user_data is not None:
+                yield user_id, encode_record(user_data)
+
+    def delete_if_unchanged(self, user_id, record):
+        """Delete user_id only if its stored record still encodes to record; True if deleted"""
+        current = self.get(user_id)
+        if current is None or encode_record(current) != record:
+            return False
+        self.delete(user_id)
+        return True
+
+    def compact(self):
+        """Give space freed by deletes back to the filesystem"""
+        pass
+
+    def size_bytes(self):
+        """Bytes the store occupies on disk"""
+        return 0
+
+    def is_empty(self):
+        """Check whether the store holds no records"""
+        return not self.user_ids()
+
+    def close(self):
+        """Release any open files or connections"""
+        pass
+
+    def reopen(self):
+        """Open fresh handles in a forked worker process"""
+        pass
+
+
+class SQLiteUserStore(UserStore):
+    """User records in an embedded SQLite database running in WAL mode
+
+    synchronous='NORMAL' skips the fsync on each commit (a power cut can
+    lose the last commits, a process crash cannot); 'FULL' syncs every
+    commit, which is affordable when writes arrive in put_many batches.
+    """
+
+    UPSERT = (
+        'INSERT INTO users (user_id, data) VALUES (?, ?) '
+        'ON CONFLICT(user_id) DO UPDATE SET data = excluded.data'
+    )
+
+    def __init__(self, path='users_data.db', synchronous='NORMAL'):
+        self.path = path
+        self.synchronous = synchronous
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # WAL lets readers carry on while a writer commits
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS users ('
+            'user_id TEXT NOT NULL PRIMARY KEY, '
+            'data TEXT NOT NULL)'
+        )
+        # Older files allowed NULL ids, which never matched ON CONFLICT and piled up
+        self._conn.execute('DELETE FROM users WHERE user_id IS NULL')
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM users WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, user_id, user_data):
+        data = encode_record(user_data)
+        with self._lock:
+            self._conn.execute(self.UPSERT, (user_id, data))
+
+    def put_many(self, records):
+        # One transaction, so the whole batch costs a single commit (and sync)
+        records = list(records)
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(self.UPSERT, records)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def delete(self, user_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+
+    def user_ids(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT user_id FROM users').fetchall()
+        return [row[0] for row in rows]
+
+    def scan(self, page_size=500):
+        # Keyset pages, so the lock is never held for the whole table
+        after = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT user_id, data FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                    (after, page_size)
+                ).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    def delete_if_unchanged(self, user_id, record):
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM users WHERE user_id = ? AND data = ?', (user_id, record)
+            )
+        return cursor.rowcount > 0
+
+    def compact(self):
+        """VACUUM when deletes have left free pages, then truncate the WAL"""
+        with self._lock:
+            free_pages = self._conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages:
+                self._conn.execute('VACUUM')
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def size_bytes(self):
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ('', '-wal') if os.path.exists(self.path + suffix)
+        )
+
+    def is_empty(self):
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM users LIMIT 1').fetchone()
+        return row is None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self):
+        # SQLite connections must not be shared across fork()
+        self._lock = threading.Lock()
+        self._open()
+
+
+class LogUserStore(UserStore):
+    """User records in an append-only JSON-lines log with an in-memory offset index
+
+    Every write appends one line, so a put never rewrites other users' data.
+    The log is compacted once dead lines outweigh live ones. Meant for a
+    single server process; use the SQLite backend when several processes
+    share the data.
+    """
+
+    def __init__(self, path='users_data.log', compact_ratio=2.0, compact_min_bytes=1024 * 1024):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        self._index = {}  # user_id -> (offset, length)
+        self._live_bytes = 0
+        self._dead_bytes = 0
+        self._load_index()
+        self._file = open(self.path, 'a+b')
+        # Terminate a torn last line so the next append starts cleanly
+        if self._file.tell() > 0:
+            self._file.seek(-1, os.SEEK_END)
+            if self._file.read(1) != b'\n':
+                self._file.write(b'\n')
+                self._file.flush()
+
+    def _load_index(self):
+        """Scan the log once to find the latest line for every user"""
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                length = len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write at the end of the log
+                    self._dead_bytes += length
+                    offset += length
+                    continue
+                user_id = entry.get('id')
+                if user_id in self._index:
+                    self._forget(user_id)
+                if entry.get('deleted'):
+                    self._dead_bytes += length
+                else:
+                    self._index[user_id] = (offset, length)
+                    self._live_bytes += length
+                offset += length
+
+    def _forget(self, user_id):
+        """Drop user_id from the index and count its line as dead"""
+        length = self._index.pop(user_id)[1]
+        self._live_bytes -= length
+        self._dead_bytes += length
+
+    def _append(self, entry):
+        line = (encode_record(entry) + '\n').encode('utf-8')
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(line)
+        self._file.flush()
+        return offset, len(line)
+
+    def _read(self, user_id):
+        location = self._index.get(user_id)
+        if location is None:
+            return None
+        offset, length = location
+        self._file.seek(offset)
+        return json.loads(self._file.read(length))['data']
+
+    def get(self, user_id):
+        with self._lock:
+            return self._read(user_id)
+
+    def delete_if_unchanged(self, user_id, record):
+        with self._lock:
+            current = self._read(user_id)
+            if current is None or encode_record(current) != record:
+                return False
+            self._forget(user_id)
+            self._dead_bytes += self._append({'id': user_id, 'deleted': True})[1]
+            return True
+
+    def put(self, user_id, user_data):
+        with self._lock:
+            if user_id in self._index:
+                self._forget(user_id)
+            offset, length = self._append({'id': user_id, 'data': user_data})
+            self._index[user_id] = (offset, length)
+            self._live_bytes += length
+            self._maybe_compact()
+
+    def put_many(self, records):
+        # Same line format as put(), built from the already encoded records
+        records = list(records)
+        lines = [
+            ('{"id":' + json.dumps(user_id, ensure_ascii=False) + ',"data":' + record + '}\n').encode('utf-8')
+            for user_id, record in records
+        ]
+        if not lines:
+            return
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(b''.join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())  # one sync for the whole batch
+            for (user_id, _), line in zip(records, lines):
+                if user_id in self._index:
+                    self._forget(user_id)
+                self._index[user_id] = (offset, len(line))
+                self._live_bytes += len(line)
+                offset += len(line)
+            self._maybe_compact()
+
+    def delete(self, user_id):
+        with self._lock:
+            if user_id not in self._index:
+                return
+            self._forget(user_id)
+            self._dead_bytes += self._append({'id': user_id, 'deleted': True})[1]
+            self._maybe_compact()
+
+    def user_ids(self):
+        with self._lock:
+            return list(self._index)
+
+    def is_empty(self):
+        with self._lock:
+            return not self._index
+
+    def _maybe_compact(self):
+        if self._dead_bytes < self.compact_min_bytes:
+            return
+        if self._dead_bytes > self._live_bytes * self.compact_ratio:
+            self._compact()
+
+    def compact(self):
+        """Rewrite the log keeping only the latest line for each user"""
+        with self._lock:
+            if self._dead_bytes:
+                self._compact()
+
+    def size_bytes(self):
+        with self._lock:
+            return self._live_bytes + self._dead_bytes
+
+    def _compact(self):
+        tmp_path = self.path + '.tmp'
+        new_index = {}
+        with open(tmp_path, 'wb') as out:
+            for user_id, (offset, length) in self._index.items():
+                self._file.seek(offset)
+                line = self._file.read(length)
+                new_index[user_id] = (out.tell(), length)
+                out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a+b')
+        self._index = new_index
+        self._dead_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class WriteBehindStore(UserStore):
+    """Acknowledges puts at once and writes them to another store in batches
+
+    A background thread flushes pending records interval seconds after the
+    first one arrives, or as soon as max_batch users are waiting. Several
+    puts for one user between flushes collapse into a single write, and
+    each batch is one transaction / one fsync in the wrapped store.
+
+    Reads see pending records (read-your-writes within the process). If
+    the process is killed, at most the puts acknowledged in the last
+    interval (plus one batch write) are lost; close() and normal interpreter
+    exit drain everything. Other processes see a put once it is flushed.
+    Puts that arrive while close() drains are written straight through;
+    once the wrapped store is closed, put raises StoreClosed.
+    """
+
+    def __init__(self, store, interval=0.2, max_batch=64, max_pending=10000):
+        self.store = store
+        self.path = store.path
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.flushes = 0
+        self.written = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._start()
+
+    def _start(self):
+        self._pending = {}  # user_id -> encoded record, newest wins
+        self._flushing = {}  # batch currently being written
+        self._first_pending = 0.0
+        self._closed = False
+        self._store_closed = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def get(self, user_id):
+        with self._cond:
+            record = self._pending.get(user_id) or self._flushing.get(user_id)
+        if record is not None:
+            return json.loads(record)
+        return self.store.get(user_id)
+
+    def put(self, user_id, user_data):
+        # Encode now: the caller may keep changing user_data after we return
+        record = encode_record(user_data)
+        with self._cond:
+            # Back-pressure if the disk has fallen far behind
+            while len(self._pending) >= self.max_pending and user_id not in self._pending and not self._closed:
+                self._cond.wait()
+            if not self._closed:
+                if user_id in self._pending:
+                    self.coalesced += 1
+                elif not self._pending:
+                    self._first_pending = time.monotonic()
+                self._pending[user_id] = record
+                # Wake the flusher to start the clock, or to write a full batch early
+                if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                    self._cond.notify_all()
+                return
+        # Closing: no flusher is left to write it later
+        with self._flush_lock:
+            if self._store_closed:
+                raise StoreClosed(f"user store {self.path} is closed; save for {user_id} not written")
+            self.store.put_many([(user_id, record)])
+
+    def put_many(self, records):
+        for user_id, record in records:
+            self.put(user_id, json.loads(record))
+
+    def delete(self, user_id):
+        with self._flush_lock:
+            with self._cond:
+                self._pending.pop(user_id, None)
+            self.store.delete(user_id)
+
+    def user_ids(self):
+        self.flush()
+        return self.store.user_ids()
+
+    def scan(self):
+        self.flush()
+        return self.store.scan()
+
+    def delete_if_unchanged(self, user_id, record):
+        # A save still waiting to be written means the record has changed
+        with self._flush_lock:
+            with self._cond:
+                if user_id in self._pending:
+                    return False
+            return self.store.delete_if_unchanged(user_id, record)
+
+    def compact(self):
+        self.flush()
+        self.store.compact()
+
+    def size_bytes(self):
+        return self.store.size_bytes()
+
+    def is_empty(self):
+        with self._cond:
+            if self._pending:
+                return False
+        return self.store.is_empty()
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                deadline = self._first_pending + self.interval
+                while len(self._pending) < self.max_batch and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+            self.flush()
+
+    def flush(self):
+        """Write every pending record now; returns how many were written"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+                self._cond.notify_all()
+            if not batch:
+                return 0
+            try:
+                self.store.put_many(batch.items())
+            except Exception as e:
+                print(f"⚠️ User store write failed, retrying: {e}")
+                self.errors += 1
+                with self._cond:
+                    # Keep anything newer that arrived while we were writing
+                    for user_id, record in batch.items():
+                        self._pending.setdefault(user_id, record)
+                    self._first_pending = time.monotonic()
+                return 0
+            finally:
+                with self._cond:
+                    self._flushing = {}
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'flushes': self.flushes,
+            'written': self.written,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        """Stop the flusher, drain pending records and close the wrapped store"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        self.flush()
+        with self._flush_lock:
+            self._store_closed = True
+            self.store.close()
+
+    def reopen(self):
+        # The flusher thread does not survive fork(); start a fresh one
+        self.store.reopen()
+        self._start()
+
+
+BACKENDS = {
+    'sqlite': (SQLiteUserStore, 'users_data.db'),
+    'log': (LogUserStore, 'users_data.log'),
+}
+
+
+def migrate_json_file(json_path, store):
+    """Copy every record from a legacy users_data.json file into store"""
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, 'r', encoding='utf-8') as f:
+        try:
+            all_data = json.load(f)
+        except ValueError:
+            return 0
+    # Page views used to create a record each; those carry nothing to import
+    records = {user_id: user_data for user_id, user_data in all_data.items() if not is_empty_record(user_data)}
+    for user_id, user_data in records.items():
+        store.put(user_id, user_data)
+    return len(records)
+
+
+def open_user_store(backend=None, path=None, legacy_json=None, write_behind=None):
+    """Open the configured user store, importing the legacy JSON file on first use"""
+    backend = backend or config.USER_STORE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown user store backend: {backend}")
+    write_behind = config.WRITE_BEHIND if write_behind is None else write_behind
+    store_class, default_path = BACKENDS[backend]
+    options = {}
+    if write_behind and store_class is SQLiteUserStore:
+        # Batched commits make a sync per commit cheap, so flushed writes survive power loss too
+        options['synchronous'] = 'FULL'
+    store = store_class(path or config.USER_STORE_PATH or default_path, **options)
+
+    legacy_json = legacy_json if legacy_json is not None else config.USER_DATA_FILE
+    if legacy_json and store.is_empty():
+        count = migrate_json_file(legacy_json, store)
+        if count:
+            print(f"📦 Migrated {count} users from {legacy_json}")
+
+    if write_behind:
+        store = WriteBehindStore(
+            store,
+            interval=config.WRITE_BEHIND_INTERVAL_MS / 1000,
+            max_batch=config.WRITE_BEHIND_BATCH,
+            max_pending=config.WRITE_BEHIND_MAX_PENDING
+        )
+    return store
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert users_data.json into a user store')
+    parser.add_argument('json_path', nargs='?', default=config.USER_DATA_FILE)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=config.USER_STORE_BACKEND)
+    parser.add_argument('--path', default=None, help='store file (defaults per backend)')
+    args = parser.parse_args()
+
+    store_class, default_path = BACKENDS[args.backend]
+    store = store_class(args.path or config.USER_STORE_PATH or default_path)
+    count = migrate_json_file(args.json_path, store)
+    store.close()
+    print(f"✅ Migrated {count} users from {args.json_path} into {store.path}")